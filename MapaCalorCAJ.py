@@ -1,22 +1,25 @@
 import streamlit as st
 import pandas as pd
 import folium
-from streamlit_folium import folium_static
-from folium.plugins import MeasureControl, Fullscreen, Draw, MousePosition
-import json
-import re
-import os
-import unicodedata
-import numpy as np
-from folium.plugins import HeatMap
+from streamlit_folium import folium_static, st_folium
 
-# =====================================================
-# Configuração inicial com tema personalizado
-# =====================================================
-st.set_page_config(
-    page_title="Mapa de Calor - General Mills • Cajamar > São Paulo", 
-    layout="wide",
-    initial_sidebar_state="collapsed"
+from coord_repair import repair_summary
+from data_loader import (
+    CoordColumnsError, EmptyWorkbookError, cache_dir_for, dataset_version, find_file, frame_version,
+    load_workbook,
+)
+from history_store import HistoryStore, combine_years
+from aggcache import derived
+from scaling import DEFAULT_SCALE, SCALES
+from spatial import SpatialIndex
+from atendimento import FACILITY_TYPES, catchment, facilities
+from choropleth import BOUNDARY_DIRS, BOUNDARY_FILES, LEVELS, boundary_file
+from helpers import br_money, br_number
+from timecube import PeriodCube, find_period_column, to_periods
+from profiling import LOGGER_NAME, STAGES, StageLog, configure_logging, stage
+from mapas import (
+    COLOCATED_DECIMALS, HIST_FILE_CANDIDATES, METRICS, UNIT_FILE_CANDIDATES, UNIT_TYPES,
+    build_animated_heat_map, build_choropleth_map, build_heat_map, build_units_map, load_units,
 )
 
 # Paleta de cores baseada na imagem (tons de azul, verde e laranja)
@@ -106,13 +109,17 @@ def css_global():
                 box-shadow: 0 8px 30px rgba(0,0,0,0.12);
             }}
             
-            /* Abas estilizadas */
-            .stTabs [data-baseweb="tab-list"] {{
+            /* Navegação entre as páginas (radio com cara de abas) */
+            .st-key-pagina [role="radiogroup"] {{
                 gap: 8px;
                 background: transparent;
             }}
             
-            .stTabs [data-baseweb="tab"] {{
+            .st-key-pagina [role="radiogroup"] > label > div:first-child {{
+                display: none;
+            }}
+            
+            .st-key-pagina [role="radiogroup"] > label {{
                 background: {COLORS["card_bg"]};
                 border: 1px solid {COLORS["border"]};
                 border-radius: 12px 12px 0 0;
@@ -122,7 +129,8 @@ def css_global():
                 transition: all 0.3s ease;
             }}
             
-            .stTabs [aria-selected="true"] {{
+            .st-key-pagina [role="radiogroup"] > label:has(input:checked),
+            .st-key-pagina [role="radiogroup"] > label:has(input:checked) p {{
                 background: {COLORS["primary"]} !important;
                 color: white !important;
                 border-color: {COLORS["primary"]} !important;
@@ -290,137 +298,32 @@ def show_footer_banner():
         unsafe_allow_html=True,
     )
 
-def autodetect_coords(df: pd.DataFrame):
-    candidates_lat = [c for c in df.columns if re.search(r"(?:^|\b)(lat|latitude|y)(?:\b|$)", c, re.I)]
-    candidates_lon = [c for c in df.columns if re.search(r"(?:^|\b)(lon|long|longitude|x)(?:\b|$)", c, re.I)]
-    if candidates_lat and candidates_lon:
-        return candidates_lat[0], candidates_lon[0]
-    for c in df.columns:
-        if re.search(r"coord|coordenad", c, re.I):
-            try:
-                tmp = df[c].astype(str).str.extract(r"(-?\d+[\.,]?\d*)\s*[,;]\s*(-?\d+[\.,]?\d*)")
-                tmp.columns = ["LATITUDE", "LONGITUDE"]
-                tmp["LATITUDE"] = tmp["LATITUDE"].str.replace(",", ".", regex=False).astype(float)
-                tmp["LONGITUDE"] = tmp["LONGITUDE"].str.replace(",", ".", regex=False).astype(float)
-                df["__LAT__"], df["__LON__"] = tmp["LATITUDE"], tmp["LONGITUDE"]
-                return "__LAT__", "__LON__"
-            except Exception:
-                return None
-    return None
-
-def add_base_tiles(m: folium.Map):
-    tiles = [
-        ("CartoDB Positron", "https://{s}.basemaps.cartocdn.com/light_all/{z}/{x}/{y}{r}.png", "© OpenStreetMap, © CARTO"),
-        ("CartoDB Dark", "https://{s}.basemaps.cartocdn.com/dark_all/{z}/{x}/{y}{r}.png", "© OpenStreetMap, © CARTO"),
-        ("Esri Satellite", "https://server.arcgisonline.com/ArcGIS/rest/services/World_Imagery/MapServer/tile/{z}/{y}/{x}", "Tiles © Esri"),
-        ("Open Street Map", "https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png", "© OpenStreetMap contributors"),
-    ]
-    for name, url, attr in tiles:
-        folium.TileLayer(tiles=url, name=name, attr=attr).add_to(m)
-
-def load_geojson_any(path_candidates):
-    for p in path_candidates:
-        if p and os.path.exists(p):
-            try:
-                with open(p, "r", encoding="utf-8") as f:
-                    return json.load(f)
-            except Exception as e:
-                st.warning(f"Erro ao ler {p}: {e}")
-    return None
-
-def br_money(x):
-    try:
-        s = str(x).replace("R$", "").strip()
-        if "," in s and s.count(".") >= 1:
-            s = s.replace(".", "")
-        v = float(s.replace(",", "."))
-        return f"R$ {v:,.2f}".replace(",", "_").replace(".", ",").replace("_", ".")
-    except Exception:
-        return str(x)
-
-def pick(colnames, *options):
-    cols = list(colnames)
-    for o in options:
-        if o in cols:
-            return o
-    lower = {c.lower(): c for c in cols}
-    for o in options:
-        if o.lower() in lower:
-            return lower[o.lower()]
+# Modo de renderização escolhido na barra lateral (main); vale para todos os show_map do rerun
+MAPA_INCREMENTAL = True
+
+def show_map(m: folium.Map, camadas, key: str, width=None, height=700, collapsed=True, returned_objects=()):
+    # camadas: lista de FeatureGroup com os dados; o mapa 'm' só tem tiles e plugins
+    controle = folium.LayerControl(collapsed=collapsed)
+    if MAPA_INCREMENTAL:
+        # O mapa base é montado uma vez no navegador (mantém zoom/posição);
+        # a cada rerun só os FeatureGroups são reenviados.
+        # returned_objects limita o que provoca rerun (ex.: só os desenhos, não pan/zoom)
+        with stage("serializacao", mapa=key):
+            return st_folium(
+                m, key=key, feature_group_to_add=camadas, layer_control=controle,
+                returned_objects=list(returned_objects), width=width, height=height, use_container_width=width is None,
+            )
+    for camada in camadas:
+        camada.add_to(m)
+    controle.add_to(m)
+    with stage("serializacao", mapa=key):
+        folium_static(m, width=width, height=height)
     return None
 
-def sniff_read_csv(path: str) -> pd.DataFrame:
-    try:
-        with open(path, "r", encoding="utf-8-sig") as f:
-            sample = f.read(4096); f.seek(0)
-            sep = ";" if sample.count(";") > sample.count(",") else ","
-            return pd.read_csv(f, sep=sep)
-    except Exception as e:
-        st.error(f"Falha ao ler CSV em '{path}': {e}")
-        return pd.DataFrame()
-
-def to_float_series(s: pd.Series) -> pd.Series:
-    def _conv(v):
-        if pd.isna(v): return None
-        txt = str(v)
-        m = re.search(r"-?\d+[.,]?\d*", txt)
-        if not m: return None
-        try: return float(m.group(0).replace(",", "."))
-        except Exception: return None
-    return s.apply(_conv)
-
-def norm_col(c: str) -> str:
-    s = unicodedata.normalize("NFKD", str(c))
-    s = "".join(ch for ch in s if not unicodedata.combining(ch))
-    s = s.strip().lower()
-    s = re.sub(r"[^a-z0-9]+", "_", s)
-    return s.strip("_")
-
-def geojson_bounds(gj: dict):
-    if not gj:
-        return None
-    lats, lons = [], []
-
-    def _ingest_coords(coords):
-        if isinstance(coords, (list, tuple)):
-            if len(coords) == 2 and isinstance(coords[0], (int, float)) and isinstance(coords[1], (int, float)):
-                lon, lat = coords[0], coords[1]
-                lons.append(lon); lats.append(lat)
-            else:
-                for c in coords:
-                    _ingest_coords(c)
-
-    def _walk_feature(f):
-        geom = f.get("geometry", {})
-        coords = geom.get("coordinates", [])
-        _ingest_coords(coords)
-
-    t = gj.get("type")
-    if t == "FeatureCollection":
-        for f in gj.get("features", []):
-            _walk_feature(f)
-    elif t == "Feature":
-        _walk_feature(gj)
-    else:
-        _ingest_coords(gj.get("coordinates", []))
-
-    if not lats or not lons:
-        return None
-    return (min(lats), min(lons)), (max(lats), max(lons))
-
-# =====================================================
-# Layout Principal
-# =====================================================
-css_global()
-create_header()
-
-# Abas principais
-aba1, aba2, aba3 = st.tabs(["🏠 Página Inicial", "🧭 Malha de Transportes", "🗺️ Mapa de Calor"])
-
 # =====================================================
 # 1) Página Inicial - Atualizada (com hover animado nos KPI)
 # =====================================================
-with aba1:
+def page_inicio():
     # CSS das animações de hover dos KPI
     st.markdown("""
     <style>
@@ -569,7 +472,7 @@ with aba1:
 # ==============================================================================================================================================================
 # 2) Malha de Transportes - COM MAPAS FUNCIONAIS
 # ==============================================================================================================================================================
-with aba2:
+def page_malha():
     # Cabeçalho em card consolidado (um único bloco)
     render_card(
         "<h2>🧭 Malha de Transportes</h2>",
@@ -577,82 +480,34 @@ with aba2:
     )
 
     # Carrega o arquivo Excel da pasta Github
-    EXCEL_FILE_CANDIDATES = ["Unidades de Atendimento.xlsx", "dados/Unidades de Atendimento.xlsx", "/mnt/data/Unidades de Atendimento.xlsx"]
-    EXCEL_FILE = next((p for p in EXCEL_FILE_CANDIDATES if os.path.exists(p)), None)
+    EXCEL_FILE = find_file(UNIT_FILE_CANDIDATES)
 
     if EXCEL_FILE is None:
         st.error("❌ Arquivo 'Unidades de Atendimento.xlsx' não encontrado.")
-        st.stop()
+        return
 
+    # Leitura + normalização + correção das coordenadas, uma vez por versão do arquivo
+    # (compartilhadas entre as sessões; aqui só se filtra, nunca se altera)
     try:
-        df_unidades_raw = pd.read_excel(EXCEL_FILE)
-    except Exception as e:
-        st.error(f"Erro ao ler o arquivo Excel: {e}")
-        st.stop()
-
-    if df_unidades_raw.empty:
+        df_map, unit_cols = load_units(EXCEL_FILE)
+    except EmptyWorkbookError:
         st.error("O arquivo está vazio.")
-        st.stop()
-    
-    # Normaliza os nomes das colunas
-    colmap = {c: norm_col(c) for c in df_unidades_raw.columns}
-    df = df_unidades_raw.rename(columns=colmap).copy()  # usa 'df' como nome principal
-    
-    # Detecta colunas de latitude e longitude
-    lat_col = next((c for c in df.columns if c in {"latitude", "lat"}), None)
-    lon_col = next((c for c in df.columns if c in {"longitude", "long", "lon"}), None)
-    
-    if not lat_col or not lon_col:
-        coords = autodetect_coords(df_unidades_raw.copy())
-        if coords:
-            lat_col, lon_col = coords
-    
-    if not lat_col or not lon_col:
+        return
+    except CoordColumnsError:
         st.error("Não foi possível localizar colunas de latitude/longitude.")
-        st.stop()
-    
-    # Converte coordenadas para numérico
-    df["__LAT__"] = to_float_series(df[lat_col])
-    df["__LON__"] = to_float_series(df[lon_col])
-
-    # Heurística para corrigir inversão e sinal — ajustada para o território brasileiro
-    lat_s = pd.to_numeric(df["__LAT__"], errors="coerce")
-    lon_s = pd.to_numeric(df["__LON__"], errors="coerce")
+        return
+    except Exception as e:
+        st.error(f"Erro ao ler o arquivo Excel: {e}")
+        return
 
-    def _pct_inside(a, b):
-        try:
-            # Brasil: lat entre -35 e +5, lon entre -75 e -34
-            m = (a.between(-35.0, 5.0)) & (b.between(-75.0, -34.0))
-            return float(m.mean())
-        except Exception:
-            return 0.0
-
-    cands = [
-        ("orig", lat_s, lon_s, _pct_inside(lat_s, lon_s)),
-        ("swap", lon_s, lat_s, _pct_inside(lon_s, lat_s)),
-        ("neg_lon", lat_s, lon_s.mul(-1.0), _pct_inside(lat_s, lon_s.mul(-1.0))),
-        ("swap_neg", lon_s, lat_s.mul(-1.0), _pct_inside(lon_s, lat_s.mul(-1.0))),
-    ]
-    best = max(cands, key=lambda x: x[3])
-    if best[0] != "orig" and best[3] >= cands[0][3]:
-        df["__LAT__"], df["__LON__"] = best[1], best[2]
-
-    df_map = df.dropna(subset=["__LAT__", "__LON__"]).copy()
-
-    # Campos para popup/tabela — adaptados ao Excel
-    cols = list(df_map.columns)
-    def pick_norm(*options):
-        return next((c for c in cols if c in [norm_col(o) for o in options]), None)
-
-    c_nome    = pick_norm("Nome da Unidade", "Unidade")          # Nome da unidade (ex: General Mills)
-    c_tipo  = pick_norm("Tipo")                  # Tipo: CD, Fábrica, TP, OPL
-    c_abastec  = pick_norm("Abastecedor")
-    c_cidade = pick_norm("Cidade")               # Cidade como "empresa" visual
-    c_uf  = pick_norm("UF")                      # UF como "bairro"
+    c_nome, c_tipo, c_abastec, c_cidade, c_uf = (unit_cols[k] for k in ("nome", "tipo", "abastec", "cidade", "uf"))
 
     st.success(f"✅ **{len(df_map)} unidade(s) de atendimento** com coordenadas válidas encontradas")
+    resumo_coords = repair_summary(df_map.attrs.get("coordenadas"))
+    if resumo_coords:
+        st.info(f"🧭 {resumo_coords}.")
 
-    # Camadas laterais necessárias (mantidas)
+    # Camadas laterais necessárias (mantidas; leitura com geometry.load_geojson_any)
     #base_dir_candidates = ["dados", "/mnt/data"]
     #gj_distritos = load_geojson_any([os.path.join(b, "milha_dist_polig.geojson") for b in base_dir_candidates])
     #gj_sede      = load_geojson_any([os.path.join(b, "Distritos_pontos.geojson") for b in base_dir_candidates])
@@ -680,90 +535,10 @@ with aba2:
     with col_map:
         st.markdown("### 🗺️ Mapa Interativo")
 
-        # Centraliza no Brasil
-        m2 = folium.Map(location=[-15.0, -55.0], zoom_start=4, tiles=None)
-        add_base_tiles(m2)
-        Fullscreen(position='topright').add_to(m2)
-        MeasureControl().add_to(m2)
-        MousePosition().add_to(m2)
-        Draw(export=True).add_to(m2)
-
-        if not df_map.empty:
-            sw = [df_map["__LAT__"].min(), df_map["__LON__"].min()]
-            ne = [df_map["__LAT__"].max(), df_map["__LON__"].max()]
-            m2.fit_bounds([sw, ne], padding=(50, 50))
-
-
-      # Função de cor por tipo
-        def get_icon_color(tipo):
-            t = str(tipo).strip().lower()
-            if "cd" == t:
-                return "blue"
-            elif "fábrica" in t or "fabrica" in t:
-                return "darkred"
-            elif "opl" == t:
-                return "purple"
-            elif "tp" == t:
-                return "orange"
-            return "gray"
-
-
-         # Adiciona marcadores conforme filtros
-        for _, row in df_map.iterrows():
-            tipo_val = str(row.get(c_tipo, "")).strip()
-            if not tipo_val:
-                continue
-        
-            # Decide se exibe com base nos checkboxes
-            exibir = False
-            if tipo_val == "CD" and show_cd:
-                exibir = True
-            elif tipo_val == "Fábrica" and show_fabrica:
-                exibir = True
-            elif tipo_val == "TP" and show_tp:
-                exibir = True
-            elif tipo_val == "OPL" and show_opl:
-                exibir = True
-    
-            if not exibir:
-                continue
-
-            nome      = str(row.get(c_nome, "Unidade")) if c_nome else "Unidade"
-            abastec   = str(row.get(c_abastec, "-")) if c_abastec else "-"
-            cidade    = str(row.get(c_cidade, "-")) if c_cidade else "-"
-            uf        = str(row.get(c_uf, "-")) if c_uf else "-"
-
-            popup_html = f"""
-            <div style="font-family:Arial; font-size:13px">
-                <h4 style="margin:4px 0 8px 0">📍 {nome}</h4>
-                <p><b>Tipo:</b> {tipo_val}</p>
-                <p><b>Abastecido por:</b> {abastec}</p>
-                <p><b>Localização:</b> {cidade} - {uf}</p>
-            </div>
-            """
-
-            folium.Marker(
-                location=[row["__LAT__"], row["__LON__"]],
-                tooltip=f"{tipo_val}: {nome}",
-                popup=folium.Popup(popup_html, max_width=300),
-                icon=folium.Icon(color=get_icon_color(tipo_val), icon="building", prefix="fa")
-            ).add_to(m2)
-
-        # Ajusta zoom para abranger todas as unidades visíveis
-        if show_cd or show_fabrica or show_tp or show_opl:
-            visible_df = df_map[
-                ((df_map[c_tipo] == "CD") & show_cd) |
-                ((df_map[c_tipo] == "Fábrica") & show_fabrica) |
-                ((df_map[c_tipo] == "TP") & show_tp) |
-                ((df_map[c_tipo] == "OPL") & show_opl)
-            ]
-            if not visible_df.empty:
-                sw = [visible_df["__LAT__"].min(), visible_df["__LON__"].min()]
-                ne = [visible_df["__LAT__"].max(), visible_df["__LON__"].max()]
-                m2.fit_bounds([sw, ne], padding=(30, 30))
-    
-        folium.LayerControl(collapsed=False).add_to(m2)
-        folium_static(m2, width=1200, height=700)
+        tipos_visiveis = {"CD": show_cd, "Fábrica": show_fabrica, "TP": show_tp, "OPL": show_opl}
+        # (no modo incremental o mapa base não muda, para preservar a visão do usuário)
+        m2, grupos_tipo, visible_df = build_units_map(df_map, unit_cols, tipos_visiveis, fit_visible=not MAPA_INCREMENTAL)
+        show_map(m2, grupos_tipo, key="mapa_unidades", width=1200, height=700, collapsed=False)
    
 # ========== TABELA ==========
     st.markdown("### 📋 Tabela de Unidades")
@@ -777,59 +552,83 @@ with aba2:
 # 3) Mapa de Calor
 # ==============================================================================================================================================================
 
-with aba3:
+def page_calor():
+    # Armazém particionado por ano fiscal (history_store.py); sem ele, lê a planilha única
+    store = HistoryStore()
+    anos_store = store.fiscal_years()
+    titulo_dados = f"{anos_store[0]}–{anos_store[-1]}" if len(anos_store) > 1 else (anos_store or ["F25"])[0]
+
     render_card(
-        "<h2>🗺️ Mapa de Calor - Dados de F25</h2>",
+        f"<h2>🗺️ Mapa de Calor - Dados de {titulo_dados}</h2>",
         "<p>Visualize a distribuição geográfica de entregas, peso e faturamento por região</p>",
     )
 
-    # Carrega o arquivo Histórico F25.xlsx
-    HIST_FILE_CANDIDATES = [
-        "Histórico F25.xlsx",
-        "dados/Histórico F25.xlsx",
-        "/mnt/data/Histórico F25.xlsx"
-    ]
-    HIST_FILE = next((p for p in HIST_FILE_CANDIDATES if os.path.exists(p)), None)
-
-    if HIST_FILE is None:
-        st.error("❌ Arquivo 'Histórico F25.xlsx' não encontrado.")
-        st.stop()
-
-    try:
-        df_hist = pd.read_excel(HIST_FILE)
-    except Exception as e:
-        st.error(f"Erro ao ler 'Histórico F25.xlsx': {e}")
-        st.stop()
-
-    if df_hist.empty:
-        st.warning("⚠️ O arquivo de histórico está vazio.")
-        st.stop()
-
-    # Normaliza colunas
-    colmap = {c: norm_col(c) for c in df_hist.columns}
-    df = df_hist.rename(columns=colmap).copy()
-
-    # Detecta latitude/longitude
-    lat_col = next((c for c in df.columns if c in {"latitude", "lat"}), None)
-    lon_col = next((c for c in df.columns if c in {"longitude", "long", "lon"}), None)
+    if anos_store:
+        anos_sel = st.multiselect("📚 Anos fiscais", anos_store, default=anos_store[-1:], key="anos_fiscais")
+        if not anos_sel:
+            st.info("Selecione ao menos um ano fiscal.")
+            return
+        anos_sel = tuple(sorted(anos_sel))
+        DATA_VERSION = f"{store.version}|{','.join(anos_sel)}"
+        CACHE_DIR = cache_dir_for(store.root)
+        # Cada ano fiscal é lido uma vez por versão do armazém e compartilhado entre as sessões (a aba só lê);
+        # vários anos são juntados a cada rerun, sem guardar no cache uma cópia por combinação escolhida
+        anos_df = [derived(store.version, "historico_ano", ano, lambda ano=ano: store.read_year(ano, schema="historico"))
+                   for ano in anos_sel]
+        df = combine_years(anos_df, schema="historico")
+    else:
+        # Carrega o arquivo Histórico F25.xlsx
+        HIST_FILE = find_file(HIST_FILE_CANDIDATES)
 
-    if not lat_col or not lon_col:
-        st.error("Colunas 'Latitude' e 'Longitude' não encontradas no arquivo de histórico.")
-        st.stop()
+        if HIST_FILE is None:
+            st.error("❌ Arquivo 'Histórico F25.xlsx' não encontrado.")
+            return
 
-    df["__LAT__"] = to_float_series(df[lat_col])
-    df["__LON__"] = to_float_series(df[lon_col])
-    df = df.dropna(subset=["__LAT__", "__LON__"]).copy()
+        # Leitura + normalização (cacheada por caminho/mtime/tamanho em data_loader)
+        try:
+            df = load_workbook(HIST_FILE, schema="historico", repair=True)
+        except EmptyWorkbookError:
+            st.warning("⚠️ O arquivo de histórico está vazio.")
+            return
+        except CoordColumnsError:
+            st.error("Colunas 'Latitude' e 'Longitude' não encontradas no arquivo de histórico.")
+            return
+        except Exception as e:
+            st.error(f"Erro ao ler 'Histórico F25.xlsx': {e}")
+            return
+        # Versão do frame (arquivo + normalização + variante): chave dos dados derivados e das colunas .npy
+        DATA_VERSION = frame_version(HIST_FILE, schema="historico", repair=True)
+        CACHE_DIR = cache_dir_for(HIST_FILE)
+
+    # Validação do esquema (schema.py): avisa sobre valores descartados na conversão de tipos
+    esquema = df.attrs.get("esquema") or {}
+    if esquema.get("invalidos"):
+        st.warning("⚠️ Valores não numéricos ignorados: "
+                   + ", ".join(f"{c} ({n} linha(s))" for c, n in esquema["invalidos"].items()))
+    # Correção das coordenadas (coord_repair.py): linhas invertidas/sem sinal/sem separador decimal
+    resumo_coords = repair_summary(df.attrs.get("coordenadas"))
+    if resumo_coords:
+        st.info(f"🧭 {resumo_coords}.")
 
     if df.empty:
         st.error("Nenhum dado com coordenadas válidas encontrado.")
-        st.stop()
+        return
 
     # Identifica colunas de métricas (ajuste os nomes conforme seu Excel)
     c_entregas = "entregas"
     c_peso     = ("peso")
     c_fat      = ("faturamento")
 
+    # Coluna de data/período (opcional): com ela, o histórico vira um cubo período × célula × métrica
+    c_periodo = find_period_column(df)
+    cube = None
+    if c_periodo:
+        with stage("agregacao", dado="cubo_periodos", linhas=len(df)):
+            cube = derived(DATA_VERSION, "cubo_periodos", c_periodo,
+                           lambda: PeriodCube.from_frame(df, c_periodo, [c_entregas, c_peso, c_fat]))
+        if not len(cube):
+            cube = None
+
 
       # ========== PAINEL DE MÉTRICAS NA HORIZONTAL ==========
 
@@ -851,168 +650,266 @@ with aba3:
         show_heat_entregas = st.checkbox("📦 Entregas", value=False, key="heat_entregas")
         show_heat_peso = st.checkbox("⚖️ Peso", value=False, key="heat_peso")
         show_heat_fat = st.checkbox("💰 Faturamento", value=False, key="heat_fat")
+        agrupar_calor = st.checkbox("🧮 Agregar em grade", value=True, key="heat_grid",
+                                    help="Envia ao navegador um ponto por célula da grade em cada faixa de zoom, em vez de todas as linhas")
 
     with col3:
         st.markdown("### 🎨 Estilo")
         radius_heat = st.slider("Raio do calor", 10, 50, 25)
         blur_heat = st.slider("Desfoque", 5, 30, 15)
+        escala = st.selectbox("📏 Escala", list(SCALES), index=list(SCALES).index(DEFAULT_SCALE),
+                              format_func=SCALES.get, key="escala",
+                              help="Mesma escala para o raio das bolhas e a intensidade do calor")
+        somar_locais = st.checkbox("📍 Somar pontos no mesmo local", value=False, key="agregar_pontos",
+                                   help="Uma bolha/ponto de calor por local, com os totais e o número de linhas no popup")
+        casas_locais = None
+        if somar_locais:
+            casas_locais = st.select_slider("Precisão do local", options=[3, 4, 5], value=COLOCATED_DECIMALS,
+                                            format_func=lambda d: {3: "~110 m", 4: "~11 m", 5: "~1 m"}[d],
+                                            key="casas_pontos")
+        nivel_regiao = st.radio("🗺️ Mapa por", ["pontos", *LEVELS], format_func=lambda n: LEVELS.get(n, "Pontos"),
+                                horizontal=True, key="nivel_regiao",
+                                help="UF/Município: regiões coloridas pelo total da métrica (limites GeoJSON locais)")
+        if nivel_regiao != "pontos":
+            metrica_regiao = st.selectbox("Métrica das regiões", list(METRICS), format_func=lambda c: METRICS[c]["label"],
+                                          key="metrica_regiao")
                
 
+# ========== PERÍODO ==========
+    modo_periodo = "Todos os períodos"
+    if cube is not None:
+        st.markdown("### 🗓️ Período")
+        col_p1, col_p2 = st.columns([1, 3])
+        with col_p1:
+            modo_periodo = st.radio("Visualização", ["Todos os períodos", "Um período", "Animação"], key="modo_periodo")
+        with col_p2:
+            if modo_periodo == "Um período":
+                periodo = st.select_slider("Mês", options=cube.labels, value=cube.labels[-1], key="periodo")
+                i_periodo = cube.labels.index(periodo)
+                st.caption(f"{int(cube.counts[i_periodo].sum()):,} linha(s) no período".replace(",", "."))
+            elif modo_periodo == "Animação":
+                metrica_anim = st.selectbox("Métrica animada", list(cube.metrics),
+                                            format_func=lambda c: METRICS[c]["label"], key="metrica_anim")
+                st.caption("Use a barra de tempo no canto do mapa para percorrer os meses.")
+            else:
+                st.caption(f"{len(cube)} período(s), de {cube.labels[0]} a {cube.labels[-1]}.")
+
 
 # ========== MAPA DE BOLHAS ==========
-    # Cria o mapa
-    m3 = folium.Map(location=[-23.5, -46.6], zoom_start=6, tiles=None)
-    add_base_tiles(m3)
-    Fullscreen(position='topright').add_to(m3)
-    MeasureControl().add_to(m3)
-    MousePosition().add_to(m3)
-    Draw(export=True).add_to(m3)
-    
-    # Pré-calcula os valores máximos para escalar as bolhas
-    max_entregas = df[c_entregas].max() if c_entregas and c_entregas in df.columns else 1
-    max_peso     = df[c_peso].max()     if c_peso     and c_peso     in df.columns else 1
-    max_fat      = df[c_fat].max()      if c_fat      and c_fat      in df.columns else 1
-    
-    # Função segura para calcular o raio (em pixels, depois convertido para metros)
-    def scale_radius(value, max_val, max_radius_meters=15000):
-        if pd.isna(value) or value <= 0 or max_val <= 0:
-            return 0
-        # Usa escala logarítmica para melhor visualização
-        radius = 300 + (np.log1p(value) / np.log1p(max_val)) * max_radius_meters
-        return min(radius, max_radius_meters)
-    
-    added_any = False
-    
-    # --- Camada: Entregas ---
-    if show_bolhas_entregas and c_entregas and c_entregas in df.columns:
-        for _, row in df.iterrows():
-            val = row[c_entregas]
-            radius = scale_radius(val, max_entregas)
-            if radius <= 0:
-                continue
-            popup = f"<b>Entregas:</b> {val:,.0f}"
-            folium.Circle(
-                location=[row["__LAT__"], row["__LON__"]],
-                radius=radius,  # já em metros
-                color="#1E3A8A",
-                fill=True,
-                fillColor="#1E3A8A",
-                fillOpacity=0.6,
-                popup=folium.Popup(popup, max_width=200),
-                tooltip=f"Entregas: {val:,.0f}"
-            ).add_to(m3)
-        added_any = True
-    
-    # --- Camada: Peso ---
-    if show_bolhas_peso and c_peso and c_peso in df.columns:
-        for _, row in df.iterrows():
-            val = row[c_peso]
-            radius = scale_radius(val, max_peso)
-            if radius <= 0:
-                continue
-            popup = f"<b>Peso:</b> {val:,.2f} ton"
-            folium.Circle(
-                location=[row["__LAT__"], row["__LON__"]],
-                radius=radius,
-                color="#059669",
-                fill=True,
-                fillColor="#059669",
-                fillOpacity=0.6,
-                popup=folium.Popup(popup, max_width=200),
-                tooltip=f"Peso: {val:,.2f} ton"
-            ).add_to(m3)
-        added_any = True
-    
-    # --- Camada: Faturamento ---
-    if show_bolhas_fat and c_fat and c_fat in df.columns:
-        for _, row in df.iterrows():
-            val = row[c_fat]
-            radius = scale_radius(val, max_fat)
-            if radius <= 0:
-                continue
-            popup = f"<b>Faturamento:</b> R$ {val:,.2f}"
-            folium.Circle(
-                location=[row["__LAT__"], row["__LON__"]],
-                radius=radius,
-                color="#EA580C",
-                fill=True,
-                fillColor="#EA580C",
-                fillOpacity=0.6,
-                popup=folium.Popup(popup, max_width=200),
-                tooltip=f"Faturamento: R$ {val:,.2f}"
-            ).add_to(m3)
-        added_any = True
-
-    # Função para gerar dados de calor: [[lat, lon, valor], ...]
-    def get_heat_data(df, col_valor):
-        # Remove valores nulos ou <= 0
-        df_clean = df[[ "__LAT__", "__LON__", col_valor ]].dropna()
-        df_clean = df_clean[df_clean[col_valor] > 0]
-        # Normaliza para evitar pesos extremos (opcional)
-        max_val = df_clean[col_valor].max()
-        df_clean["weight"] = df_clean[col_valor] / max_val  # escala 0–1
-        return df_clean[["__LAT__", "__LON__", "weight"]].values.tolist()
-
-    # --- Mapa de Calor ---
-    if show_heat_entregas and c_entregas in df.columns:
-        heat_data = get_heat_data(df, c_entregas)
-        if heat_data:
-            HeatMap(
-                heat_data,
-                name="Calor: Entregas",
-                radius=radius_heat,
-                blur=blur_heat,
-                min_opacity=0.4,
-                gradient={0.4: 'blue', 0.6: 'lime', 0.8: 'orange', 1.0: 'red'}
-            ).add_to(m3)
-
-    if show_heat_peso and c_peso in df.columns:
-        heat_data = get_heat_data(df, c_peso)
-        if heat_data:
-            HeatMap(
-                heat_data,
-                name="Calor: Peso",
-                radius=radius_heat,
-                blur=blur_heat,
-                min_opacity=0.4,
-                gradient={0.4: 'green', 0.6: 'yellow', 0.8: 'orange', 1.0: 'red'}
-            ).add_to(m3)
-
-    if show_heat_fat and c_fat in df.columns:
-        heat_data = get_heat_data(df, c_fat)
-        if heat_data:
-            HeatMap(
-                heat_data,
-                name="Calor: Faturamento",
-                radius=radius_heat,
-                blur=blur_heat,
-                min_opacity=0.4,
-                gradient={0.4: 'purple', 0.6: 'violet', 0.8: 'orange', 1.0: 'red'}
-            ).add_to(m3)
-
-
-
-
-
-    # Ajusta o zoom para cobrir todos os pontos, se houver
-    if added_any:
-        sw = [df["__LAT__"].min(), df["__LON__"].min()]
-        ne = [df["__LAT__"].max(), df["__LON__"].max()]
-        m3.fit_bounds([sw, ne], padding=(50, 50))
-    
-    folium.LayerControl().add_to(m3)
-    folium_static(m3, width=None, height=700)  # width=None → 100% da largura
+    # Dados derivados (máximos, bolhas, calor) ficam em cache por versão do arquivo + métrica;
+    # mexer só em raio/desfoque reconstrói o mapa sem refazer esses cálculos
+    bolhas = [c for c, on in [(c_entregas, show_bolhas_entregas), (c_peso, show_bolhas_peso), (c_fat, show_bolhas_fat)] if on]
+    calor = [c for c, on in [(c_entregas, show_heat_entregas), (c_peso, show_heat_peso), (c_fat, show_heat_fat)] if on]
+
+    # Mapa por região: precisa do arquivo de limites do nível (ver choropleth.BOUNDARY_FILES)
+    arquivo_limites, totais_regiao = None, None
+    if nivel_regiao != "pontos" and modo_periodo != "Animação":
+        arquivo_limites = boundary_file(nivel_regiao)
+        if not arquivo_limites:
+            st.info(f"Arquivo de limites de {LEVELS[nivel_regiao]} não encontrado "
+                    f"({' ou '.join(BOUNDARY_FILES[nivel_regiao])} em {', '.join(BOUNDARY_DIRS)}); mostrando os pontos.")
+
+    # No modo incremental o zoom cobre sempre todos os pontos, para o mapa base ser o mesmo em todo rerun
+    if arquivo_limites:
+        # Um período: as regiões somam as células do cubo (~3 km), não as linhas
+        m3, camadas, totais_regiao = build_choropleth_map(
+            cube.frame(i_periodo) if modo_periodo == "Um período" else df, arquivo_limites, nivel_regiao,
+            metrica_regiao, version=f"{DATA_VERSION}|{periodo}" if modo_periodo == "Um período" else DATA_VERSION,
+            cache_dir=None if modo_periodo == "Um período" else CACHE_DIR, escala=escala,
+        )
+    elif modo_periodo == "Animação":
+        m3, camadas = build_animated_heat_map(cube, metrica_anim, radius=radius_heat, version=DATA_VERSION, escala=escala)
+    elif modo_periodo == "Um período":
+        # Fatia do cubo já agregada por célula; bolhas e calor na escala de todos os meses
+        m3, camadas = build_heat_map(
+            cube.frame(i_periodo), bolhas, calor, radius=radius_heat, blur=blur_heat, agrupar=agrupar_calor,
+            version=f"{DATA_VERSION}|{periodo}", fit_always=MAPA_INCREMENTAL, max_values=cube.max_values(escala),
+            escala=escala, agregar_pontos=casas_locais,
+        )
+    else:
+        m3, camadas = build_heat_map(
+            df, bolhas, calor, radius=radius_heat, blur=blur_heat, agrupar=agrupar_calor,
+            version=DATA_VERSION, fit_always=MAPA_INCREMENTAL, cache_dir=CACHE_DIR, escala=escala,
+            agregar_pontos=casas_locais,
+        )
+    saida_mapa = show_map(m3, camadas, key="mapa_calor", width=None, height=700,  # width=None → 100% da largura
+                          returned_objects=["all_drawings"])
+
+    if totais_regiao is not None:
+        fora = totais_regiao.attrs.get("fora", 0)
+        if fora:
+            st.caption(f"{fora:,} linha(s) fora dos limites de {LEVELS[nivel_regiao]}.".replace(",", "."))
+        with st.expander(f"📋 Totais por {LEVELS[nivel_regiao]}"):
+            regioes = totais_regiao.sort_values("pontos", ascending=False)
+            st.dataframe(pd.DataFrame({
+                LEVELS[nivel_regiao]: regioes["nome"],
+                "Código": regioes["codigo"],
+                "Pontos": regioes["pontos"].map(br_number),
+                "Entregas": regioes[c_entregas].map(br_number) if c_entregas in regioes else "0",
+                "Peso (ton)": regioes[c_peso].map(lambda v: br_number(v, 2)) if c_peso in regioes else "0,00",
+                "Faturamento": regioes[c_fat].map(br_money) if c_fat in regioes else "-",
+            }), use_container_width=True, hide_index=True)
+
+# ========== CONSULTAS ESPACIAIS ==========
+    # Com um período selecionado, as consultas somam só as linhas desse mês, como o mapa
+    periodo_sel = periodo if modo_periodo == "Um período" else None
+
+    def linhas_consulta():
+        if periodo_sel is None:
+            return df
+        meses = derived(DATA_VERSION, "periodos_linhas", c_periodo, lambda: to_periods(df[c_periodo]))
+        return df[(meses == cube.periods[i_periodo]).to_numpy()]
+
+    # Índice espacial reconstruído só quando a planilha (ou o período) muda
+    indice = derived(DATA_VERSION, "indice_espacial", None,
+                     lambda: SpatialIndex.from_frame(linhas_consulta(), [c_entregas, c_peso, c_fat]),
+                     periodo=periodo_sel)
+
+    def totais_linha(rotulo, pos):
+        tot = indice.totals(pos)
+        return {
+            "Área": rotulo,
+            "Pontos": br_number(tot["pontos"]),
+            "Entregas": br_number(tot.get(c_entregas, 0)),
+            "Peso (ton)": br_number(tot.get(c_peso, 0), 2),
+            "Faturamento": br_money(tot.get(c_fat, 0)),
+        }
+
+    # Formas desenhadas com o plugin Draw (só no modo incremental o mapa devolve os desenhos)
+    desenhos = (saida_mapa or {}).get("all_drawings") or []
+    if desenhos:
+        st.markdown("### ✏️ Totais nas áreas desenhadas")
+        linhas = []
+        for i, feat in enumerate(desenhos, 1):
+            geom = feat.get("geometry") or {}
+            raio_m = (feat.get("properties") or {}).get("radius")
+            rotulo = f"{i}. Círculo ({br_number(raio_m / 1000, 1)} km)" if raio_m else f"{i}. {geom.get('type', '-')}"
+            linhas.append(totais_linha(rotulo, indice.within_geometry(geom, radius_m=raio_m)))
+        st.dataframe(pd.DataFrame(linhas), use_container_width=True, hide_index=True)
+    elif MAPA_INCREMENTAL:
+        st.caption("✏️ Desenhe um polígono, retângulo ou círculo no mapa para ver os totais da área.")
+
+    UNIT_FILE = find_file(UNIT_FILE_CANDIDATES)
+    df_unid = None
+    if UNIT_FILE:
+        try:
+            df_unid, unid_cols = load_units(UNIT_FILE)
+        except Exception as e:
+            st.warning(f"Não foi possível ler as unidades: {e}")
+
+    if df_unid is not None:
+        with st.expander("📍 Totais em um raio a partir de uma unidade"):
+            nomes = df_unid[unid_cols["nome"]].astype(str) if unid_cols["nome"] else df_unid.index.astype(str)
+            col_u, col_r = st.columns([3, 2])
+            with col_u:
+                escolha = st.selectbox("Unidade", list(nomes), key="raio_unidade")
+            with col_r:
+                raio_km = st.slider("Raio (km)", 10, 500, 100, step=10, key="raio_km")
+            unidade = df_unid[nomes == escolha].iloc[0]
+            pos = indice.within_radius(float(unidade["__LAT__"]), float(unidade["__LON__"]), raio_km)
+            st.dataframe(pd.DataFrame([totais_linha(f"{escolha} — {raio_km} km", pos)]),
+                         use_container_width=True, hide_index=True)
+
+# ========== ÁREA DE ATENDIMENTO ==========
+        with st.expander("🏭 Área de atendimento (unidade mais próxima)"):
+            tipos_atend = st.multiselect("Tipos de unidade", list(UNIT_TYPES), default=list(FACILITY_TYPES), key="atend_tipos")
+            unidades_atend = facilities(df_unid, unid_cols, tipos_atend)
+            if unidades_atend.empty:
+                st.info("Selecione ao menos um tipo com unidades cadastradas.")
+            else:
+                resumo, _ = derived(f"{DATA_VERSION}|{dataset_version(UNIT_FILE)}", "atendimento", None,
+                                    lambda: catchment(linhas_consulta(), unidades_atend),
+                                    tipos=tuple(sorted(tipos_atend)), periodo=periodo_sel)
+                resumo = resumo.sort_values("pontos", ascending=False)
+                st.dataframe(pd.DataFrame({
+                    "Unidade": resumo["nome"],
+                    "Tipo": resumo["tipo"],
+                    "UF": resumo["uf"],
+                    "Pontos": resumo["pontos"].map(br_number),
+                    "Entregas": resumo[c_entregas].map(br_number) if c_entregas in resumo else "0",
+                    "Peso (ton)": resumo[c_peso].map(lambda v: br_number(v, 2)) if c_peso in resumo else "0,00",
+                    "Faturamento": resumo[c_fat].map(br_money) if c_fat in resumo else "-",
+                    "Dist. média (km)": resumo["dist_media_km"].map(lambda v: br_number(v, 1)),
+                    "Dist. máx. (km)": resumo["dist_max_km"].map(lambda v: br_number(v, 1)),
+                }), use_container_width=True, hide_index=True)
+
+# =====================================================
+# Depuração: tempos por etapa deste rerun
+# =====================================================
+def show_stage_log(etapas: StageLog):
+    with st.expander("⏱️ Tempos por etapa", expanded=True):
+        resumo_etapas = etapas.summary()
+        if resumo_etapas.empty:
+            st.caption("Nenhuma etapa medida neste rerun.")
+            return
+        st.dataframe(resumo_etapas.assign(
+            etapa=resumo_etapas["etapa"].map(STAGES).fillna(resumo_etapas["etapa"]),
+            bytes=resumo_etapas["bytes"] / 1e6, rss_delta=resumo_etapas["rss_delta"] / 1e6,
+            pico_rss=resumo_etapas["pico_rss"] / 1e6,
+        ).rename(columns={"etapa": "Etapa", "medicoes": "Medições", "segundos": "Segundos", "linhas": "Linhas",
+                          "bytes": "Payload (MB)", "rss_delta": "Δ RSS (MB)", "pico_rss": "Pico RSS (MB)"}),
+            use_container_width=True, hide_index=True)
+        st.caption(f"Execução {etapas.run}: cada medição abaixo também sai como JSON no log "
+                   f"('{LOGGER_NAME}').")
+        st.dataframe(etapas.frame(), use_container_width=True, hide_index=True)
 
 # =====================================================
 # Rodapé
 # =====================================================
-st.markdown("---")
-st.markdown(
-    f"""
-    <div style='text-align: center; color: {COLORS["text_light"]}; padding: 2rem;'>
-        <p><strong>Atlas Geoespacial de Transportes</strong> - Desenvolvido para transparência e planejamento estratégico</p>
-        <p style='font-size: 0.9rem;'>© 2025 Transporte Corporativo</p>
-    </div>
-    """,
-    unsafe_allow_html=True
-)
+def show_footer():
+    st.markdown("---")
+    st.markdown(
+        f"""
+        <div style='text-align: center; color: {COLORS["text_light"]}; padding: 2rem;'>
+            <p><strong>Atlas Geoespacial de Transportes</strong> - Desenvolvido para transparência e planejamento estratégico</p>
+            <p style='font-size: 0.9rem;'>© 2025 Transporte Corporativo</p>
+        </div>
+        """,
+        unsafe_allow_html=True
+    )
+
+# =====================================================
+# Layout Principal
+# =====================================================
+# Páginas do app: só a escolhida roda a cada rerun (st.tabs executaria as três e montaria todos os mapas)
+PAGES = {
+    "🏠 Página Inicial": page_inicio,
+    "🧭 Malha de Transportes": page_malha,
+    "🗺️ Mapa de Calor": page_calor,
+}
+
+def main():
+    global MAPA_INCREMENTAL
+    st.set_page_config(
+        page_title="Mapa de Calor - General Mills • Cajamar > São Paulo", 
+        layout="wide",
+        initial_sidebar_state="collapsed"
+    )
+    css_global()
+    create_header()
+
+    with st.sidebar:
+        modo_render = st.radio(
+            "Renderização dos mapas", ["Incremental", "Estática"], key="modo_render",
+            help="Incremental mantém o mapa aberto e atualiza só as camadas alteradas; Estática recria o mapa a cada interação",
+        )
+        debug_etapas = st.checkbox("⏱️ Tempos por etapa", key="debug_etapas",
+                                   help="Mostra tempo, linhas, bytes e pico de memória de cada etapa no fim da página")
+    MAPA_INCREMENTAL = modo_render == "Incremental"
+
+    # Etapas medidas neste rerun (profiling.stage); cada uma também vira uma linha JSON no stderr
+    configure_logging()
+    # O pico de memória zera o VmHWM do processo inteiro: só com o painel ligado, para não atrapalhar outras sessões
+    etapas = StageLog(peak=debug_etapas).start()
+
+    pagina = st.radio("Página", list(PAGES), horizontal=True, key="pagina", label_visibility="collapsed")
+    PAGES[pagina]()
+
+    if debug_etapas:
+        show_stage_log(etapas)
+    show_footer()
+
+
+# O Streamlit executa o script como __main__; importado (testes, render_maps, notebooks) não desenha nada
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# =====================================================
+# Cache LRU dos dados derivados (máximos, pontos de calor, bolhas)
+# =====================================================
+# Listas maiores que isto têm o tamanho estimado por amostra (ex.: quadros do HeatMapWithTime)
+_SAMPLE_ITEMS = 256
+
+
+def estimate_nbytes(value, _depth: int = 0) -> int:
+    """Memória aproximada de um valor do cache (arrays, frames, textos e contêineres deles)."""
+    if isinstance(value, np.memmap):
+        # .npy mapeado (colstore): as páginas são do cache do SO, compartilhadas entre processos
+        return 0
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (pd.DataFrame, pd.Series, pd.Index)):
+        uso = value.memory_usage(deep=True)
+        return int(uso.sum() if isinstance(uso, pd.Series) else uso)
+    if isinstance(value, (str, bytes)):
+        return sys.getsizeof(value)
+    nbytes = getattr(value, "nbytes", None)
+    if isinstance(nbytes, (int, np.integer)):
+        return int(nbytes)
+    if _depth > 4:
+        return sys.getsizeof(value)
+    if isinstance(value, dict):
+        itens = list(value.items())
+        amostra = itens[:_SAMPLE_ITEMS]
+        total = sum(estimate_nbytes(k, _depth + 1) + estimate_nbytes(v, _depth + 1) for k, v in amostra)
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        itens = list(value) if isinstance(value, (set, frozenset)) else value
+        amostra = itens[:_SAMPLE_ITEMS]
+        total = sum(estimate_nbytes(v, _depth + 1) for v in amostra)
+    elif hasattr(value, "__dict__"):
+        return sys.getsizeof(value) + estimate_nbytes(vars(value), _depth + 1)
+    else:
+        return sys.getsizeof(value)
+    if len(itens) > len(amostra):
+        total = total * len(itens) // len(amostra)
+    return sys.getsizeof(value) + total
+
+
+class LRUCache:
+    """LRU limitado pelo número de entradas e pela memória estimada (estimate_nbytes) de todas elas.
+
+    O tamanho é medido ao guardar; valores com `nbytes` próprio (grades de calor, cubo) são remedidos a
+    cada acerto, porque guardam o texto serializado depois de entrarem no cache.
+    """
+
+    def __init__(self, maxsize: int = 48, maxbytes=None):
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.hits = 0
+        self.misses = 0
+        self.nbytes = 0
+        self._data = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.Lock()
+        # Um lock por chave em cálculo: sessões simultâneas esperam o primeiro cálculo em vez de repeti-lo
+        self._pending = {}
+
+    def _evict(self, keep=None):
+        # Chamado com self._lock: descarta as menos usadas até caber nos dois limites
+        while self._data and (len(self._data) > self.maxsize
+                              or (self.maxbytes is not None and self.nbytes > self.maxbytes)):
+            key = next(iter(self._data))
+            if key == keep and len(self._data) == 1:
+                break
+            if key == keep:
+                self._data.move_to_end(key)
+                continue
+            self._data.pop(key)
+            self.nbytes -= self._sizes.pop(key)
+
+    def _lookup(self, key):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                value = self._data[key]
+                nbytes = getattr(value, "nbytes", None)
+                if isinstance(nbytes, int) and not isinstance(value, np.ndarray) and nbytes != self._sizes[key]:
+                    self.nbytes += nbytes - self._sizes[key]
+                    self._sizes[key] = nbytes
+                    self._evict(keep=key)
+                return True, value
+            return False, None
+
+    def get_or_compute(self, key, compute):
+        found, value = self._lookup(key)
+        if found:
+            return value
+        with self._lock:
+            key_lock = self._pending.setdefault(key, threading.Lock())
+        with key_lock:
+            found, value = self._lookup(key)
+            if found:
+                return value
+            with self._lock:
+                self.misses += 1
+            try:
+                value = compute()
+                size = estimate_nbytes(value)
+            except BaseException:
+                with self._lock:
+                    self._pending.pop(key, None)
+                raise
+            with self._lock:
+                # Maior que o limite inteiro: devolve sem guardar (não esvazia o cache por um valor só)
+                if self.maxbytes is None or size <= self.maxbytes:
+                    self._data[key] = value
+                    self._sizes[key] = size
+                    self.nbytes += size
+                    self._evict(keep=key)
+                self._pending.pop(key, None)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._sizes.clear()
+            self.nbytes = 0
+
+    def __len__(self):
+        return len(self._data)
+
+
+# Compartilhado pelo processo: a chave inclui a versão do dataset, então sessões diferentes reaproveitam.
+# O limite de memória vale para o processo todo (todas as sessões); MAPA_CACHE_MB muda o padrão de 1 GB.
+DERIVED_CACHE = LRUCache(maxsize=256, maxbytes=int(os.environ.get("MAPA_CACHE_MB", 1024)) * 2**20)
+
+
+def _view(value):
+    # Frames saem como visões rasas (como em data_loader.load_workbook): quem recebe pode acrescentar ou
+    # renomear colunas sem mexer no frame compartilhado entre as sessões
+    if isinstance(value, pd.DataFrame):
+        return value.copy(deep=False)
+    if type(value) is tuple:
+        return tuple(_view(v) for v in value)
+    return value
+
+
+def derived(version, kind: str, metric, compute, **filters):
+    """Memoiza compute() por (versão do dataset, tipo de dado, métrica, filtros ativos)."""
+    key = (version, kind, metric, tuple(sorted(filters.items())))
+    return _view(DERIVED_CACHE.get_or_compute(key, compute))
@@ -0,0 +1,102 @@
+"""Área de atendimento: atribui cada ponto de entrega à unidade mais próxima e soma as métricas por unidade.
+
+Exemplos:
+    python atendimento.py
+    python atendimento.py --tipos CD TP --saida areas_atendimento.csv --pontos pontos_atribuidos.csv
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from coord_repair import repair_summary
+from data_loader import find_file, load_workbook
+from mapas import HIST_FILE_CANDIDATES, METRICS, UNIT_FILE_CANDIDATES, UNIT_TYPES, load_units
+from spatial import nearest_facility
+
+# Unidades que atendem pontos de entrega (fábricas abastecem CDs, não clientes)
+FACILITY_TYPES = ("CD", "TP", "OPL")
+
+
+def facilities(df_units: pd.DataFrame, cols: dict, tipos=FACILITY_TYPES) -> pd.DataFrame:
+    """Unidades candidatas, com nome/tipo/abastecedor/cidade/uf e coordenadas, indexadas de 0 a n-1."""
+    tipo_s = df_units[cols["tipo"]].astype(str).str.strip() if cols.get("tipo") else pd.Series("", index=df_units.index)
+    sel = df_units[tipo_s.isin(tipos)] if cols.get("tipo") else df_units
+    out = pd.DataFrame({"tipo": tipo_s[sel.index]})
+    for key in ("nome", "abastec", "cidade", "uf"):
+        out[key] = sel[cols[key]].astype(str) if cols.get(key) else ""
+    if not cols.get("nome"):
+        out["nome"] = out["tipo"] + " " + pd.Series(range(1, len(out) + 1), index=out.index).astype(str)
+    out["__LAT__"] = sel["__LAT__"].astype("float64")
+    out["__LON__"] = sel["__LON__"].astype("float64")
+    return out.reset_index(drop=True)
+
+
+def catchment(df: pd.DataFrame, fac: pd.DataFrame, metrics=tuple(METRICS)):
+    """Devolve (resumo por unidade, atribuição por ponto).
+
+    A atribuição tem o mesmo índice de df, com a unidade mais próxima e a distância em km.
+    """
+    idx, dist = nearest_facility(df["__LAT__"], df["__LON__"], fac["__LAT__"], fac["__LON__"])
+    n = len(fac)
+    pontos = np.bincount(idx, minlength=n)
+
+    resumo = fac[["nome", "tipo", "abastec", "cidade", "uf"]].copy()
+    resumo["pontos"] = pontos
+    for col in metrics:
+        if col in df.columns:
+            vals = np.nan_to_num(df[col].to_numpy(dtype="float64", na_value=np.nan))
+            resumo[col] = np.bincount(idx, weights=vals, minlength=n)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        resumo["dist_media_km"] = np.bincount(idx, weights=dist, minlength=n) / pontos
+    dist_max = np.zeros(n)
+    np.maximum.at(dist_max, idx, dist)
+    resumo["dist_max_km"] = dist_max
+
+    atribuicao = pd.DataFrame({"unidade": fac["nome"].to_numpy()[idx], "distancia_km": dist}, index=df.index)
+    return resumo, atribuicao
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--unidades", default=find_file(UNIT_FILE_CANDIDATES), help="planilha de Unidades de Atendimento")
+    parser.add_argument("--historico", default=find_file(HIST_FILE_CANDIDATES), help="planilha de histórico")
+    parser.add_argument("--tipos", nargs="+", default=list(FACILITY_TYPES), choices=UNIT_TYPES, help="tipos de unidade que atendem")
+    parser.add_argument("--saida", default="areas_atendimento.csv", help="CSV com o resumo por unidade")
+    parser.add_argument("--pontos", help="CSV opcional com a unidade atribuída a cada ponto")
+    args = parser.parse_args(argv)
+
+    if not args.unidades:
+        parser.error("Arquivo 'Unidades de Atendimento.xlsx' não encontrado (use --unidades).")
+    if not args.historico:
+        parser.error("Arquivo 'Histórico F25.xlsx' não encontrado (use --historico).")
+
+    df_units, cols = load_units(args.unidades)
+    fac = facilities(df_units, cols, args.tipos)
+    if fac.empty:
+        parser.error(f"Nenhuma unidade dos tipos {', '.join(args.tipos)}.")
+    df = load_workbook(args.historico, schema="historico", repair=True)
+    for nome, frame in (("unidades", df_units), ("historico", df)):
+        resumo = repair_summary(frame.attrs.get("coordenadas"))
+        if resumo:
+            print(f"{nome}: {resumo}")
+
+    t0 = time.perf_counter()
+    resumo, atribuicao = catchment(df, fac)
+    secs = time.perf_counter() - t0
+
+    resumo.to_csv(args.saida, index=False)
+    if args.pontos:
+        # O histórico carregado só guarda as coordenadas convertidas: saem como latitude/longitude
+        pontos = df.drop(columns=["__LAT__", "__LON__"]).assign(
+            latitude=df["__LAT__"].astype("float64").round(6), longitude=df["__LON__"].astype("float64").round(6))
+        pontos.join(atribuicao).to_csv(args.pontos, index=False)
+    print(resumo.sort_values("pontos", ascending=False).to_string(index=False))
+    print(f"{len(df)} ponto(s) em {len(fac)} unidade(s) em {secs:.2f}s -> {args.saida}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
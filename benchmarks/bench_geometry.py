@@ -0,0 +1,123 @@
+"""Compara o geojson_bounds original (recursivo) com geometry.py e mede leitura, sidecar e simplificação.
+
+Malha sintética parecida com a de municípios: grade de células com fronteiras onduladas compartilhadas.
+Uso: python benchmarks/bench_geometry.py [lado_da_grade] [vertices_por_aresta]
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from geometry import GeometryArrays, deg_per_pixel, geojson_bounds, load_geometry  # noqa: E402
+
+
+# ---------- Versão original (MapaCalorCAJ.py) ----------
+def geojson_bounds_recursive(gj: dict):
+    if not gj:
+        return None
+    lats, lons = [], []
+
+    def _ingest_coords(coords):
+        if isinstance(coords, (list, tuple)):
+            if len(coords) == 2 and isinstance(coords[0], (int, float)) and isinstance(coords[1], (int, float)):
+                lon, lat = coords[0], coords[1]
+                lons.append(lon); lats.append(lat)
+            else:
+                for c in coords:
+                    _ingest_coords(c)
+
+    def _walk_feature(f):
+        geom = f.get("geometry", {})
+        coords = geom.get("coordinates", [])
+        _ingest_coords(coords)
+
+    t = gj.get("type")
+    if t == "FeatureCollection":
+        for f in gj.get("features", []):
+            _walk_feature(f)
+    elif t == "Feature":
+        _walk_feature(gj)
+    else:
+        _ingest_coords(gj.get("coordinates", []))
+
+    if not lats or not lons:
+        return None
+    return (min(lats), min(lons)), (max(lats), max(lons))
+
+
+def synthetic_mesh(lado: int = 75, k: int = 100, seed: int = 7) -> dict:
+    # lado x lado células sobre o Brasil; cada aresta tem k vértices com ruído perpendicular (sem autointerseção)
+    rng = np.random.default_rng(seed)
+    xs = np.linspace(-73.0, -35.0, lado + 1)
+    ys = np.linspace(-33.0, 5.0, lado + 1)
+    passo = min(xs[1] - xs[0], ys[1] - ys[0]) / k
+    t = np.linspace(0, 1, k)
+
+    def aresta(p, q):
+        pts = p + np.outer(t, q - p)
+        n = np.array([-(q - p)[1], (q - p)[0]]) / np.hypot(*(q - p))
+        ruido = rng.normal(0, passo * 0.3, k)
+        ruido[[0, -1]] = 0
+        return np.round(pts + np.outer(ruido, n), 6)
+
+    hor = {(i, j): aresta(np.array([xs[j], ys[i]]), np.array([xs[j + 1], ys[i]])) for i in range(lado + 1) for j in range(lado)}
+    ver = {(i, j): aresta(np.array([xs[j], ys[i]]), np.array([xs[j], ys[i + 1]])) for i in range(lado) for j in range(lado + 1)}
+    feats = []
+    for i in range(lado):
+        for j in range(lado):
+            anel = np.vstack([hor[i, j][:-1], ver[i, j + 1][:-1], hor[i + 1, j][::-1][:-1], ver[i, j][::-1]])
+            feats.append({"type": "Feature", "properties": {"CD_MUN": f"{i * lado + j:07d}", "NM_MUN": f"M{i}-{j}"},
+                          "geometry": {"type": "Polygon", "coordinates": [anel.tolist()]}})
+    return {"type": "FeatureCollection", "features": feats}
+
+
+def _timeit(fn):
+    t0 = time.perf_counter()
+    out = fn()
+    return time.perf_counter() - t0, out
+
+
+def main(lado: int = 75, k: int = 100):
+    gj = synthetic_mesh(lado, k)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "municipios.geojson")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(gj, f)
+        print(f"feições: {len(gj['features']):,} | arquivo {os.path.getsize(path) / 1e6:.1f} MB")
+
+        t_old, old = _timeit(lambda: geojson_bounds_recursive(gj))
+        t_new, new = _timeit(lambda: geojson_bounds(gj))
+        print(f"limites (dict) : recursivo {t_old * 1000:8.1f} ms | NumPy {t_new * 1000:8.1f} ms | "
+              f"{t_old / t_new:5.1f}x | iguais: {old == new}")
+        # Posições com altitude: a versão original não reconhece [lon, lat, z] como ponto
+        gj3 = {"type": "Polygon", "coordinates": [[[-46.6, -23.5, 760.0], [-46.5, -23.5, 760.0], [-46.5, -23.4, 760.0]]]}
+        print(f"  com altitude: recursivo {geojson_bounds_recursive(gj3)} | NumPy {geojson_bounds(gj3)}")
+
+        t_json, _ = _timeit(lambda: json.load(open(path, encoding="utf-8")))
+        t_first, geom = _timeit(lambda: load_geometry(path))
+        load_geometry.__globals__["_CACHE"].clear()
+        t_side, geom2 = _timeit(lambda: load_geometry(path))
+        t_mem, _ = _timeit(lambda: load_geometry(path))
+        print(f"arrays         : {len(geom.coords):,} vértices, {geom.nbytes / 1e6:.1f} MB (JSON só o parse: {t_json:.2f}s)")
+        print(f"  1ª leitura {t_first:.2f}s | sidecar .npz {t_side * 1000:.1f} ms | memória {t_mem * 1e6:.0f} µs | "
+              f"iguais: {np.array_equal(geom.coords, geom2.coords)}")
+        t_b, b = _timeit(lambda: (geom2.bounds, GeometryArrays._feature_bbox(geom2)))
+        print(f"  limites + bbox por feição a partir dos arrays: {t_b * 1000:.1f} ms")
+
+        for z in (4, 7, 10):
+            tol = deg_per_pixel(z)
+            t_s, s = _timeit(lambda: geom2.simplify(tol))
+            t_c, _ = _timeit(lambda: geom2.simplify(tol))
+            load_geometry(path, tol)
+            load_geometry.__globals__["_CACHE"].clear()
+            t_d, _ = _timeit(lambda: load_geometry(path, tol))
+            print(f"  simplifica z{z:<2} {t_s * 1000:8.1f} ms -> {len(s.coords):>9,} vértices | "
+                  f"em cache {t_c * 1e6:.0f} µs | sidecar {t_d * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:3]))
@@ -0,0 +1,74 @@
+"""Pico de memória (RSS) da leitura da planilha: pd.read_excel + normalize_frame vs. leitura em streaming.
+
+Cada modo roda num processo separado, para o pico de um não contaminar o outro.
+Uso: python benchmarks/bench_ingest.py [n_linhas] [arquivo.xlsx]
+"""
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from data_loader import normalize_frame, read_streaming  # noqa: E402
+from profiling import reset_peak_rss, rss_bytes  # noqa: E402
+
+
+def synthetic_history(n: int, seed: int = 7) -> pd.DataFrame:
+    # Mesmas colunas do Histórico F25, com coordenadas em texto (vírgula decimal) como nos extratos
+    rng = np.random.default_rng(seed)
+    lat = rng.uniform(-33.7, 5.2, n).round(6)
+    lon = rng.uniform(-73.9, -34.8, n).round(6)
+    return pd.DataFrame({
+        "Latitude": np.char.replace(np.char.mod("%.6f", lat), ".", ","),
+        "Longitude": np.char.replace(np.char.mod("%.6f", lon), ".", ","),
+        "Peso": rng.gamma(2.0, 800.0, n).round(3),
+        "Entregas": rng.integers(1, 40, n),
+        "Faturamento": rng.gamma(2.0, 9000.0, n).round(2),
+        "UF": rng.choice(["SP", "MG", "RJ", "PR", "BA", "PE"], n),
+    })
+
+
+def run(mode: str, path: str):
+    # Aquece os imports preguiçosos (pyarrow.compute etc.) para medir só a leitura
+    normalize_frame(pd.DataFrame({"Latitude": ["-1,5"], "Longitude": ["-40,2"]}))
+    reset_peak_rss()
+    rss0 = rss_bytes()
+    t0 = time.perf_counter()
+    if mode == "read_excel":
+        df = normalize_frame(pd.read_excel(path))
+    else:
+        df = read_streaming(path)
+    secs = time.perf_counter() - t0
+    print(json.dumps({
+        "modo": mode, "linhas": len(df), "segundos": round(secs, 2),
+        "bytes_final": int(df.memory_usage(deep=True).sum()),
+        "rss_inicial": rss0, "pico_rss": rss_bytes("VmHWM"),
+    }))
+
+
+def main():
+    if len(sys.argv) > 2 and sys.argv[1] == "--run":
+        return run(sys.argv[2], sys.argv[3])
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    path = sys.argv[2] if len(sys.argv) > 2 else os.path.join(ROOT, ".mapa_cache", f"bench_ingest_{n}.xlsx")
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        print(f"gerando {path} ({n} linhas)...")
+        synthetic_history(n).to_excel(path, index=False)
+
+    for mode in ("read_excel", "streaming"):
+        out = subprocess.run([sys.executable, __file__, "--run", mode, path], capture_output=True, text=True, check=True)
+        r = json.loads(out.stdout.strip().splitlines()[-1])
+        extra = (r["pico_rss"] - r["rss_inicial"]) / 1e6
+        print(f"{r['modo']:<11} {r['linhas']:>9} linhas  {r['segundos']:7.2f}s  "
+              f"final {r['bytes_final'] / 1e6:7.1f} MB  pico RSS +{extra:7.1f} MB "
+              f"({extra * 1e6 / r['bytes_final']:.1f}x o frame final)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Compara a escala vetorizada (scaling.py) com o cálculo original linha a linha de bolhas e calor.
+
+Uso: python benchmarks/bench_scaling.py [n_linhas]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from layers import scale_radius  # noqa: E402
+from mapas import heat_arrays  # noqa: E402
+from scaling import SCALES, scale_values  # noqa: E402
+
+
+# ---------- Versões originais (MapaCalorCAJ.py, uma chamada escalar por linha) ----------
+def scale_radius_rowwise(value, max_val, max_radius_meters=15000):
+    if pd.isna(value) or value <= 0 or max_val <= 0:
+        return 0
+    radius = 300 + (np.log1p(value) / np.log1p(max_val)) * max_radius_meters
+    return min(radius, max_radius_meters)
+
+
+def get_heat_data_rowwise(df, col_valor):
+    df_clean = df[["__LAT__", "__LON__", col_valor]].dropna()
+    df_clean = df_clean[df_clean[col_valor] > 0]
+    max_val = df_clean[col_valor].max()
+    df_clean["weight"] = df_clean[col_valor] / max_val
+    return df_clean[["__LAT__", "__LON__", "weight"]].values.tolist()
+
+
+def synthetic_metric(n: int, seed: int = 42) -> pd.DataFrame:
+    # Cauda longa (poucos clientes grandes), com vazios e zeros
+    rng = np.random.default_rng(seed)
+    peso = rng.lognormal(6.0, 1.6, n)
+    peso[rng.random(n) < 0.03] = np.nan
+    peso[rng.random(n) < 0.02] = 0.0
+    return pd.DataFrame({"__LAT__": rng.uniform(-33.7, 5.2, n), "__LON__": rng.uniform(-73.9, -34.8, n), "peso": peso})
+
+
+def _timeit(fn):
+    t0 = time.perf_counter()
+    out = fn()
+    return time.perf_counter() - t0, out
+
+
+def main(n: int = 1_000_000):
+    df = synthetic_metric(n)
+    vals = df["peso"]
+    max_val = vals.max()
+
+    t_old, old = _timeit(lambda: np.array([scale_radius_rowwise(v, max_val) for v in vals]))
+    t_new, new = _timeit(lambda: scale_radius(vals.to_numpy(), max_val))
+    igual_raio = bool(np.allclose(old, new))
+
+    t_old_h, old_h = _timeit(lambda: get_heat_data_rowwise(df, "peso"))
+    t_new_h, new_h = _timeit(lambda: heat_arrays(df["__LAT__"], df["__LON__"], vals, method="linear"))
+    igual_calor = bool(np.allclose(np.asarray(old_h)[:, 2], new_h[2]))
+
+    print(f"linhas: {n:,}")
+    print(f"raio das bolhas: original {t_old:8.3f}s | vetorizada {t_new:8.3f}s | {t_old / t_new:7.1f}x | iguais: {igual_raio}")
+    print(f"pesos do calor : original {t_old_h:8.3f}s | vetorizada {t_new_h:8.3f}s | {t_old_h / t_new_h:7.1f}x | iguais: {igual_calor}")
+    for method in SCALES:
+        t, s = _timeit(lambda: scale_values(vals.to_numpy(), method))
+        print(f"  {method:<10} {t:8.3f}s | mediana {np.median(s[s > 0]):.3f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
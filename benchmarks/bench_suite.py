@@ -0,0 +1,203 @@
+"""Mede o caminho planilha -> HTML em históricos sintéticos de vários tamanhos e grava um relatório JSON.
+
+Para cada tamanho mede (num processo novo, sem caches de outro tamanho):
+- ingestão a frio e pelo sidecar Parquet;
+- to_float_series nas colunas de coordenadas sujas;
+- montagem das camadas de bolhas e calor, mais o mapa de unidades;
+- serialização e tamanho do HTML.
+
+Também grava o ambiente e o commit. Com --comparar, mostra a razão de cada etapa contra um relatório anterior.
+As planilhas geradas (benchmarks/synthetic.py) ficam em .mapa_cache/bench e são reaproveitadas entre execuções.
+
+Uso: python benchmarks/bench_suite.py [n_linhas ...] [--relatorio saida.json] [--comparar base.json]
+Ex.: python benchmarks/bench_suite.py 10000 100000 1000000 5000000 --relatorio bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+import synthetic  # noqa: E402
+from data_loader import cache_dir_for, clear_cache, load_workbook  # noqa: E402
+from helpers import to_float_series, to_float_series_rowwise  # noqa: E402
+from mapas import build_heat_map, build_units_map, finalize_map, prepare_units  # noqa: E402
+from profiling import StageLog, rss_bytes, stage  # noqa: E402
+from render_maps import parse_combo  # noqa: E402
+
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000)
+COMBOS = ("bolhas:entregas", "calor:peso", "bolhas:faturamento,calor:entregas")
+XLSX_MAX_ROWS = 200_000  # acima disso o openpyxl leva minutos só para gerar a planilha: usa .csv
+REFERENCE_MAX_ROWS = 1_000_000  # to_float_series_rowwise (versão original) só até aqui
+N_UNITS = 36
+
+
+def data_files(n: int, fmt: str, seed: int) -> tuple:
+    """Gera (ou reaproveita) o histórico e as unidades sintéticos; devolve (histórico, unidades, segundos gerando)."""
+    pasta = os.path.join(ROOT, ".mapa_cache", "bench")
+    if fmt == "auto":
+        fmt = "xlsx" if n <= XLSX_MAX_ROWS else "csv"
+    hist = os.path.join(pasta, f"historico_{n}_s{seed}.{fmt}")
+    unid = os.path.join(pasta, f"unidades_{N_UNITS}_s{seed}.xlsx")
+    t0 = time.perf_counter()
+    if not os.path.exists(hist):
+        print(f"gerando {hist}...", flush=True)
+        synthetic.write(synthetic.history(n, seed), hist)
+    if not os.path.exists(unid):
+        synthetic.write(synthetic.units(N_UNITS, seed), unid)
+    return hist, unid, time.perf_counter() - t0
+
+
+def _drop_sidecars(path: str):
+    # Força a leitura a frio: apaga os sidecars Parquet desta planilha
+    pasta, base = cache_dir_for(path), os.path.basename(path) + "."
+    if os.path.isdir(pasta):
+        for name in os.listdir(pasta):
+            if name.startswith(base) and name.endswith(".parquet"):
+                os.remove(os.path.join(pasta, name))
+
+
+def _timeit(fn):
+    t0 = time.perf_counter()
+    out = fn()
+    return time.perf_counter() - t0, out
+
+
+def run(n: int, hist: str, unid: str, seed: int) -> dict:
+    """Mede um tamanho; chamado no processo filho. Cada bloco tem o próprio StageLog."""
+    res = {"linhas": n, "arquivo": os.path.basename(hist), "arquivo_bytes": os.path.getsize(hist),
+           "rss_inicial": rss_bytes()}
+
+    _drop_sidecars(hist)
+    with StageLog("ingestao_fria", peak=True).active() as log:
+        df = load_workbook(hist, schema="historico", repair=True)
+    res["ingestao_fria"] = log.records
+    res["linhas_validas"] = len(df)
+    res["coordenadas"] = df.attrs.get("coordenadas")
+    clear_cache()
+    with StageLog("ingestao_sidecar", peak=True).active() as log:
+        load_workbook(hist, schema="historico", repair=True)
+    res["ingestao_sidecar"] = log.records
+
+    # Mesmas colunas sujas da planilha, antes de qualquer normalização
+    raw = synthetic.history(n, seed)
+    conv = {}
+    for col in ("Latitude", "Longitude"):
+        secs, out = _timeit(lambda: to_float_series(raw[col]))
+        conv[col] = {"segundos": round(secs, 4), "validos": int(out.notna().sum())}
+        if n <= REFERENCE_MAX_ROWS:
+            conv[col]["segundos_linha_a_linha"] = round(_timeit(lambda: to_float_series_rowwise(raw[col]))[0], 4)
+    res["to_float_series"] = conv
+    del raw
+
+    mapas = {}
+    for spec in COMBOS:
+        _, camadas = parse_combo(spec)
+        with StageLog(spec, peak=True).active() as log:
+            m, grupos = build_heat_map(df, camadas["bolhas"], camadas["calor"])
+            finalize_map(m, grupos)
+            with stage("serializacao", mapa=spec) as rec:
+                rec["bytes"] = len(m.get_root().render().encode("utf-8"))
+        mapas[spec] = {"html_bytes": rec["bytes"], "etapas": log.records}
+    with StageLog("unidades", peak=True).active() as log:
+        df_u, cols = prepare_units(load_workbook(unid, autodetect=True, schema="unidades", repair=True))
+        m, grupos, _ = build_units_map(df_u, cols, {t: True for t in df_u[cols["tipo"]].unique()})
+        finalize_map(m, grupos, collapsed=False)
+        with stage("serializacao", mapa="unidades") as rec:
+            rec["bytes"] = len(m.get_root().render().encode("utf-8"))
+    mapas["unidades"] = {"html_bytes": rec["bytes"], "etapas": log.records}
+    res["mapas"] = mapas
+    res["pico_rss"] = rss_bytes("VmHWM")
+    return res
+
+
+def flat_times(res: dict) -> dict:
+    """{rótulo: segundos} de um resultado, para a tabela e a comparação entre relatórios."""
+    out = {
+        "ingestão a frio": sum(r["segundos"] for r in res["ingestao_fria"]),
+        "ingestão (sidecar)": sum(r["segundos"] for r in res["ingestao_sidecar"]),
+        "to_float_series": sum(c["segundos"] for c in res["to_float_series"].values()),
+    }
+    for spec, info in res["mapas"].items():
+        for etapa in ("agregacao", "camadas", "serializacao"):
+            out[f"{spec} / {etapa}"] = sum(r["segundos"] for r in info["etapas"] if r["etapa"] == etapa)
+    return out
+
+
+def print_result(res: dict, base=None):
+    print(f"\n== {res['linhas']:,} linhas ({res['arquivo']}, {res['arquivo_bytes'] / 1e6:.1f} MB; "
+          f"{res['linhas_validas']:,} válidas; pico RSS {(res['pico_rss'] or 0) / 1e6:.0f} MB)")
+    ref = flat_times(base) if base else {}
+    for nome, secs in flat_times(res).items():
+        extra = f"  {secs / ref[nome]:6.2f}x da base" if ref.get(nome) else ""
+        print(f"  {nome:<52} {secs:9.3f}s{extra}")
+    for col, c in res["to_float_series"].items():
+        if "segundos_linha_a_linha" in c:
+            print(f"  to_float_series {col}: linha a linha {c['segundos_linha_a_linha']:.3f}s "
+                  f"({c['segundos_linha_a_linha'] / max(c['segundos'], 1e-9):.1f}x)")
+    for spec, info in res["mapas"].items():
+        print(f"  HTML {spec:<47} {info['html_bytes'] / 1e6:9.2f} MB")
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {"commit": commit, "python": platform.python_version(), "plataforma": platform.platform(),
+            "cpus": os.cpu_count(), "pandas": pd.__version__, "numpy": np.__version__}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("linhas", type=int, nargs="*", default=list(DEFAULT_SIZES), help="tamanhos do histórico")
+    parser.add_argument("--formato", choices=("auto", "xlsx", "csv"), default="auto",
+                        help=f"planilha gerada (auto: .xlsx até {XLSX_MAX_ROWS:,} linhas, .csv acima)")
+    parser.add_argument("--semente", type=int, default=7)
+    parser.add_argument("--relatorio", default="bench_relatorio.json", help="relatório JSON de saída")
+    parser.add_argument("--comparar", help="relatório anterior para comparar tempo a tempo")
+    parser.add_argument("--run", nargs=3, metavar=("N", "HIST", "UNID"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.run:
+        # Processo filho: uma linha JSON com o resultado no stdout
+        print(json.dumps(run(int(args.run[0]), args.run[1], args.run[2], args.semente), default=str))
+        return 0
+
+    base = {}
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            base = {r["linhas"]: r for r in json.load(f)["resultados"]}
+
+    relatorio = {"gerado_em": pd.Timestamp.now().isoformat(timespec="seconds"), "ambiente": environment(),
+                 "resultados": []}
+    for n in args.linhas:
+        hist, unid, t_gen = data_files(n, args.formato, args.semente)
+        # Processo novo por tamanho: pico de memória e caches de um não contaminam o outro
+        out = subprocess.run([sys.executable, __file__, "--run", str(n), hist, unid, "--semente", str(args.semente)],
+                             capture_output=True, text=True)
+        if out.returncode:
+            sys.stderr.write(out.stderr)
+            return out.returncode
+        res = json.loads(out.stdout.strip().splitlines()[-1])
+        res["segundos_gerando"] = round(t_gen, 2)
+        relatorio["resultados"].append(res)
+        print_result(res, base.get(n))
+        # Regrava a cada tamanho: um 5M que estoure a memória não perde os anteriores
+        with open(args.relatorio, "w", encoding="utf-8") as f:
+            json.dump(relatorio, f, ensure_ascii=False, indent=1)
+    print(f"\nrelatório: {os.path.abspath(args.relatorio)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
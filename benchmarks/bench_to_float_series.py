@@ -0,0 +1,60 @@
+"""Compara to_float_series (vetorizada) com a versão original linha a linha.
+
+Uso: python benchmarks/bench_to_float_series.py [n_linhas]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from helpers import to_float_series, to_float_series_rowwise  # noqa: E402
+
+
+def synthetic_coords(n: int, seed: int = 42) -> pd.Series:
+    # Mistura de formatos encontrados nas planilhas: vírgula decimal, grau, texto solto, vazios
+    rng = np.random.default_rng(seed)
+    lat = rng.uniform(-33.7, 5.2, n).round(6)
+    kind = rng.integers(0, 6, n)
+    txt = np.where(kind == 0, np.char.mod("%.6f", lat),
+          np.where(kind == 1, np.char.replace(np.char.mod("%.6f", lat), ".", ","),
+          np.where(kind == 2, np.char.add(np.char.mod("%.5f", lat), "°"),
+          np.where(kind == 3, np.char.add("lat: ", np.char.mod("%.4f S", lat)),
+          np.where(kind == 4, "sem coordenada", "")))))
+    s = pd.Series(txt, dtype=object)
+    s[kind == 5] = None
+    return s
+
+
+def _timeit(fn, s):
+    t0 = time.perf_counter()
+    out = fn(s)
+    return time.perf_counter() - t0, out
+
+
+def main(n: int = 1_000_000):
+    s = synthetic_coords(n)
+    t_old, old = _timeit(to_float_series_rowwise, s)
+    t_new, new = _timeit(to_float_series, s)
+    old = pd.to_numeric(old, errors="coerce").astype("float64")
+    equal = bool(((old.isna() & new.isna()) | (old == new)).all())
+
+    # Histórico real: o mesmo cliente aparece em muitas linhas
+    rep = synthetic_coords(max(n // 50, 1)).sample(n, replace=True, random_state=1).reset_index(drop=True)
+    t_old_rep, _ = _timeit(to_float_series_rowwise, rep)
+    t_new_rep, _ = _timeit(to_float_series, rep)
+
+    num = pd.Series(np.random.default_rng(0).uniform(-75, -34, n))
+    t_old_num, _ = _timeit(to_float_series_rowwise, num)
+    t_new_num, _ = _timeit(to_float_series, num)
+
+    print(f"linhas: {n:,}")
+    print(f"texto   : original {t_old:8.3f}s | vetorizada {t_new:8.3f}s | {t_old / t_new:6.1f}x | resultados iguais: {equal}")
+    print(f"repetido: original {t_old_rep:8.3f}s | vetorizada {t_new_rep:8.3f}s | {t_old_rep / t_new_rep:6.1f}x")
+    print(f"numérica: original {t_old_num:8.3f}s | vetorizada {t_new_num:8.3f}s | {t_old_num / t_new_num:6.1f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,178 @@
+"""Históricos de entregas e planilhas de unidades sintéticos, no formato das planilhas reais, para os benchmarks.
+
+Os pontos se concentram nas regiões metropolitanas (peso ~ população), com uma parte espalhada pelo
+território. Clientes se repetem ao longo do ano, e parte das coordenadas vem "suja":
+- texto com vírgula decimal, grau, hemisfério ou espaços;
+- latitude e longitude trocadas, sinal perdido ou separador decimal perdido;
+- células vazias.
+
+Uso: python benchmarks/synthetic.py n_linhas saida.(xlsx|csv) [unidades.xlsx]
+"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from coord_repair import in_brazil  # noqa: E402
+
+# (cidade, UF, lat, lon, população da região metropolitana em milhões)
+CITIES = [
+    ("São Paulo", "SP", -23.5505, -46.6333, 21.9), ("Rio de Janeiro", "RJ", -22.9068, -43.1729, 13.2),
+    ("Belo Horizonte", "MG", -19.9167, -43.9345, 6.0), ("Brasília", "DF", -15.7939, -47.8828, 4.8),
+    ("Porto Alegre", "RS", -30.0346, -51.2177, 4.4), ("Fortaleza", "CE", -3.7319, -38.5267, 4.1),
+    ("Recife", "PE", -8.0476, -34.8770, 4.1), ("Salvador", "BA", -12.9714, -38.5014, 3.9),
+    ("Curitiba", "PR", -25.4284, -49.2733, 3.7), ("Campinas", "SP", -22.9099, -47.0626, 3.3),
+    ("Manaus", "AM", -3.1190, -60.0217, 2.7), ("Goiânia", "GO", -16.6869, -49.2648, 2.6),
+    ("Belém", "PA", -1.4558, -48.4902, 2.5), ("Vitória", "ES", -20.3155, -40.3128, 2.0),
+    ("Santos", "SP", -23.9608, -46.3336, 1.9), ("São Luís", "MA", -2.5307, -44.3068, 1.6),
+    ("Natal", "RN", -5.7945, -35.2110, 1.6), ("Florianópolis", "SC", -27.5954, -48.5480, 1.2),
+    ("Maceió", "AL", -9.6658, -35.7353, 1.3), ("João Pessoa", "PB", -7.1195, -34.8450, 1.3),
+    ("Teresina", "PI", -5.0920, -42.8038, 1.2), ("Ribeirão Preto", "SP", -21.1775, -47.8103, 1.2),
+    ("Cuiabá", "MT", -15.6014, -56.0979, 1.0), ("Campo Grande", "MS", -20.4697, -54.6201, 0.9),
+    ("Londrina", "PR", -23.3045, -51.1696, 0.8), ("Joinville", "SC", -26.3045, -48.8487, 0.6),
+    ("Aracaju", "SE", -10.9472, -37.0731, 1.0), ("Uberlândia", "MG", -18.9186, -48.2772, 0.7),
+    ("Porto Velho", "RO", -8.7612, -63.9004, 0.5), ("Macapá", "AP", 0.0349, -51.0694, 0.5),
+    ("Rio Branco", "AC", -9.9754, -67.8249, 0.4), ("Boa Vista", "RR", 2.8235, -60.6758, 0.4),
+    ("Palmas", "TO", -10.1689, -48.3317, 0.3),
+]
+RURAL_SHARE = 0.12       # fração dos clientes espalhada pelo território (fora das metrópoles)
+ROWS_PER_CLIENT = 20     # linhas do histórico por cliente, em média
+DIRTY_SHARE = 0.15       # fração das coordenadas com algum problema
+PERIOD_START = "2024-06-01"  # ano fiscal de 12 meses a partir daqui
+
+
+def client_coords(n: int, rng) -> tuple:
+    """(lat, lon, UF) de `n` clientes: metrópoles com espalhamento ~ raiz da população + parte rural."""
+    pop = np.array([c[4] for c in CITIES])
+    idx = rng.choice(len(CITIES), n, p=pop / pop.sum())
+    spread = 0.08 * np.sqrt(pop[idx])
+    lat = np.array([c[2] for c in CITIES])[idx] + rng.normal(0, 1, n) * spread
+    lon = np.array([c[3] for c in CITIES])[idx] + rng.normal(0, 1, n) * spread
+    uf = np.array([c[1] for c in CITIES], dtype=object)[idx]
+    rural = rng.random(n) < RURAL_SHARE
+    # Parte rural: uniforme no contorno do Brasil (sorteia no retângulo e fica com o que cai dentro)
+    faltam = np.flatnonzero(rural)
+    while len(faltam):
+        la = rng.uniform(-33.7, 5.2, len(faltam))
+        lo = rng.uniform(-73.9, -34.8, len(faltam))
+        ok = in_brazil(la, lo)
+        lat[faltam[ok]], lon[faltam[ok]] = la[ok], lo[ok]
+        faltam = faltam[~ok]
+    # A UF do rural é a da metrópole mais próxima: aproximação, basta para a distribuição por UF
+    if rural.any():
+        cl = np.array([[c[2], c[3]] for c in CITIES])
+        d = (lat[rural, None] - cl[:, 0]) ** 2 + (lon[rural, None] - cl[:, 1]) ** 2
+        uf[rural] = np.array([c[1] for c in CITIES], dtype=object)[d.argmin(1)]
+    # Os que o ruído jogou no mar voltam para o centro da metrópole
+    mar = ~in_brazil(lat, lon)
+    lat[mar] = np.array([c[2] for c in CITIES])[idx[mar]]
+    lon[mar] = np.array([c[3] for c in CITIES])[idx[mar]]
+    return lat.round(6), lon.round(6), uf
+
+
+def dirty_coords(lat, lon, share: float, rng) -> tuple:
+    """Colunas Latitude/Longitude (object) com `share` das linhas nos formatos problemáticos dos extratos."""
+    n = len(lat)
+    out_lat, out_lon = lat.astype(object), lon.astype(object)
+    kind = np.where(rng.random(n) < share, rng.integers(0, 8, n), -1)
+
+    def text(v, fmt):
+        return np.char.mod(fmt, v).astype(object)
+
+    for k in range(8):
+        i = np.flatnonzero(kind == k)
+        if not len(i):
+            continue
+        la, lo = lat[i], lon[i]
+        if k == 0:    # vírgula decimal
+            out_lat[i] = np.char.replace(np.char.mod("%.6f", la), ".", ",").astype(object)
+            out_lon[i] = np.char.replace(np.char.mod("%.6f", lo), ".", ",").astype(object)
+        elif k == 1:  # grau
+            out_lat[i], out_lon[i] = text(la, "%.5f°"), text(lo, "%.5f°")
+        elif k == 2:  # hemisfério no lugar do sinal
+            out_lat[i] = np.char.add(np.char.mod("%.5f ", np.abs(la)), np.where(la < 0, "S", "N")).astype(object)
+            out_lon[i] = text(np.abs(lo), "%.5f W")
+        elif k == 3:  # espaços em volta
+            out_lat[i], out_lon[i] = text(la, " %.6f "), text(lo, "  %.6f")
+        elif k == 4:  # latitude e longitude trocadas
+            out_lat[i], out_lon[i] = lo, la
+        elif k == 5:  # sinal perdido
+            out_lat[i], out_lon[i] = np.abs(la), np.abs(lo)
+        elif k == 6:  # separador decimal perdido (-23.5505 -> -235505)
+            out_lat[i] = np.trunc(la * 1e4).astype("int64").astype(object)
+            out_lon[i] = np.trunc(lo * 1e4).astype("int64").astype(object)
+        else:         # vazio ou texto sem número
+            out_lat[i] = np.where(rng.random(len(i)) < 0.5, None, "sem coordenada")
+            out_lon[i] = None
+    return out_lat, out_lon
+
+
+def history(n: int, seed: int = 7, dirty: float = DIRTY_SHARE, periods: bool = True) -> pd.DataFrame:
+    """Histórico com as colunas do Histórico F25 (+ UF e Data do ano fiscal), `n` linhas."""
+    rng = np.random.default_rng(seed)
+    n_clients = max(n // ROWS_PER_CLIENT, 1)
+    lat, lon, uf = client_coords(n_clients, rng)
+    # Clientes grandes compram mais vezes (Zipf leve)
+    freq = rng.pareto(1.5, n_clients) + 1
+    client = rng.choice(n_clients, n, p=freq / freq.sum())
+    entregas = rng.integers(1, 40, n)
+    peso = (entregas * rng.gamma(2.0, 220.0, n)).round(3)
+    lat_col, lon_col = dirty_coords(lat[client], lon[client], dirty, rng)
+    df = pd.DataFrame({
+        "Latitude": lat_col,
+        "Longitude": lon_col,
+        "Peso": peso,
+        "Entregas": entregas,
+        "Faturamento": (peso * rng.lognormal(3.0, 0.4, n)).round(2),
+        "UF": uf[client],
+    })
+    if periods:
+        dias = rng.integers(0, 365, n)
+        df["Data"] = pd.Timestamp(PERIOD_START) + pd.to_timedelta(dias, unit="D")
+    return df
+
+
+def units(n: int = 36, seed: int = 11, dirty: float = 0.05) -> pd.DataFrame:
+    """Planilha de Unidades de Atendimento com `n` unidades (tipos CD, Fábrica, TP, OPL)."""
+    rng = np.random.default_rng(seed)
+    lat, lon, uf = client_coords(n, rng)
+    tipo = rng.choice(["CD", "Fábrica", "TP", "OPL"], n, p=[0.4, 0.1, 0.3, 0.2])
+    pop = np.array([c[4] for c in CITIES])
+    cidade = np.array([c[0] for c in CITIES], dtype=object)[rng.choice(len(CITIES), n, p=pop / pop.sum())]
+    nome = [f"{t} - {c} {i + 1}" for i, (t, c) in enumerate(zip(tipo, cidade))]
+    fabricas = [x for x, t in zip(nome, tipo) if t == "Fábrica"] or ["Fábrica - Pouso"]
+    lat_col, lon_col = dirty_coords(lat, lon, dirty, rng)
+    return pd.DataFrame({
+        "Tipo": tipo,
+        "Abastecedor": rng.choice(fabricas, n),
+        "Nome da Unidade": nome,
+        "Cidade": cidade,
+        "UF": uf,
+        "CEP": [f"{a:05d}-{b:03d}" for a, b in zip(rng.integers(1000, 99999, n), rng.integers(0, 999, n))],
+        "Latitude": lat_col,
+        "Longitude": lon_col,
+    })
+
+
+def write(df: pd.DataFrame, path: str) -> str:
+    """Grava em .xlsx (até o limite de linhas do Excel) ou .csv com ';', como os extratos."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = path + ".tmp" + os.path.splitext(path)[1]
+    if path.lower().endswith(".csv"):
+        df.to_csv(tmp, sep=";", index=False)
+    else:
+        if len(df) >= 1_048_576:
+            raise ValueError(f"{len(df):,} linhas não cabem numa planilha do Excel; use .csv")
+        df.to_excel(tmp, index=False)
+    os.replace(tmp, path)
+    return path
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        sys.exit(__doc__)
+    write(history(int(sys.argv[1])), sys.argv[2])
+    if len(sys.argv) > 3:
+        write(units(), sys.argv[3])
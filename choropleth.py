@@ -0,0 +1,260 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+from branca.element import Template
+from folium.map import Layer
+
+from data_loader import file_signature
+from geometry import GeometryArrays, deg_per_pixel, load_geometry
+from scaling import DEFAULT_SCALE, scale_values
+from spatial import SpatialIndex
+
+# =====================================================
+# Mapa coroplético por UF/município (limites GeoJSON locais)
+# =====================================================
+BOUNDARY_DIRS = ("dados/limites", "dados", "/mnt/data")
+BOUNDARY_FILES = {
+    "uf": ("uf.geojson", "ufs.geojson", "estados.geojson", "BR_UF_2022.geojson"),
+    "municipio": ("municipios.geojson", "BR_Municipios_2022.geojson"),
+}
+LEVELS = {"uf": "UF", "municipio": "Município"}
+
+# Propriedades de nome/código nos arquivos mais comuns (malha do IBGE, geobr, API de malhas do IBGE)
+_NAME_KEYS = {
+    "uf": ("sigla", "SIGLA_UF", "SIGLA", "abbrev_state", "NM_UF", "name_state", "nome", "name"),
+    "municipio": ("NM_MUN", "name_muni", "nome", "name"),
+}
+_CODE_KEYS = {
+    "uf": ("CD_UF", "code_state", "codarea", "codigo"),
+    "municipio": ("CD_MUN", "code_muni", "codarea", "codigo"),
+}
+_UF_KEYS = ("SIGLA_UF", "abbrev_state", "sigla_uf", "uf")
+
+# Zooms em que a malha é simplificada (tolerância de 1 px); cada faixa vale do seu zoom até o próximo
+SIMPLIFY_ZOOMS = (4, 7, 10)
+# Malha usada para atribuir os pontos (~50 m): bem mais leve que a original, sem frestas entre vizinhos
+ASSIGN_TOLERANCE = 0.0005
+# Cor das regiões com valor mínimo (interpolada até a cor da métrica)
+_LIGHT = "#F1F5F9"
+
+_CACHE = {}
+
+
+def boundary_file(level: str):
+    """Primeiro arquivo de limites encontrado para o nível ("uf" ou "municipio"); None se não houver."""
+    for d in BOUNDARY_DIRS:
+        for name in BOUNDARY_FILES[level]:
+            p = os.path.join(d, name)
+            if os.path.exists(p):
+                return p
+    return None
+
+
+def _first_key(props, keys):
+    for k in keys:
+        if any(k in p for p in props[:20]):
+            return k
+    return None
+
+
+class Boundaries:
+    """Malha de um nível: geometria em arrays, nome/código por feição e as versões simplificadas por zoom."""
+
+    def __init__(self, path: str, level: str):
+        self.geom = geom = load_geometry(path)
+        self.level = level
+        props = geom.properties
+        k_nome, k_cod = _first_key(props, _NAME_KEYS[level]), _first_key(props, _CODE_KEYS[level])
+        k_uf = _first_key(props, _UF_KEYS) if level == "municipio" else None
+        self.nome = [str(p.get(k_nome, i)) if k_nome else str(i) for i, p in enumerate(props)]
+        if k_uf:
+            self.nome = [f"{n}/{p[k_uf]}" if p.get(k_uf) else n for n, p in zip(self.nome, props)]
+        self.codigo = [str(p.get(k_cod, "")) if k_cod else "" for p in props]
+        # Simplificadas uma vez por versão do arquivo (cache em memória + sidecar .npz, ver geometry.load_geometry)
+        self.bands = {z: load_geometry(path, deg_per_pixel(z)) for z in SIMPLIFY_ZOOMS}
+        self.assign_geom = load_geometry(path, ASSIGN_TOLERANCE)
+
+    def __len__(self):
+        return len(self.geom)
+
+
+def load_boundaries(path: str, level: str) -> Boundaries:
+    # Lido e simplificado uma vez por arquivo; relido se o arquivo mudar
+    sig = file_signature(path)
+    hit = _CACHE.get((path, level))
+    if hit is not None and hit[0] == sig:
+        return hit[1]
+    b = Boundaries(path, level)
+    _CACHE[(path, level)] = (sig, b)
+    return b
+
+
+def assign_points(geom: GeometryArrays, lat, lon) -> np.ndarray:
+    """Feição de cada ponto (-1 = fora de todas): candidatos pelo índice em grade, depois ray casting por polígono."""
+    out = np.full(len(lat), -1, dtype=np.int64)
+    if not len(lat):
+        return out
+    indice = SpatialIndex(lat, lon)
+    for f in range(len(geom)):
+        for poly in geom.rings(f):
+            pos = indice.within_polygon(poly)
+            orig = indice.order[pos]
+            out[orig[out[orig] < 0]] = f
+    return out
+
+
+def region_totals(bounds: Boundaries, cols: dict, metrics) -> pd.DataFrame:
+    """Soma por região de pontos (linhas) e métricas; só regiões com pontos, indexadas pela feição.
+
+    `cols` = arrays __LAT__/__LON__ + métricas (e __N__ se os pontos já vierem somados por local, ver mapas.colocated).
+    As linhas fora de todas as regiões ficam em attrs["fora"].
+    """
+    lat = np.asarray(cols["__LAT__"], dtype="float64")
+    lon = np.asarray(cols["__LON__"], dtype="float64")
+    ok = np.isfinite(lat) & np.isfinite(lon)
+    linhas = np.asarray(cols["__N__"], dtype="float64") if "__N__" in cols else np.ones(len(lat))
+    feicao = np.full(len(lat), -1, dtype=np.int64)
+    feicao[ok] = assign_points(bounds.assign_geom, lat[ok], lon[ok])
+    dentro = feicao >= 0
+    n = len(bounds)
+    pontos = np.bincount(feicao[dentro], weights=linhas[dentro], minlength=n)
+    out = pd.DataFrame({"nome": bounds.nome, "codigo": bounds.codigo, "pontos": pontos.astype(np.int64)})
+    for col in metrics:
+        if col in cols:
+            v = np.asarray(cols[col], dtype="float64")[dentro]
+            out[col] = np.bincount(feicao[dentro], weights=np.nan_to_num(v), minlength=n)
+    out = out[out["pontos"] > 0]
+    out.attrs["fora"] = int(linhas[~dentro].sum())
+    return out
+
+
+def _hex_rgb(color: str) -> np.ndarray:
+    c = color.lstrip("#")
+    return np.array([int(c[i:i + 2], 16) for i in (0, 2, 4)], dtype="float64")
+
+
+def fill_colors(values, color: str, method: str = DEFAULT_SCALE):
+    # Valor na escala (scaling) -> cor entre _LIGHT e a cor da métrica
+    s = scale_values(values, method)
+    lo, hi = _hex_rgb(_LIGHT), _hex_rgb(color)
+    rgb = np.rint(lo + s[:, None] * (hi - lo)).astype(int)
+    return [f"#{r:02X}{g:02X}{b:02X}" for r, g, b in rgb]
+
+
+class ChoroplethLayer(Layer):
+    """Regiões coloridas por uma métrica, com uma malha simplificada por faixa de zoom (troca no zoomend).
+
+    As propriedades (nome, cor, totais) vão uma vez só; as geometrias das faixas só levam o índice "i".
+    """
+
+    _template = Template(
+        """
+        {% macro script(this, kwargs) %}
+            var {{ this.get_name() }} = L.featureGroup();
+            (function (grupo, props, faixas, metricas, legenda) {
+                var zooms = Object.keys(faixas).map(Number).sort(function (a, b) { return a - b; });
+                var mapa = null, atual = null, camadas = {}, controle = null;
+                function fmt(v, m) {
+                    return m.prefix + v.toLocaleString("pt-BR", {
+                        minimumFractionDigits: m.decimals, maximumFractionDigits: m.decimals
+                    }) + m.suffix;
+                }
+                function camadaDe(z) {
+                    if (!camadas[z]) {
+                        camadas[z] = L.geoJson(faixas[z], {
+                            style: function (f) {
+                                return Object.assign({fillColor: props[f.properties.i].cor}, {{ this.style|tojson }});
+                            },
+                            onEachFeature: function (f, layer) {
+                                var p = props[f.properties.i];
+                                layer.bindTooltip(function () {
+                                    return "<b>" + p.nome + "</b><br>" + legenda.label + ": " + fmt(p.v[legenda.k], metricas[legenda.k]);
+                                });
+                                layer.bindPopup(function () {
+                                    var html = "<b>" + p.nome + "</b>" + (p.cod ? " (" + p.cod + ")" : "")
+                                        + "<br>Linhas: " + p.n.toLocaleString("pt-BR");
+                                    metricas.forEach(function (m, k) { html += "<br>" + m.label + ": " + fmt(p.v[k], m); });
+                                    return html;
+                                }, {maxWidth: 260});
+                            }
+                        });
+                    }
+                    return camadas[z];
+                }
+                function atualiza() {
+                    var faixa = zooms[0];
+                    zooms.forEach(function (z) { if (z <= mapa.getZoom()) { faixa = z; } });
+                    if (faixa !== atual) {
+                        atual = faixa;
+                        grupo.clearLayers();
+                        grupo.addLayer(camadaDe(faixa));
+                    }
+                }
+                function criaLegenda() {
+                    var c = L.control({position: "bottomright"});
+                    c.onAdd = function () {
+                        var div = L.DomUtil.create("div", "legenda-coropletico");
+                        div.style.cssText = "background:white;padding:6px 8px;border-radius:4px;font:12px sans-serif;"
+                            + "box-shadow:0 1px 4px rgba(0,0,0,.3)";
+                        div.innerHTML = "<b>" + legenda.label + "</b>"
+                            + "<div style='height:10px;margin:4px 0;background:linear-gradient(to right,"
+                            + legenda.cores.join(",") + ")'></div>"
+                            + "<span>" + fmt(legenda.min, metricas[legenda.k]) + "</span>"
+                            + "<span style='float:right;margin-left:12px'>" + fmt(legenda.max, metricas[legenda.k]) + "</span>";
+                        return div;
+                    };
+                    return c;
+                }
+                grupo.on("add", function () {
+                    mapa = grupo._map;
+                    mapa.on("zoomend", atualiza);
+                    atualiza();
+                    controle = criaLegenda().addTo(mapa);
+                });
+                grupo.on("remove", function () {
+                    if (mapa) { mapa.off("zoomend", atualiza); if (controle) { mapa.removeControl(controle); } }
+                    atual = null;
+                });
+            })({{ this.get_name() }}, {{ this.props_json }}, {{ this.bands_json }}, {{ this.metrics|tojson }},
+               {{ this.legend|tojson }});
+        {% endmacro %}
+        """
+    )
+
+    def __init__(self, bounds: Boundaries, totals: pd.DataFrame, metric: str, metrics: dict,
+                 method: str = DEFAULT_SCALE, name=None, show: bool = True):
+        super().__init__(name=name or f"{LEVELS[bounds.level]}: {metrics[metric]['label']}",
+                         overlay=True, control=True, show=show)
+        self._name = "ChoroplethLayer"
+        cols = [c for c in metrics if c in totals.columns]
+        cfg = metrics[metric]
+        valores = totals[metric].to_numpy(dtype="float64")
+        cores = fill_colors(valores, cfg["color"], method)
+        self.metrics = [{"label": metrics[c]["label"], "decimals": metrics[c]["decimals"],
+                         "prefix": metrics[c]["prefix"], "suffix": metrics[c]["suffix"]} for c in cols]
+        props = [{"nome": nome, "cod": cod, "n": int(n), "cor": cor, "v": [round(float(v), 2) for v in vs]}
+                 for nome, cod, n, cor, vs in zip(totals["nome"], totals["codigo"], totals["pontos"], cores,
+                                                  totals[cols].to_numpy(dtype="float64"))]
+        self.props_json = json.dumps(props, ensure_ascii=False, separators=(",", ":"))
+        feicoes = totals.index.to_numpy()
+        indices = [{"i": i} for i in range(len(feicoes))]
+        # Casas decimais de cada faixa: ~1/10 da tolerância da simplificação
+        self.bands_json = "{" + ",".join(
+            f'"{z}":' + g.take(feicoes).to_geojson(indices, decimals=int(np.ceil(-np.log10(deg_per_pixel(z) / 10))))
+            for z, g in bounds.bands.items()
+        ) + "}"
+        pos = valores[valores > 0]
+        self.legend = {
+            "label": cfg["label"], "k": cols.index(metric),
+            "min": float(pos.min()) if len(pos) else 0.0, "max": float(pos.max()) if len(pos) else 0.0,
+            "cores": [_LIGHT, cfg["color"]],
+        }
+        self.style = {"color": "#475569", "weight": 0.6, "opacity": 0.8, "fillOpacity": 0.7}
+        bb = bounds.geom.bbox[feicoes] if len(feicoes) else np.full((1, 4), np.nan)
+        self.bbox = [float(np.nanmin(bb[:, 0])), float(np.nanmin(bb[:, 1])),
+                     float(np.nanmax(bb[:, 2])), float(np.nanmax(bb[:, 3]))]
+
+    def _get_self_bounds(self):
+        return [[self.bbox[1], self.bbox[0]], [self.bbox[3], self.bbox[2]]]
@@ -0,0 +1,115 @@
+import glob
+import hashlib
+import os
+import shutil
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# =====================================================
+# Colunas em .npy mapeados em memória + texto JSON gerado direto dos buffers
+# =====================================================
+# Subpasta do cache de planilhas (.mapa_cache) com uma pasta por versão do dataset
+COLUMNS_DIR = "colunas"
+# Versões mantidas em disco (as mais recentes); as demais são apagadas
+KEEP_VERSIONS = 8
+
+
+def column_dir(cache_dir: str, version) -> str:
+    return os.path.join(cache_dir, COLUMNS_DIR, hashlib.sha1(str(version).encode()).hexdigest()[:16])
+
+
+def _as_array(s) -> np.ndarray:
+    # Mantém o tipo numérico do esquema (float32/int32); o resto vira float64 com NaN
+    if s.dtype.kind in "fiu" and not s.hasnans:
+        return s.to_numpy()
+    return s.to_numpy(dtype="float64", na_value=np.nan)
+
+
+def _matches(mapped: np.ndarray, arr: np.ndarray) -> bool:
+    # Arquivo de outra versão dos dados: tamanho, tipo ou uma amostra de valores diferentes
+    if mapped.shape != arr.shape or mapped.dtype != arr.dtype:
+        return False
+    idx = np.linspace(0, len(arr) - 1, min(len(arr), 64)).astype("int64")
+    return np.array_equal(mapped[idx], arr[idx], equal_nan=arr.dtype.kind == "f")
+
+
+def _prune(cache_dir: str, keep: str):
+    pastas = sorted(glob.glob(os.path.join(glob.escape(cache_dir), COLUMNS_DIR, "*")), key=os.path.getmtime, reverse=True)
+    for old in pastas[KEEP_VERSIONS:]:
+        if old != keep:
+            shutil.rmtree(old, ignore_errors=True)
+
+
+def mapped_columns(df, cols, version=None, cache_dir=None) -> dict:
+    """{coluna: array somente leitura}. Com `version` e `cache_dir`, cada coluna é um .npy mapeado em memória,
+    gravado uma vez por versão e compartilhado entre sessões e processos (page cache do SO).
+
+    `version` deve identificar o frame, não só o arquivo (ver data_loader.frame_version): leituras com
+    esquema ou correção diferentes têm colunas diferentes. Um .npy que não confere com `df` é regravado.
+    """
+    cols = [c for c in cols if c in df.columns]
+    if version is None or cache_dir is None:
+        return {c: _as_array(df[c]) for c in cols}
+
+    pasta = column_dir(cache_dir, version)
+    out = {}
+    for c in cols:
+        p = os.path.join(pasta, f"{c}.npy")
+        arr = _as_array(df[c])
+        if os.path.exists(p):
+            try:
+                mapped = np.load(p, mmap_mode="r")
+            except (OSError, ValueError):
+                mapped = None
+            if mapped is not None and _matches(mapped, arr):
+                out[c] = mapped
+                continue
+        try:
+            os.makedirs(pasta, exist_ok=True)
+            tmp = os.path.join(pasta, f"{c}.{os.getpid()}.tmp.npy")
+            np.save(tmp, arr)
+            os.replace(tmp, p)
+        except OSError:
+            # Pasta somente leitura: fica com o array em memória
+            out[c] = arr
+            continue
+        out[c] = np.load(p, mmap_mode="r")
+    _prune(cache_dir, pasta)
+    return out
+
+
+# ---------- Serialização ----------
+def _text(values, decimals=None):
+    # Números -> texto JSON, vetorizado no Arrow (sem um objeto Python por ponto)
+    arr = pa.array(np.ascontiguousarray(values))
+    if decimals is not None and pa.types.is_floating(arr.type):
+        arr = pc.round(arr, ndigits=decimals)
+    return pc.cast(arr, pa.string())
+
+
+def join_rows(pieces, sep: str = ",") -> str:
+    """Monta uma linha de texto por ponto e junta tudo com `sep`.
+
+    `pieces` alterna trechos literais (str) e colunas: array ou (array, casas decimais).
+    Os valores devem ser finitos (NaN/inf não são JSON válido).
+    """
+    cols = [p for p in pieces if not isinstance(p, str)]
+    n = len(cols[0][0] if isinstance(cols[0], tuple) else cols[0]) if cols else 0
+    if n == 0:
+        return ""
+    parts = [p if isinstance(p, str) else _text(*p) if isinstance(p, tuple) else _text(p) for p in pieces]
+    rows = pc.binary_join_element_wise(*parts, "")
+    lista = pa.ListArray.from_arrays(pa.array([0, n], pa.int32()), rows)
+    return pc.binary_join(lista, sep)[0].as_py()
+
+
+def json_rows(columns, decimals=None) -> str:
+    """[[a, b, c], ...] a partir de colunas numéricas."""
+    decimals = decimals or [None] * len(columns)
+    pieces = ["["]
+    for col, d in zip(columns, decimals):
+        pieces += [(col, d), ","]
+    pieces[-1] = "]"
+    return "[" + join_rows(pieces) + "]"
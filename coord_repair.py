@@ -0,0 +1,143 @@
+import numpy as np
+import pandas as pd
+
+from spatial import points_in_polygon
+
+# =====================================================
+# Correção de coordenadas linha a linha (inversão, sinal, escala) contra o contorno do Brasil
+# =====================================================
+# Contorno simplificado e folgado (~0,5–1° para o mar e as fronteiras), anéis GeoJSON [lon, lat].
+# Serve para separar coordenadas plausíveis de erros de digitação, não para limites exatos.
+BRAZIL_POLYGONS = [
+    [[[-60.7, 5.8], [-59.3, 4.0], [-58.5, 1.0], [-55.0, 1.9], [-52.5, 1.9], [-51.7, 4.6], [-50.5, 4.9],
+      [-49.0, 2.5], [-47.5, 0.5], [-44.0, -0.8], [-40.5, -1.8], [-37.5, -3.3], [-34.3, -4.5], [-34.0, -8.0],
+      [-37.5, -13.0], [-38.0, -16.0], [-38.5, -19.0], [-40.0, -21.5], [-41.5, -23.3], [-45.0, -24.3],
+      [-48.0, -26.5], [-48.0, -28.5], [-50.5, -31.5], [-52.5, -34.2], [-53.8, -34.0], [-54.5, -32.5],
+      [-56.0, -31.3], [-57.9, -30.4], [-57.9, -29.5], [-56.3, -28.0], [-54.2, -26.5], [-54.9, -25.5],
+      [-55.0, -24.0], [-56.0, -22.9], [-58.2, -22.0], [-58.3, -19.8], [-58.5, -16.2], [-60.4, -16.2],
+      [-60.6, -13.5], [-62.5, -13.9], [-64.8, -12.9], [-65.4, -11.0], [-65.6, -9.7], [-68.7, -11.2],
+      [-69.8, -11.2], [-73.2, -9.6], [-74.2, -7.3], [-73.3, -5.0], [-70.0, -4.0], [-69.6, -1.0], [-70.0, 1.8],
+      [-67.0, 2.3], [-64.0, 4.3], [-62.5, 4.4], [-60.7, 5.8]]],
+    # Fernando de Noronha e Atol das Rocas
+    [[[-34.0, -3.6], [-32.2, -3.6], [-32.2, -4.1], [-34.0, -4.1], [-34.0, -3.6]]],
+]
+# Retângulo que envolve os polígonos: filtro barato antes do ray casting
+_BBOX = (-34.3, 5.9, -74.3, -32.1)  # lat_min, lat_max, lon_min, lon_max
+
+# Tipos de correção (bits em `fixes`)
+FIX_SWAP = 1     # latitude e longitude trocadas
+FIX_SIGN = 2     # sinal faltando/errado
+FIX_SCALE = 4    # separador decimal perdido (ex.: -235505 -> -23.5505)
+FIX_DROPPED = 8  # nenhuma correção cai no Brasil: linha descartada
+FIX_NAMES = {FIX_SWAP: "inversao", FIX_SIGN: "sinal", FIX_SCALE: "escala"}
+
+# Nenhuma coordenada do Brasil passa de 100 em módulo: acima disso, falta o separador decimal
+_SCALE_MIN = 100.0
+
+
+def in_brazil(lat, lon) -> np.ndarray:
+    lat = np.asarray(lat, dtype="float64")
+    lon = np.asarray(lon, dtype="float64")
+    with np.errstate(invalid="ignore"):
+        out = (lat >= _BBOX[0]) & (lat <= _BBOX[1]) & (lon >= _BBOX[2]) & (lon <= _BBOX[3])
+    idx = np.flatnonzero(out)
+    if len(idx):
+        hit = np.zeros(len(idx), dtype=bool)
+        for poly in BRAZIL_POLYGONS:
+            hit |= points_in_polygon(lon[idx], lat[idx], poly)
+        out[idx] = hit
+    return out
+
+
+def _rescale(v, digits: int) -> np.ndarray:
+    # Divide por 10^k até sobrarem `digits` dígitos inteiros; só onde |v| >= 100
+    a = np.abs(v)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        k = np.floor(np.log10(a)) + 1 - digits
+    return np.where(a >= _SCALE_MIN, v / 10.0 ** np.maximum(k, 0), v)
+
+
+def _candidates():
+    # (escala lat, escala lon, troca, -lat, -lon) em ordem de tentativa: menos correções primeiro;
+    # na escala, 2 dígitos inteiros antes de 1 (-235505 -> -23.55, não -2.355)
+    cands = [(sa, sb, swap, nla, nlo)
+             for sa in (0, 2, 1) for sb in (0, 2, 1)
+             for swap in (False, True) for nla in (False, True) for nlo in (False, True)]
+    custo = [(sa > 0) + (sb > 0) + swap + nla + nlo for sa, sb, swap, nla, nlo in cands]
+    return [c for _, c in sorted(zip(custo, cands), key=lambda t: t[0])][1:]  # [0] é a original
+
+
+_CANDIDATES = _candidates()
+
+
+def repair_coords(lat, lon):
+    """Corrige cada linha fora do Brasil com a primeira combinação (troca, sinal, escala) que cai dentro.
+
+    Devolve (lat, lon, fixes); `fixes` tem os bits FIX_* de cada linha (0 = já estava certa).
+    Linhas sem correção possível ficam com FIX_DROPPED e as coordenadas originais.
+    """
+    lat = np.array(lat, dtype="float64")
+    lon = np.array(lon, dtype="float64")
+    fixes = np.zeros(len(lat), dtype=np.uint8)
+    pend = np.flatnonzero(~in_brazil(lat, lon) & np.isfinite(lat) & np.isfinite(lon))
+    if len(pend) == 0:
+        return lat, lon, fixes
+    a0, b0 = lat[pend], lon[pend]
+    escalas_a = {0: a0, 2: _rescale(a0, 2), 1: _rescale(a0, 1)}
+    escalas_b = {0: b0, 2: _rescale(b0, 2), 1: _rescale(b0, 1)}
+    resolvido = np.zeros(len(pend), dtype=bool)
+    for sa, sb, swap, nla, nlo in _CANDIDATES:
+        aberto = np.flatnonzero(~resolvido)
+        if len(aberto) == 0:
+            break
+        a, b = escalas_a[sa][aberto], escalas_b[sb][aberto]
+        # Escala que não muda nada já foi testada com custo menor
+        if (sa and (a == a0[aberto]).all()) or (sb and (b == b0[aberto]).all()):
+            continue
+        la, lo = (b, a) if swap else (a, b)
+        la = -la if nla else la
+        lo = -lo if nlo else lo
+        ok = in_brazil(la, lo)
+        if not ok.any():
+            continue
+        pos = aberto[ok]
+        lat[pend[pos]], lon[pend[pos]] = la[ok], lo[ok]
+        fixes[pend[pos]] = (FIX_SWAP * swap) | (FIX_SIGN * (nla or nlo)) | (FIX_SCALE * bool(sa or sb))
+        resolvido[pos] = True
+    fixes[pend[~resolvido]] = FIX_DROPPED
+    return lat, lon, fixes
+
+
+def repair_frame(df: pd.DataFrame, drop: bool = True) -> pd.DataFrame:
+    """Aplica repair_coords em __LAT__/__LON__; o relatório fica em df.attrs["coordenadas"].
+
+    Com `drop`, as linhas que continuam fora do Brasil são descartadas.
+    """
+    lat, lon, fixes = repair_coords(df["__LAT__"].to_numpy(dtype="float64", na_value=np.nan),
+                                    df["__LON__"].to_numpy(dtype="float64", na_value=np.nan))
+    out = df.assign(__LAT__=lat, __LON__=lon)
+    descartar = (fixes & FIX_DROPPED) > 0
+    if drop and descartar.any():
+        out = out[~descartar]
+    corrigidas = (fixes > 0) & ~descartar
+    out.attrs["coordenadas"] = {
+        "linhas": int(len(df)),
+        "corrigidas": int(corrigidas.sum()),
+        "descartadas": int(descartar.sum()) if drop else 0,
+        "fora_do_brasil": int(descartar.sum()),
+        "correcoes": {nome: int(((fixes & bit) > 0).sum()) for bit, nome in FIX_NAMES.items()},
+    }
+    return out
+
+
+def repair_summary(rep: dict) -> str:
+    # Texto curto para a interface/CLI; "" se nada mudou
+    if not rep or not (rep.get("corrigidas") or rep.get("fora_do_brasil")):
+        return ""
+    tipos = ", ".join(f"{n} {nome}" for nome, n in rep["correcoes"].items() if n)
+    txt = f"{rep['corrigidas']} coordenada(s) corrigida(s)" + (f" ({tipos})" if tipos else "")
+    if rep.get("descartadas"):
+        txt += f"; {rep['descartadas']} linha(s) fora do Brasil descartada(s)"
+    elif rep.get("fora_do_brasil"):
+        txt += f"; {rep['fora_do_brasil']} linha(s) fora do Brasil"
+    return txt
@@ -0,0 +1,331 @@
+import os
+import glob
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from coord_repair import repair_frame
+from helpers import autodetect_coords, norm_col, to_float_series
+from profiling import peak_enabled, record, reset_peak_rss, rss_bytes, stage
+from schema import apply_schema
+
+# =====================================================
+# Camada de ingestão com cache (memória + sidecar Parquet)
+# =====================================================
+# Os frames do cache são compartilhados por todas as sessões do processo; cada chamada recebe só uma
+# visão rasa (colunas novas ou renomeadas ficam na visão). O app só lê os valores, nunca os altera no lugar.
+
+# Pasta criada ao lado de cada planilha para guardar o sidecar Parquet.
+CACHE_DIR_NAME = ".mapa_cache"
+# Incrementar sempre que a normalização mudar, para invalidar sidecars antigos.
+SIDECAR_VERSION = 3
+# Linhas por bloco na leitura em streaming
+CHUNK_ROWS = 10_000
+# Colunas de texto com até esta fração de valores distintos viram categoria
+CATEGORY_MAX_RATIO = 0.5
+
+_CACHE = {}
+_LOCK = threading.Lock()
+# Lock por planilha em leitura: sessões que chegam juntas esperam a primeira leitura
+_PENDING = {}
+
+
+class EmptyWorkbookError(ValueError):
+    pass
+
+
+class CoordColumnsError(ValueError):
+    pass
+
+
+def find_file(candidates):
+    return next((p for p in candidates if p and os.path.exists(p)), None)
+
+
+def file_signature(path: str):
+    # Chave do cache: caminho absoluto + mtime + tamanho
+    st_ = os.stat(path)
+    return os.path.abspath(path), st_.st_mtime_ns, st_.st_size
+
+
+def cache_dir_for(path: str) -> str:
+    # Pasta de cache ao lado da planilha (ou dentro da pasta, se `path` for um diretório)
+    path = os.path.abspath(path)
+    return os.path.join(path if os.path.isdir(path) else os.path.dirname(path), CACHE_DIR_NAME)
+
+
+def dataset_version(path: str) -> str:
+    # Identifica o conteúdo atual da planilha (muda quando o arquivo é substituído)
+    path, mtime_ns, size = file_signature(path)
+    return f"{path}:{mtime_ns}:{size}"
+
+
+def frame_version(path: str, autodetect: bool = False, schema=None, repair: bool = False) -> str:
+    # Identifica o frame de load_workbook com estas opções: muda com o arquivo, a normalização e a variante
+    return f"{dataset_version(path)}:v{SIDECAR_VERSION}{_variant(autodetect, schema, repair)}"
+
+
+def normalize_frame(df_raw: pd.DataFrame, autodetect: bool = False) -> pd.DataFrame:
+    # Normaliza os nomes das colunas
+    colmap = {c: norm_col(c) for c in df_raw.columns}
+    df = df_raw.rename(columns=colmap)
+
+    # Detecta colunas de latitude e longitude
+    lat_col = next((c for c in df.columns if c in {"latitude", "lat"}), None)
+    lon_col = next((c for c in df.columns if c in {"longitude", "long", "lon"}), None)
+
+    if (not lat_col or not lon_col) and autodetect:
+        coords = autodetect_coords(df)
+        if coords:
+            lat_col, lon_col = coords
+
+    if not lat_col or not lon_col:
+        raise CoordColumnsError("Não foi possível localizar colunas de latitude/longitude.")
+
+    # Converte coordenadas para numérico e descarta linhas sem coordenadas
+    df["__LAT__"] = to_float_series(df[lat_col])
+    df["__LON__"] = to_float_series(df[lon_col])
+    # As colunas originais só duplicariam as coordenadas (em float64 ou texto)
+    df = df.drop(columns=[c for c in (lat_col, lon_col) if c not in ("__LAT__", "__LON__")])
+    return df.dropna(subset=["__LAT__", "__LON__"])
+
+
+# ---------- Leitura em streaming ----------
+def sniff_sep(path: str) -> str:
+    with open(path, "r", encoding="utf-8-sig") as f:
+        sample = f.read(4096)
+    return ";" if sample.count(";") > sample.count(",") else ","
+
+
+def sniff_read_csv(path: str) -> pd.DataFrame:
+    # CSV inteiro com o separador detectado (';' ou ','); erros de leitura sobem para quem chamou
+    return pd.read_csv(path, sep=sniff_sep(path), encoding="utf-8-sig")
+
+
+def iter_excel_chunks(path: str, chunksize: int = CHUNK_ROWS):
+    """Lê a primeira planilha em modo read_only, devolvendo DataFrames de até `chunksize` linhas."""
+    from openpyxl import load_workbook as open_xlsx
+
+    wb = open_xlsx(path, read_only=True, data_only=True)
+    try:
+        ws = wb.active
+        ws.reset_dimensions()  # a dimensão gravada no arquivo pode estar errada
+        rows = ws.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        header = [f"Unnamed: {i}" if h is None else str(h) for i, h in enumerate(header)]
+        width = len(header)
+        buf = []
+        for row in rows:
+            if not any(v is not None for v in row):
+                continue
+            buf.append(row[:width])
+            if len(buf) >= chunksize:
+                yield pd.DataFrame.from_records(buf, columns=header)
+                buf = []
+        if buf:
+            yield pd.DataFrame.from_records(buf, columns=header)
+    finally:
+        wb.close()
+
+
+def iter_csv_chunks(path: str, chunksize: int = CHUNK_ROWS):
+    yield from pd.read_csv(path, sep=sniff_sep(path), encoding="utf-8-sig", chunksize=chunksize)
+
+
+def _mixed_as_text(s: pd.Series) -> pd.Series:
+    # Coluna com texto e números misturados (ex.: coordenadas sujas) vira texto: o Parquet não grava a mistura
+    if s.dtype == object and pd.api.types.infer_dtype(s, skipna=True) in ("mixed", "mixed-integer"):
+        return s.where(s.isna(), s.astype(str))
+    return s
+
+
+def downcast_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Reduz tipos sem perder informação: float64 -> float32 quando exato, int -> int32, texto repetido -> category."""
+    out = {}
+    for c in df.columns:
+        s = df[c]
+        if pd.api.types.is_float_dtype(s.dtype) and s.dtype != "float32" and c not in ("__LAT__", "__LON__"):
+            v = s.to_numpy()
+            v32 = v.astype("float32")
+            if np.array_equal(v32.astype(v.dtype), v, equal_nan=True):
+                s = pd.Series(v32, index=s.index, name=c)
+        elif pd.api.types.is_integer_dtype(s.dtype) and s.dtype.itemsize > 4:
+            if len(s) == 0 or (s.min() >= np.iinfo("int32").min and s.max() <= np.iinfo("int32").max):
+                s = s.astype("int32")
+        elif (s.dtype == object or pd.api.types.is_string_dtype(s.dtype)) and len(s):
+            s = _mixed_as_text(s)
+            if s.nunique(dropna=True) <= CATEGORY_MAX_RATIO * len(s):
+                s = s.astype("category")
+        out[c] = s
+    return pd.DataFrame(out, index=df.index)
+
+
+def concat_frames(chunks) -> pd.DataFrame:
+    # Concatena coluna a coluna: categorias de blocos diferentes são unidas (sem voltar a object)
+    if len(chunks) == 1:
+        return chunks[0].reset_index(drop=True)
+    cols = {}
+    for c in dict.fromkeys(c for ch in chunks for c in ch.columns):
+        parts = [ch[c] if c in ch.columns else pd.Series(np.nan, index=ch.index) for ch in chunks]
+        if all(isinstance(p.dtype, pd.CategoricalDtype) for p in parts):
+            cols[c] = pd.Series(union_categoricals(parts, ignore_order=True), name=c)
+        else:
+            cols[c] = _mixed_as_text(pd.concat(parts, ignore_index=True))
+    return pd.DataFrame(cols)
+
+
+def read_streaming(path: str, autodetect: bool = False, chunksize: int = CHUNK_ROWS) -> pd.DataFrame:
+    """Lê .xlsx/.csv em blocos, normalizando e reduzindo os tipos de cada bloco antes de juntar.
+
+    O relatório da leitura (linhas, blocos, bytes finais, pico de RSS, tempo da normalização)
+    fica em df.attrs["ingestao"]; o pico só é medido com profiling.peak_enabled() (zerá-lo vale para o processo todo).
+    """
+    t0 = time.perf_counter()
+    medir_pico = peak_enabled()
+    if medir_pico:
+        reset_peak_rss()
+    rss0 = rss_bytes()
+    reader = iter_csv_chunks if path.lower().endswith(".csv") else iter_excel_chunks
+    chunks, lidas, t_norm = [], 0, 0.0
+    for raw in reader(path, chunksize):
+        lidas += len(raw)
+        t1 = time.perf_counter()
+        chunks.append(downcast_frame(normalize_frame(raw, autodetect=autodetect)))
+        t_norm += time.perf_counter() - t1
+        del raw
+    if not lidas:
+        raise EmptyWorkbookError(f"O arquivo '{path}' está vazio.")
+    df = concat_frames(chunks)
+    del chunks
+    df.attrs["ingestao"] = {
+        "arquivo": os.path.basename(path),
+        "linhas_lidas": lidas,
+        "linhas": len(df),
+        "blocos": -(-lidas // chunksize),
+        "bytes_final": int(df.memory_usage(deep=True).sum()),
+        "rss_inicial": rss0,
+        "rss_final": rss_bytes(),
+        "pico_rss": rss_bytes("VmHWM") if medir_pico else None,
+        "segundos": round(time.perf_counter() - t0, 3),
+        "segundos_normalizacao": round(t_norm, 3),
+    }
+    return df
+
+
+def _variant(autodetect: bool, schema, repair: bool = False) -> str:
+    # Sufixo do sidecar/cache para cada combinação de opções de leitura
+    return ("-a" if autodetect else "") + (f"-{schema}" if schema else "") + ("-r" if repair else "")
+
+
+def _sidecar_path(sig, variant: str) -> str:
+    path, mtime_ns, size = sig
+    base = os.path.basename(path)
+    suffix = variant
+    name = f"{base}.{mtime_ns}-{size}-v{SIDECAR_VERSION}{suffix}.parquet"
+    return os.path.join(cache_dir_for(path), name)
+
+
+def _read_sidecar(sig, variant: str):
+    p = _sidecar_path(sig, variant)
+    if not os.path.exists(p):
+        return None
+    try:
+        return pd.read_parquet(p)
+    except Exception:
+        return None
+
+
+def _write_sidecar(sig, variant: str, df: pd.DataFrame):
+    p = _sidecar_path(sig, variant)
+    try:
+        os.makedirs(os.path.dirname(p), exist_ok=True)
+        # Remove sidecars de versões anteriores da mesma planilha (mantém as outras variantes desta versão)
+        prefix = os.path.basename(sig[0]) + "."
+        current = f"{prefix}{sig[1]}-{sig[2]}-v{SIDECAR_VERSION}"
+        for old in glob.glob(os.path.join(glob.escape(os.path.dirname(p)), glob.escape(prefix) + "*.parquet")):
+            name = os.path.basename(old)
+            if not (name.startswith(current + "-") or name == current + ".parquet"):
+                os.remove(old)
+        tmp = p + ".tmp"
+        df.to_parquet(tmp)
+        os.replace(tmp, p)
+    except Exception:
+        # Pasta somente leitura ou coluna não serializável: segue só com o cache em memória
+        pass
+
+
+def _memory_hit(path: str, df: pd.DataFrame) -> pd.DataFrame:
+    # Já estava no cache do processo: etapa de leitura sem custo, visão rasa do frame compartilhado
+    record({"etapa": "ingestao", "arquivo": os.path.basename(path), "fonte": "memoria", "segundos": 0.0,
+            "linhas": len(df)})
+    return df.copy(deep=False)
+
+
+def load_workbook(path: str, autodetect: bool = False, schema=None, repair: bool = False) -> pd.DataFrame:
+    """Lê e normaliza a planilha uma única vez por (caminho, mtime, tamanho); devolve uma visão do frame compartilhado.
+
+    `schema` ("historico"/"unidades", ver schema.py) aplica os tipos declarados antes de guardar no cache.
+    `repair` corrige as coordenadas linha a linha e descarta as que ficam fora do Brasil (ver coord_repair.py).
+    Leitura, normalização e correção entram como etapas em profiling (fonte: memória, sidecar ou planilha).
+    """
+    sig = file_signature(path)
+    variant = _variant(autodetect, schema, repair)
+    key = sig + (variant,)
+    with _LOCK:
+        hit = _CACHE.get(key)
+        key_lock = _PENDING.setdefault(key, threading.Lock()) if hit is None else None
+    if hit is not None:
+        return _memory_hit(path, hit)
+
+    t0 = time.perf_counter()
+    with key_lock:
+        with _LOCK:
+            hit = _CACHE.get(key)
+        if hit is not None:
+            return _memory_hit(path, hit)
+        try:
+            arquivo = os.path.basename(path)
+            df = _read_sidecar(sig, variant)
+            if df is not None:
+                record({"etapa": "ingestao", "arquivo": arquivo, "fonte": "sidecar",
+                        "segundos": round(time.perf_counter() - t0, 4), "linhas": len(df),
+                        "bytes": os.path.getsize(_sidecar_path(sig, variant))})
+            else:
+                df = read_streaming(path, autodetect=autodetect)
+                ing = df.attrs["ingestao"]
+                # Leitura da planilha sem a normalização dos blocos, que vira uma etapa à parte
+                record({"etapa": "ingestao", "arquivo": arquivo, "fonte": "planilha",
+                        "segundos": round(ing["segundos"] - ing["segundos_normalizacao"], 4),
+                        "linhas": ing["linhas_lidas"], "bytes": sig[2], "pico_rss": ing["pico_rss"]})
+                record({"etapa": "normalizacao", "arquivo": arquivo, "segundos": ing["segundos_normalizacao"],
+                        "linhas": ing["linhas"], "bytes": ing["bytes_final"]})
+                if repair:
+                    with stage("coordenadas", arquivo=arquivo) as rec:
+                        df = repair_frame(df)
+                        rec["linhas"] = len(df)
+                if schema:
+                    with stage("normalizacao", arquivo=arquivo, esquema=schema) as rec:
+                        df = apply_schema(df, schema)
+                        rec["linhas"] = len(df)
+                _write_sidecar(sig, variant, df)
+        except BaseException:
+            with _LOCK:
+                _PENDING.pop(key, None)
+            raise
+        with _LOCK:
+            # Descarta entradas antigas da mesma planilha (arquivo foi alterado)
+            for k in [k for k in _CACHE if k[0] == sig[0] and k[1:3] != sig[1:3]]:
+                del _CACHE[k]
+            _CACHE[key] = df
+            _PENDING.pop(key, None)
+    return df.copy(deep=False)
+
+
+def clear_cache():
+    with _LOCK:
+        _CACHE.clear()
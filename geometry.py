@@ -0,0 +1,402 @@
+import glob
+import json
+import os
+from itertools import chain
+
+import numpy as np
+
+from data_loader import cache_dir_for, file_signature
+
+# =====================================================
+# Polígonos GeoJSON em arrays planos + simplificação que preserva a topologia
+# =====================================================
+# Vértices iguais entre polígonos vizinhos são reconhecidos por esta grade (1e-7° ≈ 1 cm)
+_VERTEX_GRID = 1e7
+# Profundidade das coordenadas por tipo: 1 = [lon, lat], 2 = lista de posições, ...
+_DEPTH = {"Point": 1, "MultiPoint": 2, "LineString": 2, "MultiLineString": 3, "Polygon": 3, "MultiPolygon": 4}
+# Versão do formato do sidecar .npz (GeometryArrays.save)
+SIDECAR_VERSION = 1
+
+_CACHE = {}
+
+
+def deg_per_pixel(zoom: int) -> float:
+    # Graus de longitude por pixel de tela no zoom (Web Mercator, tiles de 256 px)
+    return 360.0 / (256 * 2 ** zoom)
+
+
+class GeometryArrays:
+    """Polígonos/multipolígonos de um GeoJSON em arrays NumPy.
+
+    coords (n, 2) [lon, lat]; ring_offsets fatia coords por anel (fechado), part_offsets fatia os anéis por
+    polígono e feature_offsets fatia os polígonos por feição. bbox (feições, 4) = [lon_min, lat_min, lon_max, lat_max].
+    """
+
+    def __init__(self, coords, ring_offsets, part_offsets, feature_offsets, properties):
+        self.coords = np.asarray(coords, dtype="float64").reshape(-1, 2)
+        self.ring_offsets = np.asarray(ring_offsets, dtype=np.int64)
+        self.part_offsets = np.asarray(part_offsets, dtype=np.int64)
+        self.feature_offsets = np.asarray(feature_offsets, dtype=np.int64)
+        self.properties = list(properties)
+        self.bbox = self._feature_bbox()
+        self._simplified = {}
+
+    @classmethod
+    def from_geojson(cls, gj: dict):
+        """FeatureCollection/Feature/geometria -> GeometryArrays (só Polygon e MultiPolygon; o resto é ignorado)."""
+        t = (gj or {}).get("type")
+        if t == "FeatureCollection":
+            feats = gj.get("features") or []
+        elif t == "Feature":
+            feats = [gj]
+        else:
+            feats = [{"type": "Feature", "geometry": gj, "properties": {}}] if gj else []
+
+        rings, ring_off, part_off, feat_off, props = [], [0], [0], [0], []
+        n = 0
+        for f in feats:
+            geom = f.get("geometry") or {}
+            if geom.get("type") == "Polygon":
+                polys = [geom.get("coordinates") or []]
+            elif geom.get("type") == "MultiPolygon":
+                polys = geom.get("coordinates") or []
+            else:
+                continue
+            for poly in polys:
+                for ring in poly:
+                    arr = _positions(ring) if ring else np.empty((0, 2))
+                    if len(arr) < 3:
+                        continue
+                    rings.append(arr)
+                    n += len(arr)
+                    ring_off.append(n)
+                part_off.append(len(ring_off) - 1)
+            feat_off.append(len(part_off) - 1)
+            props.append(f.get("properties") or {})
+        coords = np.concatenate(rings) if rings else np.empty((0, 2))
+        return cls(coords, ring_off, part_off, feat_off, props)
+
+    def __len__(self):
+        return len(self.feature_offsets) - 1
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in (self.coords, self.ring_offsets, self.part_offsets, self.feature_offsets))
+
+    @property
+    def bounds(self):
+        """(lon_min, lat_min, lon_max, lat_max) de todas as feições; None se não houver coordenadas."""
+        if not np.isfinite(self.bbox).any():
+            return None
+        lo, hi = np.nanmin(self.bbox[:, :2], axis=0), np.nanmax(self.bbox[:, 2:], axis=0)
+        return float(lo[0]), float(lo[1]), float(hi[0]), float(hi[1])
+
+    def _feature_bbox(self) -> np.ndarray:
+        out = np.full((len(self), 4), np.nan)
+        # Os vértices de cada feição são contíguos: mín./máx. por fatia com reduceat
+        ini = self.ring_offsets[self.part_offsets[self.feature_offsets]]
+        tem = ini[1:] > ini[:-1]
+        if not tem.any():
+            return out
+        ini = ini[:-1][tem]
+        for k in (0, 1):
+            col = np.ascontiguousarray(self.coords[:, k])
+            out[tem, k] = np.fmin.reduceat(col, ini)
+            out[tem, k + 2] = np.fmax.reduceat(col, ini)
+        return out
+
+    def rings(self, feature: int):
+        """Polígonos da feição, cada um como [anel externo, buracos...] de arrays (n, 2) — formato de points_in_polygon."""
+        polys = []
+        for p in range(self.feature_offsets[feature], self.feature_offsets[feature + 1]):
+            polys.append([self.coords[self.ring_offsets[r]:self.ring_offsets[r + 1]]
+                          for r in range(self.part_offsets[p], self.part_offsets[p + 1])])
+        return polys
+
+    def take(self, features) -> "GeometryArrays":
+        """Só as feições indicadas, na ordem dada."""
+        features = np.asarray(features, dtype=np.int64)
+        parts = _ranges(self.feature_offsets[features], self.feature_offsets[features + 1])
+        rings = _ranges(self.part_offsets[parts], self.part_offsets[parts + 1])
+        verts = _ranges(self.ring_offsets[rings], self.ring_offsets[rings + 1])
+        return GeometryArrays(
+            self.coords[verts],
+            np.r_[0, np.cumsum(self.ring_offsets[rings + 1] - self.ring_offsets[rings])],
+            np.r_[0, np.cumsum(self.part_offsets[parts + 1] - self.part_offsets[parts])],
+            np.r_[0, np.cumsum(self.feature_offsets[features + 1] - self.feature_offsets[features])],
+            [self.properties[f] for f in features],
+        )
+
+    # ---------- Simplificação ----------
+    def simplify(self, tolerance: float) -> "GeometryArrays":
+        """Douglas–Peucker por trecho de fronteira: vizinhos simplificam o trecho comum do mesmo jeito (sem frestas).
+
+        Os anéis são cortados nas junções (vértices em 3+ anéis ou onde muda o número de anéis que passam por ali);
+        cada trecho é dividido sempre pela corda orientada do mesmo jeito, então o resultado é igual nos dois lados.
+        Todos os trechos avançam juntos, um nível de subdivisão por iteração. O resultado fica guardado por tolerância.
+        """
+        if not len(self.coords) or tolerance <= 0:
+            return self
+        if tolerance not in self._simplified:
+            self._simplified[tolerance] = self._simplify(tolerance)
+        return self._simplified[tolerance]
+
+    def _simplify(self, tolerance: float) -> "GeometryArrays":
+        starts, ends = self.ring_offsets[:-1], self.ring_offsets[1:]
+        n_rings = len(starts)
+        # Anéis abertos (sem o vértice de fechamento): posição de cada vértice dentro do seu anel
+        fechado = (ends - starts > 1) & np.all(self.coords[ends - 1] == self.coords[starts], axis=1)
+        tam_anel = (ends - starts) - fechado
+        base_anel = np.cumsum(tam_anel) - tam_anel
+        anel = np.repeat(np.arange(n_rings), tam_anel)
+        base, tam = base_anel[anel], tam_anel[anel]
+        pos = np.arange(len(anel)) - base
+        xy = self.coords[np.repeat(starts, tam_anel) + pos]
+
+        # Grau = em quantos anéis o vértice aparece; chave = id do vértice, igual em todos os anéis
+        q = np.round(xy * _VERTEX_GRID).astype(np.int64)
+        _, chave, grau = np.unique((q[:, 0] << 32) + q[:, 1], return_inverse=True, return_counts=True)
+        g = grau[chave]
+        # Junção: vértice em 3+ anéis, ou fim de um trecho comum a dois anéis (vizinho só deste anel)
+        ant, prox = base + (pos - 1) % tam, base + (pos + 1) % tam
+        junc = (g >= 3) | ((g == 2) & ((g[ant] == 1) | (g[prox] == 1))) | (tam < 4)
+
+        # Anel sem junção (ilha, contorno externo, enclave): fixa o vértice mais a sudoeste e o mais distante dele
+        sem = np.bincount(anel, weights=junc, minlength=n_rings) == 0
+        if sem.any():
+            ordem = np.lexsort((xy[:, 1], xy[:, 0], anel))
+            sw = np.full(n_rings, -1)
+            sw[anel[ordem[::-1]]] = ordem[::-1]
+            d = np.hypot(*(xy - xy[sw[anel]]).T)
+            ordem = np.lexsort((-d, anel))
+            longe = np.full(n_rings, -1)
+            longe[anel[ordem[::-1]]] = ordem[::-1]
+            junc[sw[sem]] = True
+            junc[longe[sem]] = True
+
+        # Cada anel girado para começar numa junção e fechado nela: trechos = pares de junções consecutivas
+        js = np.flatnonzero(junc)
+        primeira = np.zeros(n_rings, dtype=np.int64)
+        primeira[anel[js[::-1]]] = pos[js[::-1]]
+        n_seq = tam_anel + 1
+        k = np.arange(n_seq.sum()) - np.repeat(np.cumsum(n_seq) - n_seq, n_seq)
+        seq = np.repeat(base_anel, n_seq) + (np.repeat(primeira, n_seq) + k) % np.repeat(tam_anel, n_seq)
+        anel_seq = np.repeat(np.arange(n_rings), n_seq)
+        px, py, chave_seq = xy[seq, 0], xy[seq, 1], chave[seq]
+        js = np.flatnonzero(junc[seq])
+        mesmo = anel_seq[js[:-1]] == anel_seq[js[1:]]
+        lo, hi = js[:-1][mesmo], js[1:][mesmo]
+
+        keep = junc.copy()
+        while len(lo):
+            m = hi - lo - 1
+            lo, hi, m = lo[m > 0], hi[m > 0], m[m > 0]
+            if not len(lo):
+                break
+            ini = np.cumsum(m) - m
+            seg = np.repeat(np.arange(len(lo)), m)
+            p = np.repeat(lo + 1 - ini, m) + np.arange(m.sum())
+            # Corda orientada do menor para o maior extremo: mesma conta nos dois anéis que dividem o trecho
+            ax, ay, bx, by = px[lo], py[lo], px[hi], py[hi]
+            inv = (ax > bx) | ((ax == bx) & (ay > by))
+            ax, bx = np.where(inv, bx, ax), np.where(inv, ax, bx)
+            ay, by = np.where(inv, by, ay), np.where(inv, ay, by)
+            abx, aby = bx - ax, by - ay
+            den = abx * abx + aby * aby
+            # Valores por trecho repetidos para cada vértice interno (seg é crescente)
+            abx_p, aby_p, den_p = np.repeat(abx, m), np.repeat(aby, m), np.repeat(den, m)
+            vx, vy = px[p] - np.repeat(ax, m), py[p] - np.repeat(ay, m)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                t = np.where(den_p > 0, (vx * abx_p + vy * aby_p) / den_p, 0.0)
+            np.clip(t, 0.0, 1.0, out=t)
+            dx, dy = vx - t * abx_p, vy - t * aby_p
+            d = dx * dx + dy * dy  # distância ao quadrado: basta para comparar
+            dmax = np.maximum.reduceat(d, ini)
+            # Vértice mais distante de cada trecho (empate: menor chave, que não depende do sentido)
+            c = np.flatnonzero(d == np.repeat(dmax, m))
+            if len(c) > len(lo):
+                c = c[np.lexsort((chave_seq[p[c]], seg[c]))]
+                c = c[np.r_[True, seg[c][1:] != seg[c][:-1]]]
+            c = c[dmax[seg[c]] > tolerance * tolerance]
+            s, meio = seg[c], p[c]
+            keep[seq[meio]] = True
+            lo, hi = np.concatenate([lo[s], meio]), np.concatenate([meio, hi[s]])
+
+        # Anéis com menos de 3 vértices mantidos voltam a um triângulo com vértices do original
+        n_keep = np.bincount(anel, weights=keep, minlength=n_rings)
+        for r in np.flatnonzero(n_keep < 3):
+            keep[base_anel[r] + np.linspace(0, tam_anel[r] - 1, min(3, tam_anel[r])).astype(np.int64)] = True
+        kidx = np.flatnonzero(keep)
+        n_keep = np.bincount(anel[kidx], minlength=n_rings)
+        fim = np.cumsum(n_keep)
+        out = np.insert(kidx, fim, kidx[fim - n_keep])
+        ring_off = np.r_[0, np.cumsum(n_keep + 1)]
+        return GeometryArrays(xy[out], ring_off, self.part_offsets, self.feature_offsets, self.properties)
+
+    # ---------- Sidecar ----------
+    def save(self, path: str):
+        # .npz sem compressão: recarrega em milissegundos (propriedades em JSON num array de bytes)
+        props = np.frombuffer(json.dumps(self.properties, ensure_ascii=False).encode("utf-8"), dtype=np.uint8)
+        np.savez(path, coords=self.coords, ring_offsets=self.ring_offsets, part_offsets=self.part_offsets,
+                 feature_offsets=self.feature_offsets, properties=props)
+
+    @classmethod
+    def load(cls, path: str) -> "GeometryArrays":
+        with np.load(path, allow_pickle=False) as z:
+            props = json.loads(z["properties"].tobytes().decode("utf-8"))
+            return cls(z["coords"], z["ring_offsets"], z["part_offsets"], z["feature_offsets"], props)
+
+    # ---------- Saída ----------
+    def to_geojson(self, properties=None, decimals: int = 5) -> str:
+        """FeatureCollection em texto; `properties` (lista de dicts) substitui as propriedades originais."""
+        props = self.properties if properties is None else properties
+        coords = np.round(self.coords, decimals).tolist()
+        feats = []
+        for f in range(len(self)):
+            polys = []
+            for p in range(self.feature_offsets[f], self.feature_offsets[f + 1]):
+                polys.append([coords[self.ring_offsets[r]:self.ring_offsets[r + 1]]
+                              for r in range(self.part_offsets[p], self.part_offsets[p + 1])])
+            feats.append({"type": "Feature", "properties": props[f],
+                          "geometry": {"type": "MultiPolygon", "coordinates": polys}})
+        return json.dumps({"type": "FeatureCollection", "features": feats}, separators=(",", ":"))
+
+
+def _ranges(starts, stops) -> np.ndarray:
+    # Concatenação de arange(a, b) para cada par, sem laço
+    n = stops - starts
+    return np.repeat(starts - np.r_[0, np.cumsum(n)[:-1]], n) + np.arange(n.sum())
+
+
+# ---------- Limites de qualquer GeoJSON ----------
+def coordinate_array(gj) -> np.ndarray:
+    """Todas as posições [lon, lat] de um GeoJSON (qualquer tipo, inclusive GeometryCollection) como array (n, 2).
+
+    A profundidade vem do tipo da geometria, não da forma da lista: um par de números dentro de um anel
+    nunca é confundido com um ponto, e posições com altitude ([lon, lat, z]) entram normalmente.
+    """
+    partes = []
+    pilha = [gj]
+    while pilha:
+        obj = pilha.pop()
+        if not isinstance(obj, dict):
+            continue
+        t = obj.get("type")
+        if t == "FeatureCollection":
+            pilha.extend(obj.get("features") or [])
+        elif t == "Feature":
+            pilha.append(obj.get("geometry"))
+        elif t == "GeometryCollection":
+            pilha.extend(obj.get("geometries") or [])
+        elif t in _DEPTH:
+            coords = obj.get("coordinates")
+            # Desce até as listas de posições (anéis/linhas); cada uma vira um array de uma vez
+            listas = [[coords]] if t == "Point" else [coords]
+            for _ in range(_DEPTH[t] - 2):
+                listas = [c for lista in listas if lista for c in lista]
+            partes.extend(_positions(lista) for lista in listas if lista)
+    return np.concatenate(partes) if partes else np.empty((0, 2))
+
+
+def _positions(lista) -> np.ndarray:
+    # fromiter sobre a lista achatada é ~2,5x mais rápido que np.asarray na lista de listas
+    try:
+        arr = np.fromiter(chain.from_iterable(lista), dtype="float64")
+        for dim in (2, 3):
+            if arr.size == dim * len(lista):
+                return arr.reshape(-1, dim)[:, :2]
+    except (TypeError, ValueError):
+        pass
+    # Anel misturando [lon, lat] e [lon, lat, z], ou com entradas inválidas: posição a posição, só as numéricas
+    pos = [c[:2] for c in lista if isinstance(c, (list, tuple)) and len(c) >= 2
+           and all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in c[:2])]
+    return np.asarray(pos, dtype="float64").reshape(-1, 2)
+
+
+def geojson_bounds(gj: dict):
+    """((lat_min, lon_min), (lat_max, lon_max)) de um GeoJSON — o formato do fit_bounds; None se vazio."""
+    xy = coordinate_array(gj) if gj else np.empty((0, 2))
+    xy = xy[np.isfinite(xy).all(axis=1)]
+    if not len(xy):
+        return None
+    lo, hi = xy.min(axis=0), xy.max(axis=0)
+    return (float(lo[1]), float(lo[0])), (float(hi[1]), float(hi[0]))
+
+
+# ---------- Leitura com cache ----------
+def read_geojson(path: str) -> dict:
+    """json.load do arquivo, uma vez por versão do arquivo (cache do processo)."""
+    sig = file_signature(path)
+    hit = _CACHE.get(("json", path))
+    if hit is None or hit[0] != sig:
+        with open(path, encoding="utf-8") as f:
+            hit = (sig, json.load(f))
+        _CACHE[("json", path)] = hit
+    return hit[1]
+
+
+def load_geojson_any(path_candidates):
+    """GeoJSON (dict) do primeiro candidato que existir e abrir; None se nenhum existir.
+
+    Um arquivo que existe mas não abre é pulado; se nenhum abrir, o erro do primeiro sobe para quem chamou.
+    Para arrays/limites use load_geometry / geojson_bounds.
+    """
+    erro = None
+    for p in path_candidates:
+        if p and os.path.exists(p):
+            try:
+                return read_geojson(p)
+            except (OSError, ValueError) as e:
+                erro = erro or e
+    if erro is not None:
+        raise erro
+    return None
+
+
+def _sidecar_path(sig, tolerance: float) -> str:
+    path, mtime_ns, size = sig
+    nome = f"{os.path.basename(path)}.{mtime_ns}-{size}-g{SIDECAR_VERSION}" + (f"-s{tolerance:.6e}" if tolerance else "")
+    return os.path.join(cache_dir_for(path), nome + ".npz")
+
+
+def load_geometry(path: str, tolerance: float = 0.0) -> GeometryArrays:
+    """GeometryArrays do arquivo (simplificada se `tolerance` > 0), com cache em memória e sidecar .npz.
+
+    A primeira leitura interpreta o JSON e grava o sidecar na pasta de cache ao lado do arquivo;
+    as seguintes (inclusive em outro processo) só carregam os arrays.
+    """
+    sig = file_signature(path)
+    chave = ("arrays", path, tolerance)
+    hit = _CACHE.get(chave)
+    if hit is not None and hit[0] == sig:
+        return hit[1]
+    p = _sidecar_path(sig, tolerance)
+    geom = None
+    if os.path.exists(p):
+        try:
+            geom = GeometryArrays.load(p)
+        except Exception:
+            geom = None
+    if geom is None:
+        geom = (load_geometry(path) if tolerance else GeometryArrays.from_geojson(read_geojson(path)))
+        geom = geom.simplify(tolerance) if tolerance else geom
+        _write_sidecar(sig, p, geom)
+    _CACHE[chave] = (sig, geom)
+    return geom
+
+
+def _write_sidecar(sig, p: str, geom: GeometryArrays):
+    try:
+        os.makedirs(os.path.dirname(p), exist_ok=True)
+        # Remove sidecars de versões anteriores do mesmo arquivo
+        prefix = os.path.basename(sig[0]) + "."
+        atual = f"{prefix}{sig[1]}-{sig[2]}-g{SIDECAR_VERSION}"
+        for old in glob.glob(os.path.join(glob.escape(os.path.dirname(p)), glob.escape(prefix) + "*.npz")):
+            if not os.path.basename(old).startswith(atual):
+                os.remove(old)
+        tmp = p[:-4] + ".tmp.npz"
+        geom.save(tmp)
+        os.replace(tmp, p)
+    except Exception:
+        # Pasta somente leitura: segue só com o cache em memória
+        pass
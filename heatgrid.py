@@ -0,0 +1,222 @@
+import base64
+import json
+import zlib
+
+import numpy as np
+from folium.elements import JSCSSMixin
+from folium.map import Layer
+from folium.plugins import HeatMap
+from folium.template import Template
+from folium.utilities import remove_empty
+
+from colstore import json_rows
+
+# =====================================================
+# Mapa de calor agregado no servidor (grade multi-resolução)
+# =====================================================
+# Zooms em que a grade é pré-calculada; cada faixa vale do seu zoom até o próximo.
+ZOOM_BANDS = (4, 6, 8, 10, 12)
+# Lado da célula em pixels de tela no zoom da faixa (o Leaflet.heat agrupa em ~radius/2 px).
+CELL_PX = 6
+_MAX_LAT = 85.05112878
+# Payload compacto: posição em pixels Mercator inteiros no zoom da faixa (pontos brutos: neste zoom, ~2 m),
+# peso em uint8 na escala raiz quadrada do máximo da faixa
+RAW_PRECISION_ZOOM = 16
+WEIGHT_LEVELS = 255
+
+
+def mercator_cells(lat, lon, zoom: int, cell_px: int = CELL_PX):
+    # Índices (x, y) da célula na projeção Web Mercator — mesma grade dos tiles/quadkeys
+    lat = np.clip(np.asarray(lat, dtype="float64"), -_MAX_LAT, _MAX_LAT)
+    lon = np.asarray(lon, dtype="float64")
+    n = 256 * 2 ** zoom / cell_px
+    s = np.sin(np.radians(lat))
+    x = (lon + 180.0) / 360.0 * n
+    y = (0.5 - np.log((1 + s) / (1 - s)) / (4 * np.pi)) * n
+    return np.floor(x).astype(np.int64), np.floor(y).astype(np.int64), int(np.ceil(n))
+
+
+def mercator_pixels(lat, lon, zoom: int):
+    # Pixels inteiros (x, y) no zoom; inverso em decodificaFaixa (JS)
+    lat = np.clip(np.asarray(lat, dtype="float64"), -_MAX_LAT, _MAX_LAT)
+    lon = np.asarray(lon, dtype="float64")
+    n = 256 * 2 ** zoom
+    s = np.sin(np.radians(lat))
+    x = (lon + 180.0) / 360.0 * n
+    y = (0.5 - np.log((1 + s) / (1 - s)) / (4 * np.pi)) * n
+    return np.round(x).astype(np.int64), np.round(y).astype(np.int64)
+
+
+def _planes(a: np.ndarray) -> bytes:
+    # Bytes de mesma ordem juntos (byte 0 de todos, depois byte 1...): comprime bem melhor
+    return a.view(np.uint8).reshape(-1, a.itemsize).T.tobytes()
+
+
+def encode_band(pts: np.ndarray, zoom: int, row_px: int = CELL_PX) -> dict:
+    """Faixa [[lat, lon, peso], ...] -> {"n", "z", "w", "b"} com os bytes em base64.
+
+    Pontos ordenados por linha de células e coluna; x e y vão como deltas int32 e o peso como uint8
+    (raiz quadrada de peso / w). Tudo comprimido com zlib (DecompressionStream("deflate") no navegador).
+    """
+    n = len(pts)
+    if n == 0:
+        return {"n": 0, "z": zoom, "w": 0.0, "b": ""}
+    x, y = mercator_pixels(pts[:, 0], pts[:, 1], zoom)
+    order = np.lexsort((x, y // row_px))
+    x, y, w = x[order], y[order], pts[order, 2]
+    w_max = float(w.max()) if w.max() > 0 else 1.0
+    q = np.round(np.sqrt(np.clip(w, 0, None) / w_max) * WEIGHT_LEVELS).astype(np.uint8)
+    q[(q == 0) & (w > 0)] = 1
+    dx = np.diff(x, prepend=0).astype(np.int32)
+    dy = np.diff(y, prepend=0).astype(np.int32)
+    raw = _planes(dx) + _planes(dy) + q.tobytes()
+    return {"n": n, "z": zoom, "w": w_max, "b": base64.b64encode(zlib.compress(raw)).decode("ascii")}
+
+
+def bin_points(lat, lon, weight, zoom: int, cell_px: int = CELL_PX) -> np.ndarray:
+    """Soma os pesos por célula; devolve [[lat, lon, peso], ...] no centróide ponderado."""
+    lat = np.asarray(lat, dtype="float64")
+    lon = np.asarray(lon, dtype="float64")
+    weight = np.asarray(weight, dtype="float64")
+    if len(lat) == 0:
+        return np.empty((0, 3))
+    ix, iy, n = mercator_cells(lat, lon, zoom, cell_px)
+    _, inv = np.unique(ix * (n + 1) + iy, return_inverse=True)
+    w = np.bincount(inv, weights=weight)
+    lat_c = np.bincount(inv, weights=lat * weight) / w
+    lon_c = np.bincount(inv, weights=lon * weight) / w
+    return np.column_stack([lat_c, lon_c, w])
+
+
+class HeatGrid:
+    """Pré-agrega os pontos de calor em todas as faixas de zoom de uma vez."""
+
+    def __init__(self, lat, lon, weight, bands=ZOOM_BANDS, cell_px: int = CELL_PX, binned: bool = True):
+        self.bands = tuple(sorted(bands))
+        self.cell_px = cell_px
+        self.n_points = len(lat)
+        self.binned = binned
+        if binned:
+            self.levels = {z: bin_points(lat, lon, weight, z, cell_px) for z in self.bands}
+        else:
+            # Pontos brutos numa única faixa: mesmo BinnedHeatMap, sem agregação
+            self.bands = self.bands[:1]
+            self.levels = {self.bands[0]: np.column_stack([lat, lon, weight]).astype("float64")}
+        self._json = None
+        self._payload = None
+
+    @classmethod
+    def from_points(cls, heat_data, **kwargs):
+        arr = np.asarray(heat_data, dtype="float64").reshape(-1, 3)
+        return cls(arr[:, 0], arr[:, 1], arr[:, 2], **kwargs)
+
+    def band_for_zoom(self, zoom: int) -> int:
+        below = [z for z in self.bands if z <= zoom]
+        return below[-1] if below else self.bands[0]
+
+    def points(self, zoom: int) -> np.ndarray:
+        return self.levels[self.band_for_zoom(zoom)]
+
+    @property
+    def nbytes(self) -> int:
+        # Faixas + textos já serializados (to_json/to_payload guardam o resultado na grade)
+        return sum(p.nbytes for p in self.levels.values()) + len(self._json or "") + len(self._payload or "")
+
+    def to_json(self) -> str:
+        # {"zoom": [[lat, lon, peso], ...]}; serializado uma vez por grade
+        if self._json is None:
+            self._json = "{" + ",".join(
+                f'"{z}":' + json_rows([pts[:, 0], pts[:, 1], pts[:, 2]], decimals=[6, 6, 6])
+                for z, pts in self.levels.items()
+            ) + "}"
+        return self._json
+
+    def to_payload(self) -> str:
+        # {"zoom": faixa codificada (encode_band)}; ~10x menor que to_json
+        if self._payload is None:
+            self._payload = json.dumps({
+                str(z): encode_band(pts, z) if self.binned else encode_band(pts, RAW_PRECISION_ZOOM, 1)
+                for z, pts in self.levels.items()
+            })
+        return self._payload
+
+
+class BinnedHeatMap(JSCSSMixin, Layer):
+    """HeatMap que recebe uma célula ponderada por ponto e troca de faixa no zoomend.
+
+    Com `compact` as faixas vão em binário (HeatGrid.to_payload) e são decodificadas no navegador.
+    """
+
+    _template = Template(
+        """
+        {% macro script(this, kwargs) %}
+            var {{ this.get_name() }} = L.heatLayer([], {{ this.options|tojavascript }});
+            (function (camada, faixas, compacto) {
+                var zooms = Object.keys(faixas).map(Number).sort(function (a, b) { return a - b; });
+                var mapa = null, atual = null, prontas = {};
+                function decodificaFaixa(f) {
+                    // Inverso de heatgrid.encode_band: zlib -> deltas int32 (x, y) em planos de bytes + peso uint8
+                    if (!f.n) { return Promise.resolve([]); }
+                    var bin = atob(f.b), bytes = new Uint8Array(bin.length);
+                    for (var j = 0; j < bin.length; j++) { bytes[j] = bin.charCodeAt(j); }
+                    var fluxo = new Blob([bytes]).stream().pipeThrough(new DecompressionStream("deflate"));
+                    return new Response(fluxo).arrayBuffer().then(function (buf) {
+                        var u = new Uint8Array(buf), n = f.n, escala = 256 * Math.pow(2, f.z), pts = new Array(n);
+                        var x = 0, y = 0, k = f.w / ({{ this.weight_levels }} * {{ this.weight_levels }});
+                        for (var i = 0; i < n; i++) {
+                            x += u[i] | (u[n + i] << 8) | (u[2 * n + i] << 16) | (u[3 * n + i] << 24);
+                            y += u[4 * n + i] | (u[5 * n + i] << 8) | (u[6 * n + i] << 16) | (u[7 * n + i] << 24);
+                            var q = u[8 * n + i];
+                            pts[i] = [
+                                Math.atan(Math.sinh(Math.PI * (1 - 2 * y / escala))) * 180 / Math.PI,
+                                x / escala * 360 - 180,
+                                q * q * k
+                            ];
+                        }
+                        return pts;
+                    });
+                }
+                function pontos(z) {
+                    if (!prontas[z]) { prontas[z] = compacto ? decodificaFaixa(faixas[z]) : Promise.resolve(faixas[z]); }
+                    return prontas[z];
+                }
+                function atualiza() {
+                    var faixa = zooms[0];
+                    zooms.forEach(function (z) { if (z <= mapa.getZoom()) { faixa = z; } });
+                    if (faixa !== atual) {
+                        atual = faixa;
+                        pontos(faixa).then(function (pts) { if (atual === faixa) { camada.setLatLngs(pts); } });
+                    }
+                }
+                camada.on("add", function () { mapa = camada._map; mapa.on("zoomend", atualiza); atualiza(); });
+                camada.on("remove", function () { if (mapa) { mapa.off("zoomend", atualiza); } atual = null; });
+            })({{ this.get_name() }}, {{ this.bands_json }}, {{ this.compact|tojson }});
+        {% endmacro %}
+        """
+    )
+
+    default_js = HeatMap.default_js
+
+    def __init__(self, grid: HeatGrid, name=None, min_opacity=0.5, max_zoom=18, radius=25,
+                 blur=15, gradient=None, overlay=True, control=True, show=True, compact=True, **kwargs):
+        super().__init__(name=name, overlay=overlay, control=control, show=show)
+        self._name = "BinnedHeatMap"
+        self.grid = grid
+        # compact: faixas em binário comprimido (to_payload); False embute as listas JSON
+        self.compact = compact
+        self.weight_levels = WEIGHT_LEVELS
+        self.bands_json = grid.to_payload() if compact else grid.to_json()
+        self.options = remove_empty(
+            min_opacity=min_opacity,
+            max_zoom=max_zoom,
+            radius=radius,
+            blur=blur,
+            gradient=gradient,
+            **kwargs
+        )
+
+    def _get_self_bounds(self):
+        pts = self.grid.levels[self.grid.bands[-1]]
+        if not len(pts):
+            return [[None, None], [None, None]]
+        return [[pts[:, 0].min(), pts[:, 1].min()], [pts[:, 0].max(), pts[:, 1].max()]]
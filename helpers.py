@@ -0,0 +1,129 @@
+import re
+import unicodedata
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# =====================================================
+# Funções utilitárias compartilhadas (sem dependência de Streamlit)
+# =====================================================
+def autodetect_coords(df: pd.DataFrame):
+    candidates_lat = [c for c in df.columns if re.search(r"(?:^|\b)(lat|latitude|y)(?:\b|$)", c, re.I)]
+    candidates_lon = [c for c in df.columns if re.search(r"(?:^|\b)(lon|long|longitude|x)(?:\b|$)", c, re.I)]
+    if candidates_lat and candidates_lon:
+        return candidates_lat[0], candidates_lon[0]
+    for c in df.columns:
+        if re.search(r"coord|coordenad", c, re.I):
+            try:
+                tmp = df[c].astype(str).str.extract(r"(-?\d+[\.,]?\d*)\s*[,;]\s*(-?\d+[\.,]?\d*)")
+                tmp.columns = ["LATITUDE", "LONGITUDE"]
+                tmp["LATITUDE"] = tmp["LATITUDE"].str.replace(",", ".", regex=False).astype(float)
+                tmp["LONGITUDE"] = tmp["LONGITUDE"].str.replace(",", ".", regex=False).astype(float)
+                df["__LAT__"], df["__LON__"] = tmp["LATITUDE"], tmp["LONGITUDE"]
+                return "__LAT__", "__LON__"
+            except Exception:
+                return None
+    return None
+
+_NUM_PATTERN = r"-?\d+[.,]?\d*"
+_NUM_RE = re.compile(_NUM_PATTERN)
+
+def _conv_float(v):
+    if pd.isna(v): return None
+    txt = str(v)
+    m = _NUM_RE.search(txt)
+    if not m: return None
+    try: return float(m.group(0).replace(",", "."))
+    except Exception: return None
+
+def to_float_series_rowwise(s: pd.Series) -> pd.Series:
+    # Versão original (uma regex + float() por célula); mantida como referência
+    return s.apply(_conv_float)
+
+def to_float_series(s: pd.Series) -> pd.Series:
+    # Versão vetorizada de to_float_series_rowwise: mesmos valores, sempre float64 (NaN no lugar de None)
+    if pd.api.types.is_numeric_dtype(s.dtype) and not pd.api.types.is_bool_dtype(s.dtype):
+        # Caminho rápido: coluna já numérica
+        vals = s.to_numpy(dtype="float64", na_value=np.nan)
+        out = np.where(np.isfinite(vals), vals, np.nan)
+        # str(v) vira notação científica fora de [1e-4, 1e16) — ex.: "1e-05" -> 1.0
+        a = np.abs(vals)
+        odd = np.isfinite(vals) & (a != 0) & ((a < 1e-4) | (a >= 1e16))
+        if odd.any():
+            out[odd] = [np.nan if r is None else r for r in map(_conv_float, s[odd].tolist())]
+        return pd.Series(out, index=s.index, name=s.name)
+
+    out = np.full(len(s), np.nan)
+    mask = s.notna().to_numpy()
+    if mask.any():
+        # Cada texto distinto é convertido uma vez só (coordenadas se repetem muito no histórico)
+        codes, uniques = pd.factorize(s[mask].astype(str))
+        out[mask] = _parse_texts(uniques)[codes]
+    return pd.Series(out, index=s.index, name=s.name)
+
+# Mesmo padrão para o RE2 do Arrow: \p{Nd} equivale ao \d (Unicode) do re do Python
+_NUM_PATTERN_RE2 = r"-?\p{Nd}+[.,]?\p{Nd}*"
+
+def _cast_numbers(num) -> np.ndarray:
+    # num: strings já extraídas (ou nulas); vírgula decimal vira ponto
+    num = pc.replace_substring(num, ",", ".")
+    ascii_ = pc.fill_null(pc.string_is_ascii(num), True).to_numpy(zero_copy_only=False)
+    if ascii_.all():
+        return pc.cast(num, pa.float64()).to_numpy(zero_copy_only=False).astype("float64")
+    # Dígitos fora do ASCII: o float() do Python aceita, o cast do Arrow não
+    return np.array([np.nan if v is None else float(v) for v in num.to_pylist()], dtype="float64")
+
+def _parse_texts(uniques) -> np.ndarray:
+    # Primeiro número do texto (aceita vírgula decimal, ignora "°", "S", etc.)
+    arr = pa.array(uniques, type=pa.large_string())
+    out = np.full(len(arr), np.nan)
+    # Texto que já é só o número: conversão direta, sem extração
+    plain = pc.match_substring_regex(arr, "^" + _NUM_PATTERN_RE2 + "$").to_numpy(zero_copy_only=False)
+    if plain.any():
+        out[plain] = _cast_numbers(arr.filter(pa.array(plain)))
+    if not plain.all():
+        found = pc.extract_regex(arr.filter(pa.array(~plain)), "(?P<v>" + _NUM_PATTERN_RE2 + ")")
+        num = pc.if_else(found.is_valid(), pc.struct_field(found, [0]), pa.scalar(None, pa.large_string()))
+        out[~plain] = _cast_numbers(num)
+    return out
+
+def norm_col(c: str) -> str:
+    s = unicodedata.normalize("NFKD", str(c))
+    s = "".join(ch for ch in s if not unicodedata.combining(ch))
+    s = s.strip().lower()
+    s = re.sub(r"[^a-z0-9]+", "_", s)
+    return s.strip("_")
+
+def br_money(x):
+    # Valor (número ou texto "R$ 1.234,56") formatado como moeda brasileira; se não for número, o texto original
+    try:
+        s = str(x).replace("R$", "").strip()
+        if "," in s and s.count(".") >= 1:
+            s = s.replace(".", "")
+        v = float(s.replace(",", "."))
+        return f"R$ {v:,.2f}".replace(",", "_").replace(".", ",").replace("_", ".")
+    except Exception:
+        return str(x)
+
+def br_number(x, decimals: int = 0):
+    # Número com separadores brasileiros (1.234.567,89); vazio vira "-", texto volta como veio
+    try:
+        v = float(x)
+    except (TypeError, ValueError):
+        return str(x)
+    if np.isnan(v):
+        return "-"
+    return f"{v:,.{decimals}f}".replace(",", "_").replace(".", ",").replace("_", ".")
+
+def pick(colnames, *options):
+    # Primeira opção presente entre as colunas (exata e depois sem diferenciar maiúsculas); None se nenhuma
+    cols = list(colnames)
+    for o in options:
+        if o in cols:
+            return o
+    lower = {c.lower(): c for c in cols}
+    for o in options:
+        if o.lower() in lower:
+            return lower[o.lower()]
+    return None
@@ -0,0 +1,217 @@
+"""Histórico de vários anos fiscais em Parquet particionado (ano fiscal / mês), com ingestão só de acréscimos.
+
+Exemplos:
+    python history_store.py ingerir "Histórico F25.xlsx"
+    python history_store.py ingerir extratos/*.xlsx --ano F26
+    python history_store.py listar
+"""
+import argparse
+import datetime as dt
+import glob
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import uuid
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+from coord_repair import repair_summary
+from data_loader import concat_frames, load_workbook
+from schema import apply_schema
+from timecube import find_period_column, to_periods
+
+# =====================================================
+# Armazém do histórico: <raiz>/ano_fiscal=F25/mes=2024-06/parte-<id>.parquet
+# =====================================================
+STORE_DIR = os.path.join("dados", "historico")
+MANIFEST_NAME = "_ingeridos.json"
+# Ano fiscal começa em junho: jun/2024–mai/2025 = F25
+FISCAL_YEAR_START_MONTH = 6
+# Partição dos extratos sem coluna de data
+NO_MONTH = "sem_data"
+
+_LOCK = threading.Lock()
+
+
+class AlreadyIngestedError(ValueError):
+    pass
+
+
+def fiscal_year_of(periods: pd.Series) -> pd.Series:
+    # Period mensal -> 'F25'
+    ano = periods.dt.year + (periods.dt.month >= FISCAL_YEAR_START_MONTH).astype(int)
+    return "F" + (ano % 100).astype(str).str.zfill(2)
+
+
+def fiscal_year_from_name(path: str):
+    m = re.search(r"\bF(\d{2})\b", os.path.splitext(os.path.basename(path))[0], re.IGNORECASE)
+    return f"F{m.group(1)}" if m else None
+
+
+def file_sha1(path: str) -> str:
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class HistoryStore:
+    def __init__(self, root: str = STORE_DIR):
+        self.root = root
+        self.manifest_path = os.path.join(root, MANIFEST_NAME)
+
+    # ---------- manifesto ----------
+    def ingested(self) -> list:
+        """Extratos já ingeridos: [{arquivo, sha1, linhas, particoes, ingerido_em}, ...]."""
+        if not os.path.exists(self.manifest_path):
+            return []
+        with open(self.manifest_path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def _write_manifest(self, entries):
+        os.makedirs(self.root, exist_ok=True)
+        tmp = self.manifest_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(entries, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, self.manifest_path)
+
+    @property
+    def version(self) -> str:
+        # Muda a cada ingestão (o manifesto é regravado)
+        if not os.path.exists(self.manifest_path):
+            return f"{os.path.abspath(self.root)}:vazio"
+        st_ = os.stat(self.manifest_path)
+        return f"{os.path.abspath(self.root)}:{st_.st_mtime_ns}:{st_.st_size}"
+
+    # ---------- escrita ----------
+    def ingest(self, path: str, fiscal_year: str = None) -> dict:
+        """Acrescenta um extrato ao armazém; nada é reescrito. Recusa arquivos já ingeridos (mesmo conteúdo)."""
+        sha1 = file_sha1(path)
+        with _LOCK:
+            entries = self.ingested()
+            prev = next((e for e in entries if e["sha1"] == sha1), None)
+            if prev is not None:
+                raise AlreadyIngestedError(f"'{path}' já foi ingerido como '{prev['arquivo']}' em {prev['ingerido_em']}.")
+
+            df = load_workbook(path, schema="historico", repair=True)
+            leitura = df.attrs.get("ingestao") or {}
+            c_periodo = find_period_column(df)
+            meses = to_periods(df[c_periodo]) if c_periodo else pd.Series(pd.NaT, index=df.index, dtype="period[M]")
+            ano_nome = fiscal_year or fiscal_year_from_name(path)
+            if fiscal_year:
+                anos = pd.Series(fiscal_year, index=df.index)
+            else:
+                anos = fiscal_year_of(meses).where(meses.notna(), ano_nome)
+            if anos.isna().any():
+                raise ValueError(f"Não foi possível definir o ano fiscal de '{path}' (use --ano, ex.: F26).")
+
+            df = df.assign(ano_fiscal=anos.astype(str), mes=meses.astype(str).where(meses.notna(), NO_MONTH))
+            parte = uuid.uuid4().hex[:12]
+            particoes = []
+            for (ano, mes), bloco in df.groupby(["ano_fiscal", "mes"], sort=True):
+                pasta = os.path.join(self.root, f"ano_fiscal={ano}", f"mes={mes}")
+                os.makedirs(pasta, exist_ok=True)
+                destino = os.path.join(pasta, f"parte-{parte}.parquet")
+                bloco.reset_index(drop=True).to_parquet(destino + ".tmp", index=False)
+                os.replace(destino + ".tmp", destino)
+                particoes.append(f"{ano}/{mes}")
+
+            entry = {
+                "arquivo": os.path.basename(path),
+                "sha1": sha1,
+                "linhas": int(len(df)),
+                "particoes": particoes,
+                "ingerido_em": dt.datetime.now().isoformat(timespec="seconds"),
+            }
+            if leitura.get("pico_rss"):
+                entry["pico_rss_mb"] = round(leitura["pico_rss"] / 1e6, 1)
+            coords = df.attrs.get("coordenadas") or {}
+            if coords.get("corrigidas") or coords.get("descartadas"):
+                entry["coordenadas"] = {k: coords[k] for k in ("corrigidas", "descartadas", "correcoes")}
+            self._write_manifest(entries + [entry])
+        return entry
+
+    # ---------- leitura ----------
+    def _files(self, fiscal_years=None, months=None):
+        padrao = os.path.join(glob.escape(self.root), "ano_fiscal=*", "mes=*", "parte-*.parquet")
+        for f in sorted(glob.glob(padrao)):
+            mes = os.path.basename(os.path.dirname(f))[len("mes="):]
+            ano = os.path.basename(os.path.dirname(os.path.dirname(f)))[len("ano_fiscal="):]
+            if (fiscal_years is None or ano in fiscal_years) and (months is None or mes in months):
+                yield ano, mes, f
+
+    def partitions(self) -> pd.DataFrame:
+        """Uma linha por partição: ano_fiscal, mes, arquivos, linhas, bytes (só metadados, sem ler os dados)."""
+        rows = {}
+        for ano, mes, f in self._files():
+            r = rows.setdefault((ano, mes), {"ano_fiscal": ano, "mes": mes, "arquivos": 0, "linhas": 0, "bytes": 0})
+            r["arquivos"] += 1
+            r["linhas"] += pq.ParquetFile(f).metadata.num_rows
+            r["bytes"] += os.path.getsize(f)
+        return pd.DataFrame(list(rows.values()), columns=["ano_fiscal", "mes", "arquivos", "linhas", "bytes"])
+
+    def fiscal_years(self):
+        return sorted({ano for ano, _, _ in self._files()})
+
+    def read(self, fiscal_years=None, months=None, schema=None) -> pd.DataFrame:
+        """Lê só as partições pedidas (None = todas); `schema` reaplica os tipos declarados após juntar."""
+        frames = [pd.read_parquet(f) for _, _, f in self._files(fiscal_years, months)]
+        if not frames:
+            return pd.DataFrame(columns=["__LAT__", "__LON__", "ano_fiscal", "mes"])
+        df = pd.concat(frames, ignore_index=True)
+        return apply_schema(df, schema) if schema else df
+
+    def read_year(self, fiscal_year: str, schema=None) -> pd.DataFrame:
+        return self.read((fiscal_year,), schema=schema)
+
+
+def combine_years(frames, schema=None) -> pd.DataFrame:
+    """Junta frames de anos fiscais já lidos (read_year) sem voltar a ler o disco; categorias são unidas."""
+    if len(frames) == 1:
+        return frames[0]
+    df = concat_frames([f.reset_index(drop=True) for f in frames])
+    return apply_schema(df, schema) if schema else df
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--raiz", default=STORE_DIR, help="pasta do armazém")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    p_ing = sub.add_parser("ingerir", help="acrescenta extratos (.xlsx) ao armazém")
+    p_ing.add_argument("arquivos", nargs="+")
+    p_ing.add_argument("--ano", help="ano fiscal (ex.: F26); padrão: pela data de cada linha ou pelo nome do arquivo")
+    sub.add_parser("listar", help="mostra as partições e os extratos já ingeridos")
+    args = parser.parse_args(argv)
+
+    store = HistoryStore(args.raiz)
+    if args.comando == "ingerir":
+        status = 0
+        for path in args.arquivos:
+            try:
+                entry = store.ingest(path, fiscal_year=args.ano)
+            except AlreadyIngestedError as e:
+                print(f"ignorado: {e}")
+            except (ValueError, OSError) as e:
+                print(f"erro: {path}: {e}")
+                status = 1
+            else:
+                pico = f", pico RSS {entry['pico_rss_mb']} MB" if "pico_rss_mb" in entry else ""
+                print(f"{path}: {entry['linhas']} linha(s) em {len(entry['particoes'])} partição(ões){pico}")
+                if "coordenadas" in entry:
+                    print(f"  {repair_summary(entry['coordenadas'])}")
+        return status
+
+    parts = store.partitions()
+    print(parts.to_string(index=False) if not parts.empty else "Armazém vazio.")
+    for e in store.ingested():
+        print(f"{e['ingerido_em']}  {e['arquivo']}  ({e['linhas']} linhas)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+import numpy as np
+import pandas as pd
+from branca.element import Template
+from folium.map import Layer
+from folium.plugins import FastMarkerCluster
+
+from colstore import join_rows
+from scaling import DEFAULT_SCALE, scale_values
+
+# =====================================================
+# Camadas de mapa vetorizadas (um único objeto Leaflet por métrica)
+# =====================================================
+def scale_radius(values, max_val=None, max_radius_meters=15000, method=DEFAULT_SCALE):
+    # Raio em metros: 300 m + fração da escala (scaling.scale_values), limitado ao máximo (0 = não desenha)
+    s = scale_values(values, method, top=max_val)
+    radius = np.minimum(300 + s * max_radius_meters, max_radius_meters)
+    return np.where(s > 0, radius, 0.0)
+
+
+def _feature_collection(lat, lon, radius, values, counts=None) -> str:
+    # Texto gerado direto dos arrays (float32 sai pela representação curta: 7863.87, não 7863.8701171875)
+    pieces = [
+        '{"type":"Feature","geometry":{"type":"Point","coordinates":[', (lon, 6), ",", (lat, 6),
+        ']},"properties":{"r":', (radius, 1), ',"v":', values,
+    ]
+    # Pontos agregados (mapas.colocated): quantas linhas cada bolha soma
+    if counts is not None:
+        pieces += [',"n":', counts]
+    feats = join_rows(pieces + ["}}"])
+    return '{"type":"FeatureCollection","features":[' + feats + "]}"
+
+
+def bubble_data(lat, lon, values, max_val=None, method=DEFAULT_SCALE, counts=None) -> str:
+    # FeatureCollection das bolhas (raio em metros + valor [+ linhas somadas]), pronta para embutir no HTML.
+    # lat/lon/values podem ser visões somente leitura (ex.: .npy mapeados, ver colstore)
+    radius = scale_radius(values, max_val, method=method)
+    keep = radius > 0
+    return _feature_collection(np.asarray(lat)[keep], np.asarray(lon)[keep], radius[keep], np.asarray(values)[keep],
+                               None if counts is None else np.asarray(counts)[keep])
+
+
+class BubbleLayer(Layer):
+    """Bolhas de uma métrica como um único L.geoJson; popup/tooltip montados no navegador."""
+
+    _template = Template(
+        """
+        {% macro script(this, kwargs) %}
+            var {{ this.get_name() }} = L.geoJson({{ this.data }}, {
+                pointToLayer: function (feature, latlng) {
+                    return L.circle(latlng, Object.assign({radius: feature.properties.r}, {{ this.style|tojson }}));
+                },
+                onEachFeature: function (feature, layer) {
+                    var texto = function () {
+                        return {{ this.prefix|tojson }} + feature.properties.v.toLocaleString("en-US", {
+                            minimumFractionDigits: {{ this.decimals }}, maximumFractionDigits: {{ this.decimals }}
+                        }) + {{ this.suffix|tojson }};
+                    };
+                    layer.bindTooltip(function () { return {{ this.label|tojson }} + ": " + texto(); });
+                    layer.bindPopup(function () {
+                        var n = feature.properties.n;
+                        return "<b>" + {{ this.label|tojson }} + ":</b> " + texto()
+                            + (n > 1 ? "<br>Total de " + n.toLocaleString("pt-BR") + " linhas no mesmo local" : "");
+                    }, {maxWidth: 220});
+                }
+            });
+        {% endmacro %}
+        """
+    )
+
+    def __init__(self, data: str, label: str, color: str,
+                 decimals: int = 0, prefix: str = "", suffix: str = "", show: bool = True):
+        super().__init__(name=f"Bolhas: {label}", overlay=True, control=True, show=show)
+        self._name = "BubbleLayer"
+        self.data = data
+        self.label = label
+        self.prefix = prefix
+        self.suffix = suffix
+        self.decimals = int(decimals)
+        self.style = {"color": color, "fill": True, "fillColor": color, "fillOpacity": 0.6}
+
+
+# Função de cor por tipo
+def get_icon_color(tipo):
+    t = str(tipo).strip().lower()
+    if "cd" == t:
+        return "blue"
+    elif "fábrica" in t or "fabrica" in t:
+        return "darkred"
+    elif "opl" == t:
+        return "purple"
+    elif "tp" == t:
+        return "orange"
+    return "gray"
+
+
+# row = [lat, lon, cor, tipo, nome, abastecedor, cidade, uf]; popup montado só quando aberto
+UNIT_MARKER_CALLBACK = """
+    function (row) {
+        var icon = L.AwesomeMarkers.icon({icon: "building", prefix: "fa", markerColor: row[2], iconColor: "white"});
+        var marker = L.marker(new L.LatLng(row[0], row[1]), {icon: icon});
+        marker.bindTooltip(row[3] + ": " + row[4]);
+        marker.bindPopup(function () {
+            return '<div style="font-family:Arial; font-size:13px">'
+                + '<h4 style="margin:4px 0 8px 0">📍 ' + row[4] + '</h4>'
+                + '<p><b>Tipo:</b> ' + row[3] + '</p>'
+                + '<p><b>Abastecido por:</b> ' + row[5] + '</p>'
+                + '<p><b>Localização:</b> ' + row[6] + ' - ' + row[7] + '</p>'
+                + '</div>';
+        }, {maxWidth: 300});
+        return marker;
+    }
+"""
+
+
+def unit_cluster(df: pd.DataFrame, tipo: str, c_nome=None, c_abastec=None, c_cidade=None, c_uf=None):
+    """Marcadores de um tipo de unidade como um único array JS agrupado (FastMarkerCluster)."""
+    def _texto(c, default):
+        if not c:
+            return pd.Series(default, index=df.index)
+        return df[c].astype(object).fillna(default).astype(str)
+
+    rows = pd.DataFrame({
+        "lat": df["__LAT__"].astype("float64").round(6),
+        "lon": df["__LON__"].astype("float64").round(6),
+        "cor": get_icon_color(tipo),
+        "tipo": tipo,
+        "nome": _texto(c_nome, "Unidade"),
+        "abastec": _texto(c_abastec, "-"),
+        "cidade": _texto(c_cidade, "-"),
+        "uf": _texto(c_uf, "-"),
+    })
+    return FastMarkerCluster(
+        rows.to_numpy(dtype=object).tolist(),
+        callback=UNIT_MARKER_CALLBACK,
+        # Em zoom de cidade cada unidade aparece individualmente
+        disableClusteringAtZoom=10,
+    )
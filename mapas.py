@@ -0,0 +1,343 @@
+import folium
+import numpy as np
+import pandas as pd
+from branca.element import MacroElement
+from folium.elements import JSCSSMixin
+from folium.plugins import Draw, FastMarkerCluster, Fullscreen, HeatMapWithTime, MeasureControl, MousePosition
+
+from aggcache import derived
+from choropleth import LEVELS, ChoroplethLayer, load_boundaries, region_totals
+from colstore import mapped_columns
+from data_loader import dataset_version, load_workbook
+from heatgrid import BinnedHeatMap, HeatGrid
+from helpers import norm_col
+from layers import BubbleLayer, bubble_data, unit_cluster
+from profiling import stage
+from scaling import DEFAULT_SCALE, scale_top, scale_values
+
+# =====================================================
+# Preparação de dados e montagem dos mapas (sem Streamlit)
+# =====================================================
+UNIT_FILE_CANDIDATES = ["Unidades de Atendimento.xlsx", "dados/Unidades de Atendimento.xlsx", "/mnt/data/Unidades de Atendimento.xlsx"]
+HIST_FILE_CANDIDATES = ["Histórico F25.xlsx", "dados/Histórico F25.xlsx", "/mnt/data/Histórico F25.xlsx"]
+
+UNIT_TYPES = ("CD", "Fábrica", "TP", "OPL")
+
+# Métricas do histórico: chave = nome normalizado da coluna
+METRICS = {
+    "entregas": {
+        "label": "Entregas", "color": "#1E3A8A", "decimals": 0, "prefix": "", "suffix": "",
+        "gradient": {0.4: 'blue', 0.6: 'lime', 0.8: 'orange', 1.0: 'red'},
+    },
+    "peso": {
+        "label": "Peso", "color": "#059669", "decimals": 2, "prefix": "", "suffix": " ton",
+        "gradient": {0.4: 'green', 0.6: 'yellow', 0.8: 'orange', 1.0: 'red'},
+    },
+    "faturamento": {
+        "label": "Faturamento", "color": "#EA580C", "decimals": 2, "prefix": "R$ ", "suffix": "",
+        "gradient": {0.4: 'purple', 0.6: 'violet', 0.8: 'orange', 1.0: 'red'},
+    },
+}
+
+
+def add_base_tiles(m: folium.Map):
+    tiles = [
+        ("CartoDB Positron", "https://{s}.basemaps.cartocdn.com/light_all/{z}/{x}/{y}{r}.png", "© OpenStreetMap, © CARTO"),
+        ("CartoDB Dark", "https://{s}.basemaps.cartocdn.com/dark_all/{z}/{x}/{y}{r}.png", "© OpenStreetMap, © CARTO"),
+        ("Esri Satellite", "https://server.arcgisonline.com/ArcGIS/rest/services/World_Imagery/MapServer/tile/{z}/{y}/{x}", "Tiles © Esri"),
+        ("Open Street Map", "https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png", "© OpenStreetMap contributors"),
+    ]
+    for name, url, attr in tiles:
+        folium.TileLayer(tiles=url, name=name, attr=attr).add_to(m)
+
+
+class LayerAssets(JSCSSMixin, MacroElement):
+    """Scripts/CSS dos plugins usados pelas camadas (agrupamento de unidades e calor), no mapa base.
+
+    No modo incremental as camadas vão pelo feature_group_to_add e o st_folium só coleta os links do mapa base.
+    """
+    default_js = [*FastMarkerCluster.default_js, *BinnedHeatMap.default_js]
+    default_css = [*FastMarkerCluster.default_css, *BinnedHeatMap.default_css]
+
+
+def asset_links(element) -> set:
+    # URLs de default_js/default_css do elemento e de todos os filhos
+    links = {url for _, url in [*getattr(element, "default_js", []), *getattr(element, "default_css", [])]}
+    for child in getattr(element, "_children", {}).values():
+        links |= asset_links(child)
+    return links
+
+
+def missing_assets(m: folium.Map, camadas) -> set:
+    """Links que as camadas usam e o mapa base não carrega (vazio = o modo incremental funciona)."""
+    usados = set().union(*(asset_links(c) for c in camadas))
+    return usados - asset_links(m)
+
+
+def new_map(location, zoom_start, **kwargs) -> folium.Map:
+    # Mapa base: tiles + plugins, sem nenhuma camada de dados
+    m = folium.Map(location=location, zoom_start=zoom_start, tiles=None, **kwargs)
+    add_base_tiles(m)
+    Fullscreen(position='topright').add_to(m)
+    MeasureControl().add_to(m)
+    MousePosition().add_to(m)
+    Draw(export=True).add_to(m)
+    LayerAssets().add_to(m)
+    return m
+
+
+def fit_to(m: folium.Map, df: pd.DataFrame, padding=(50, 50)):
+    if df.empty:
+        return
+    sw = [float(df["__LAT__"].min()), float(df["__LON__"].min())]
+    ne = [float(df["__LAT__"].max()), float(df["__LON__"].max())]
+    m.fit_bounds([sw, ne], padding=padding)
+
+
+def finalize_map(m: folium.Map, camadas, collapsed=True) -> folium.Map:
+    # Para saída estática: anexa as camadas e o controle de camadas ao mapa base
+    for camada in camadas:
+        camada.add_to(m)
+    folium.LayerControl(collapsed=collapsed).add_to(m)
+    return m
+
+
+# ---------- Unidades de Atendimento ----------
+def prepare_units(df: pd.DataFrame):
+    """Identifica as colunas de popup/tabela; devolve (df_map, cols). As coordenadas já vêm corrigidas (coord_repair)."""
+    df_map = df.dropna(subset=["__LAT__", "__LON__"]).copy()
+
+    # Campos para popup/tabela — adaptados ao Excel
+    names = list(df_map.columns)
+
+    def pick_norm(*options):
+        return next((c for c in names if c in [norm_col(o) for o in options]), None)
+
+    cols = {
+        "nome": pick_norm("Nome da Unidade", "Unidade"),   # Nome da unidade (ex: General Mills)
+        "tipo": pick_norm("Tipo"),                         # Tipo: CD, Fábrica, TP, OPL
+        "abastec": pick_norm("Abastecedor"),
+        "cidade": pick_norm("Cidade"),
+        "uf": pick_norm("UF"),
+    }
+    return df_map, cols
+
+
+def load_units(path: str):
+    """(df_map, cols) das unidades, preparados uma vez por versão do arquivo e compartilhados entre sessões."""
+    return derived(dataset_version(path), "unidades", None,
+                   lambda: prepare_units(load_workbook(path, autodetect=True, schema="unidades", repair=True)))
+
+
+def build_units_map(df_map: pd.DataFrame, cols: dict, tipos_visiveis: dict, fit_visible: bool = True):
+    """Monta o mapa de unidades; devolve (mapa base, FeatureGroups por tipo, unidades visíveis)."""
+    # Centraliza no Brasil
+    m = new_map([-15.0, -55.0], 4)
+    fit_to(m, df_map, padding=(50, 50))
+
+    # Filtros de tipo aplicados como uma única máscara, calculada uma vez
+    c_tipo = cols.get("tipo")
+    tipo_s = df_map[c_tipo].astype(str).str.strip() if c_tipo else pd.Series("", index=df_map.index)
+    visible_df = df_map[tipo_s.map(tipos_visiveis).fillna(False).astype(bool)]
+
+    # Um FeatureGroup por tipo, com os marcadores agrupados (cluster) em um único array JS
+    grupos = []
+    with stage("camadas", mapa="unidades", linhas=len(visible_df)):
+        for tipo_val, df_tipo in visible_df.groupby(tipo_s[visible_df.index], sort=False):
+            grupo = folium.FeatureGroup(name=tipo_val)
+            unit_cluster(df_tipo, tipo_val, cols.get("nome"), cols.get("abastec"), cols.get("cidade"),
+                         cols.get("uf")).add_to(grupo)
+            grupos.append(grupo)
+
+    # Ajusta zoom para abranger todas as unidades visíveis
+    if fit_visible:
+        fit_to(m, visible_df, padding=(30, 30))
+    return m, grupos, visible_df
+
+
+# ---------- Histórico (mapa de calor) ----------
+# Casas decimais ao somar pontos no mesmo lugar (4 casas ≈ 11 m)
+COLOCATED_DECIMALS = 4
+
+
+def colocated(cols: dict, metrics, decimals: int = COLOCATED_DECIMALS) -> dict:
+    """Soma as métricas dos pontos na mesma coordenada arredondada a `decimals` casas.
+
+    Devolve colunas no mesmo formato de `cols` (um ponto por local, na média das coordenadas)
+    e "__N__" com quantas linhas cada ponto soma.
+    """
+    lat = np.asarray(cols["__LAT__"], dtype="float64")
+    lon = np.asarray(cols["__LON__"], dtype="float64")
+    ok = np.isfinite(lat) & np.isfinite(lon)
+    if not ok.all():
+        lat, lon = lat[ok], lon[ok]
+    if not len(lat):
+        return {"__LAT__": lat, "__LON__": lon, "__N__": np.zeros(0, dtype=np.int64),
+                **{c: np.zeros(0) for c in metrics if c in cols}}
+    fator = 10.0 ** decimals
+    la = np.round(lat * fator).astype(np.int64)
+    lo = np.round(lon * fator).astype(np.int64)
+    lo -= lo.min()
+    _, inv = np.unique((la - la.min()) * (int(lo.max()) + 1) + lo, return_inverse=True)
+    n = np.bincount(inv)
+    out = {"__LAT__": np.bincount(inv, weights=lat) / n, "__LON__": np.bincount(inv, weights=lon) / n, "__N__": n}
+    for c in metrics:
+        if c in cols:
+            orig = np.asarray(cols[c])
+            v = orig[ok].astype("float64")
+            finito = np.isfinite(v)
+            soma = np.bincount(inv, weights=np.where(finito, v, 0.0))
+            # Local só com vazios continua vazio (não vira 0); mantém o tipo do esquema (float32/int)
+            soma = np.where(np.bincount(inv, weights=finito) > 0, soma, np.nan)
+            if orig.dtype.kind == "f":
+                soma = soma.astype(orig.dtype)
+            elif orig.dtype.kind in "iu":
+                soma = soma.astype(np.int64)
+            out[c] = soma
+    return out
+
+
+# Dados de calor como arrays (lat, lon, peso 0–1 na escala escolhida); None se não houver valores positivos
+def heat_arrays(lat, lon, values, method=DEFAULT_SCALE, top=None):
+    lat = np.asarray(lat)
+    lon = np.asarray(lon)
+    peso = scale_values(values, method, top=top)
+    # Só valores positivos com coordenadas válidas
+    ok = (peso > 0) & ~np.isnan(lat) & ~np.isnan(lon)
+    if not ok.any():
+        return None
+    return lat[ok], lon[ok], peso[ok]
+
+
+def build_heat_map(df: pd.DataFrame, bolhas=(), calor=(), radius=25, blur=15, agrupar=True,
+                   version=None, fit_always=False, max_values=None, cache_dir=None, escala=DEFAULT_SCALE,
+                   agregar_pontos=None):
+    """Monta o mapa de bolhas/calor; devolve (mapa base, FeatureGroups das camadas).
+
+    Com `version`, os dados derivados por métrica ficam no cache LRU de aggcache.
+    Com `cache_dir` também, coordenadas e métricas ficam em .npy mapeados em memória (colstore).
+    `escala` (scaling.SCALES) vale para bolhas e calor; `max_values` fixa o teto da escala
+    (ex.: o máximo de todos os períodos do cubo).
+    `agregar_pontos` (casas decimais) soma as linhas no mesmo local antes de montar as camadas (ver colocated).
+    """
+    def cached(kind, metric, compute, **filters):
+        return compute() if version is None else derived(version, kind, metric, compute, **filters)
+
+    # Colunas como arrays somente leitura; as camadas trabalham com visões e máscaras sobre eles
+    with stage("agregacao", mapa="calor", dado="colunas") as rec:
+        cols = cached("colunas", None, lambda: mapped_columns(df, ["__LAT__", "__LON__", *METRICS], version, cache_dir))
+        if agregar_pontos is not None:
+            cols = cached("pontos_agregados", None, lambda: colocated(cols, METRICS, agregar_pontos),
+                          casas=agregar_pontos)
+        rec["linhas"] = len(cols["__LAT__"])
+    lat, lon, linhas = cols["__LAT__"], cols["__LON__"], cols.get("__N__")
+    # Filtros que mudam os dados de cada camada (parte da chave do cache)
+    opcoes = {"escala": escala, "casas": agregar_pontos}
+
+    m = new_map([-23.5, -46.6], 6, prefer_canvas=True)
+
+    # Cada camada do mapa vai num FeatureGroup próprio (atualizado isoladamente no modo incremental)
+    camadas = []
+
+    def camada(nome):
+        grupo = folium.FeatureGroup(name=nome)
+        camadas.append(grupo)
+        return grupo
+
+    def teto(col):
+        # Valor que vira 1 na escala, comum a bolhas e calor (o quantil não usa teto)
+        if escala == "quantile":
+            return None
+        return (max_values or {}).get(col) or cached("teto", col, lambda: scale_top(cols[col], escala), **opcoes)
+
+    # Cada métrica vira uma única camada GeoJSON (raio calculado em NumPy, popup montado no clique)
+    added_any = False
+    for col in bolhas:
+        if col not in cols:
+            continue
+        cfg = METRICS[col]
+        with stage("camadas", mapa="calor", camada=f"bolhas:{col}", linhas=len(lat)) as rec:
+            data = cached("bolhas", col, lambda: bubble_data(lat, lon, cols[col], teto(col), escala, linhas), **opcoes)
+            BubbleLayer(data, label=cfg["label"], color=cfg["color"], decimals=cfg["decimals"],
+                        prefix=cfg["prefix"], suffix=cfg["suffix"]).add_to(camada(f"Bolhas: {cfg['label']}"))
+            rec["bytes"] = len(data)
+        added_any = True
+
+    # Camada de calor: agregada no servidor por faixa de zoom, ou pontos brutos
+    for col in calor:
+        if col not in cols:
+            continue
+        cfg = METRICS[col]
+        with stage("agregacao", mapa="calor", camada=f"calor:{col}") as rec:
+            pontos = cached("calor", col, lambda: heat_arrays(lat, lon, cols[col], escala, teto(col)), **opcoes)
+            if pontos is not None:
+                # Sem agrupar, os pontos brutos vão numa única faixa do mesmo BinnedHeatMap
+                grid = cached("grade_calor" if agrupar else "calor_bruto", col,
+                              lambda: HeatGrid(*pontos, binned=agrupar), **opcoes)
+            rec["linhas"] = 0 if pontos is None else len(pontos[0])
+        if pontos is None:
+            continue
+        with stage("camadas", mapa="calor", camada=f"calor:{col}", linhas=len(pontos[0])) as rec:
+            heat = BinnedHeatMap(grid, name=f"Calor: {cfg['label']}", radius=radius, blur=blur, min_opacity=0.4,
+                                 gradient=cfg["gradient"])
+            heat.add_to(camada(f"Calor: {cfg['label']}"))
+            rec["bytes"] = len(heat.bands_json)
+
+    # Ajusta o zoom para cobrir todos os pontos, se houver
+    if added_any or fit_always:
+        fit_to(m, df, padding=(50, 50))
+    return m, camadas
+
+
+def build_animated_heat_map(cube, metric: str, radius=25, version=None, escala=DEFAULT_SCALE):
+    """Mapa de calor animado por período, com os quadros tirados do cubo (timecube.PeriodCube).
+
+    O HeatMapWithTime controla o mapa (barra de tempo), então vai direto no mapa base e não em camadas.
+    """
+    cfg = METRICS[metric]
+    with stage("agregacao", mapa="animacao", camada=metric) as rec:
+        frames = (cube.frames(metric, method=escala) if version is None
+                  else derived(version, "quadros", metric, lambda: cube.frames(metric, method=escala), escala=escala))
+        rec["linhas"] = sum(len(f) for f in frames)
+    m = new_map([-23.5, -46.6], 6)
+    with stage("camadas", mapa="animacao", camada=metric, linhas=rec["linhas"]):
+        HeatMapWithTime(
+            frames, index=cube.labels, name=f"Calor no tempo: {cfg['label']}", radius=radius,
+            gradient=cfg["gradient"], min_opacity=0.3, max_opacity=0.8, auto_play=False,
+        ).add_to(m)
+    if len(cube.cell_lat):
+        m.fit_bounds([[float(cube.cell_lat.min()), float(cube.cell_lon.min())],
+                      [float(cube.cell_lat.max()), float(cube.cell_lon.max())]], padding=(50, 50))
+    return m, []
+
+
+def build_choropleth_map(df: pd.DataFrame, path: str, level: str, metric: str, version=None, cache_dir=None,
+                         escala=DEFAULT_SCALE):
+    """Mapa coroplético por UF/município (choropleth.py); devolve (mapa base, camadas, totais por região).
+
+    Os pontos são somados por local (colocated) antes da atribuição às regiões; a malha do arquivo `path`
+    é lida e simplificada uma vez (cache de choropleth) e os totais ficam no cache LRU por versão do dataset + malha.
+    """
+    def cached(kind, metric, compute, **filters):
+        return compute() if version is None else derived(version, kind, metric, compute, **filters)
+
+    with stage("agregacao", mapa=level) as rec:
+        cols = cached("colunas", None, lambda: mapped_columns(df, ["__LAT__", "__LON__", *METRICS], version, cache_dir))
+        locais = cached("pontos_agregados", None, lambda: colocated(cols, METRICS, COLOCATED_DECIMALS),
+                        casas=COLOCATED_DECIMALS)
+        limites = load_boundaries(path, level)
+        totais = cached("regioes", level, lambda: region_totals(limites, locais, METRICS), malha=dataset_version(path))
+        rec["linhas"] = len(cols["__LAT__"])
+
+    m = new_map([-15.8, -47.9], 4, prefer_canvas=True)
+    camadas = []
+    if len(totais) and metric in totais.columns:
+        cfg = METRICS[metric]
+        with stage("camadas", mapa=level, camada=metric, linhas=len(totais)) as rec:
+            camada = ChoroplethLayer(limites, totais, metric, METRICS, method=escala)
+            grupo = folium.FeatureGroup(name=f"{LEVELS[level]}: {cfg['label']}")
+            camada.add_to(grupo)
+            camadas.append(grupo)
+            rec["bytes"] = len(camada.props_json) + len(camada.bands_json)
+        m.fit_bounds(camada._get_self_bounds(), padding=(30, 30))
+    return m, camadas, totais
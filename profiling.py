@@ -0,0 +1,154 @@
+import contextvars
+import json
+import logging
+import os
+import resource
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+
+import pandas as pd
+
+# =====================================================
+# Tempo, linhas, bytes e memória por etapa (painel de depuração + log JSON)
+# =====================================================
+STAGES = {
+    "ingestao": "Leitura",
+    "normalizacao": "Normalização",
+    "coordenadas": "Correção de coordenadas",
+    "agregacao": "Agregação",
+    "camadas": "Montagem das camadas",
+    "serializacao": "Serialização (HTML)",
+}
+# Uma linha JSON por etapa neste logger; MAPA_LOG_ETAPAS=0 desliga
+LOGGER_NAME = "mapa_calor.etapas"
+logger = logging.getLogger(LOGGER_NAME)
+
+# Registro da execução atual (um rerun do app, um mapa do render_maps) e etapas abertas, por thread/contexto
+_ATUAL = contextvars.ContextVar("etapas_atual", default=None)
+_ABERTAS = contextvars.ContextVar("etapas_abertas", default=())
+
+
+def rss_bytes(field: str = "VmRSS"):
+    # Memória residente atual (VmRSS) ou o pico desde o último reset (VmHWM), em bytes; None fora do Linux
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    if field == "VmHWM":
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    return None
+
+
+def reset_peak_rss():
+    # Zera o VmHWM do processo inteiro (Linux; sem permissão, mede o pico do processo); ver peak_enabled
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def configure_logging(stream=None):
+    """Envia as linhas JSON das etapas para `stream` (stderr); chamar mais de uma vez não duplica."""
+    if logger.handlers:
+        return
+    handler = logging.StreamHandler(stream or sys.stderr)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.WARNING if os.environ.get("MAPA_LOG_ETAPAS") == "0" else logging.INFO)
+    logger.propagate = False
+
+
+class StageLog:
+    """Etapas medidas numa execução; `start()` o torna o destino de stage()/record() no contexto atual.
+
+    Com `peak`, cada etapa zera e lê o pico de memória do processo (VmHWM). Zerar vale para o processo todo:
+    no app, com várias sessões, só quando o painel de depuração está ligado. Sem ele, fica só a variação de RSS.
+    """
+
+    def __init__(self, run=None, peak: bool = False):
+        self.run = run or uuid.uuid4().hex[:8]
+        self.peak = peak
+        self.records = []
+
+    def start(self) -> "StageLog":
+        _ATUAL.set(self)
+        return self
+
+    @contextmanager
+    def active(self):
+        token = _ATUAL.set(self)
+        try:
+            yield self
+        finally:
+            _ATUAL.reset(token)
+
+    def frame(self) -> pd.DataFrame:
+        # Uma linha por medição, na ordem em que aconteceram
+        return pd.DataFrame(self.records)
+
+    def summary(self) -> pd.DataFrame:
+        """Totais por etapa (na ordem de STAGES): tempo, bytes e variação de RSS somados; linhas e pico máximos."""
+        df = self.frame()
+        if df.empty:
+            return pd.DataFrame(columns=["etapa", "medicoes", "segundos", "linhas", "bytes", "rss_delta", "pico_rss"])
+        for col in ("linhas", "bytes", "rss_delta", "pico_rss"):
+            if col not in df:
+                df[col] = pd.NA
+        out = df.groupby("etapa", sort=False).agg(
+            medicoes=("segundos", "size"), segundos=("segundos", "sum"), linhas=("linhas", "max"),
+            bytes=("bytes", lambda s: s.sum(min_count=1)), rss_delta=("rss_delta", lambda s: s.sum(min_count=1)),
+            pico_rss=("pico_rss", "max"),
+        ).reset_index()
+        ordem = {k: i for i, k in enumerate(STAGES)}
+        return out.sort_values("etapa", key=lambda s: s.map(ordem).fillna(len(ordem))).reset_index(drop=True)
+
+
+def peak_enabled() -> bool:
+    # Fora de um StageLog (CLI, benchmark: um processo por execução) o pico pode ser zerado à vontade
+    log = _ATUAL.get()
+    return log is None or log.peak
+
+
+def record(rec: dict):
+    """Registra uma etapa já medida (precisa de "etapa" e "segundos") e escreve a linha JSON."""
+    log = _ATUAL.get()
+    rec = {"run": log.run if log is not None else None, **rec}
+    if log is not None:
+        log.records.append(rec)
+    logger.info(json.dumps({"ts": round(time.time(), 3), **rec}, ensure_ascii=False, default=str))
+
+
+@contextmanager
+def stage(name: str, **info):
+    """Mede o bloco como a etapa `name`; o dicionário devolvido aceita "linhas", "bytes" e outros campos.
+
+    "rss_delta" é a variação do RSS do processo durante a etapa (inclui o que outras sessões alocaram no meio).
+    Com peak_enabled(), "pico_rss" é o VmHWM desde o início da etapa; etapas aninhadas repassam o pico para a de fora.
+    """
+    rec = {"etapa": name, **info}
+    abertas = _ABERTAS.get()
+    token = _ABERTAS.set(abertas + (rec,))
+    pico = peak_enabled()
+    if pico:
+        reset_peak_rss()
+    rss0 = rss_bytes()
+    t0 = time.perf_counter()
+    try:
+        yield rec
+    finally:
+        rec["segundos"] = round(time.perf_counter() - t0, 4)
+        rss1 = rss_bytes()
+        if rss0 is not None and rss1 is not None:
+            rec["rss_delta"] = rss1 - rss0
+        _ABERTAS.reset(token)
+        if pico:
+            rec["pico_rss"] = max(rss_bytes("VmHWM") or 0, rec.pop("_pico", 0)) or None
+            if abertas:
+                abertas[-1]["_pico"] = max(abertas[-1].get("_pico", 0), rec["pico_rss"] or 0)
+        record(rec)
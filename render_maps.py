@@ -0,0 +1,125 @@
+"""Gera os mapas em HTML sem o Streamlit, em paralelo, para servir estaticamente.
+
+Cada combinação é uma lista de camadas separadas por vírgula:
+    unidades                       -> mapa da Malha de Transportes (todos os tipos)
+    bolhas:entregas,calor:peso     -> mapa de calor com as camadas indicadas
+
+Exemplos:
+    python render_maps.py --saida mapas_html
+    python render_maps.py --combo unidades --combo bolhas:entregas,calor:faturamento --jobs 4
+"""
+import argparse
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from data_loader import cache_dir_for, find_file, frame_version, load_workbook
+from mapas import (
+    COLOCATED_DECIMALS, HIST_FILE_CANDIDATES, METRICS, UNIT_FILE_CANDIDATES, UNIT_TYPES,
+    build_heat_map, build_units_map, finalize_map, load_units,
+)
+from profiling import StageLog, configure_logging, stage
+from scaling import DEFAULT_SCALE, SCALES
+
+
+def default_combos():
+    combos = ["unidades"]
+    combos += [f"bolhas:{m}" for m in METRICS]
+    combos += [f"calor:{m}" for m in METRICS]
+    return combos
+
+
+def parse_combo(spec: str):
+    """'bolhas:entregas,calor:peso' -> ('calor', {'bolhas': [...], 'calor': [...]}); 'unidades' -> ('unidades', {})."""
+    spec = spec.strip()
+    if spec == "unidades":
+        return "unidades", {}
+    camadas = {"bolhas": [], "calor": []}
+    for item in spec.split(","):
+        tipo, _, metrica = item.strip().partition(":")
+        if tipo not in camadas or metrica not in METRICS:
+            raise ValueError(f"Combinação inválida: '{item}' (use bolhas:<métrica> ou calor:<métrica>, métricas: {', '.join(METRICS)})")
+        camadas[tipo].append(metrica)
+    return "calor", camadas
+
+
+def combo_filename(spec: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", spec.lower()).strip("-") + ".html"
+
+
+def render_combo(job):
+    spec, unit_file, hist_file, out_dir, radius, blur, agrupar, escala, casas = job
+    configure_logging()
+    with StageLog(run=combo_filename(spec)[:-5], peak=True).active():
+        return _render_combo(spec, unit_file, hist_file, out_dir, radius, blur, agrupar, escala, casas)
+
+
+def _render_combo(spec, unit_file, hist_file, out_dir, radius, blur, agrupar, escala, casas):
+    t0 = time.perf_counter()
+    kind, camadas = parse_combo(spec)
+    if kind == "unidades":
+        df_map, cols = load_units(unit_file)
+        m, grupos, _ = build_units_map(df_map, cols, {t: True for t in UNIT_TYPES})
+        finalize_map(m, grupos, collapsed=False)
+    else:
+        df = load_workbook(hist_file, schema="historico", repair=True)
+        # Colunas em .npy mapeados: os processos filhos compartilham as mesmas páginas
+        m, grupos = build_heat_map(df, camadas["bolhas"], camadas["calor"], radius=radius, blur=blur, agrupar=agrupar,
+                                   version=frame_version(hist_file, schema="historico", repair=True),
+                                   cache_dir=cache_dir_for(hist_file), escala=escala, agregar_pontos=casas)
+        finalize_map(m, grupos)
+    path = os.path.join(out_dir, combo_filename(spec))
+    with stage("serializacao", mapa=spec) as rec:
+        m.save(path)
+        rec["bytes"] = os.path.getsize(path)
+    return spec, path, os.path.getsize(path), time.perf_counter() - t0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--unidades", default=find_file(UNIT_FILE_CANDIDATES), help="planilha de Unidades de Atendimento")
+    parser.add_argument("--historico", default=find_file(HIST_FILE_CANDIDATES), help="planilha de histórico")
+    parser.add_argument("--saida", default="mapas_html", help="pasta de saída dos HTML")
+    parser.add_argument("--combo", action="append", help="combinação de camadas (pode repetir); padrão: uma por camada")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="processos em paralelo")
+    parser.add_argument("--raio", type=int, default=25, help="raio do calor")
+    parser.add_argument("--desfoque", type=int, default=15, help="desfoque do calor")
+    parser.add_argument("--sem-grade", action="store_true", help="envia os pontos brutos ao HeatMap, sem agregar em grade")
+    parser.add_argument("--escala", default=DEFAULT_SCALE, choices=list(SCALES), help="escala das bolhas e do calor")
+    parser.add_argument("--somar-locais", type=int, metavar="CASAS", nargs="?", const=COLOCATED_DECIMALS,
+                        help=f"soma as linhas no mesmo local (coordenadas com CASAS decimais, padrão {COLOCATED_DECIMALS})")
+    args = parser.parse_args(argv)
+
+    combos = args.combo or default_combos()
+    try:
+        kinds = [parse_combo(c)[0] for c in combos]
+    except ValueError as e:
+        parser.error(str(e))
+    if "unidades" in kinds and not args.unidades:
+        parser.error("Arquivo 'Unidades de Atendimento.xlsx' não encontrado (use --unidades).")
+    if "calor" in kinds and not args.historico:
+        parser.error("Arquivo 'Histórico F25.xlsx' não encontrado (use --historico).")
+
+    os.makedirs(args.saida, exist_ok=True)
+    # Uma linha JSON por etapa no stderr (MAPA_LOG_ETAPAS=0 desliga); o "run" de cada linha é o nome do HTML
+    configure_logging()
+    # Lê as planilhas uma vez aqui: grava o sidecar Parquet que os processos filhos reaproveitam
+    if "unidades" in kinds:
+        load_workbook(args.unidades, autodetect=True, schema="unidades", repair=True)
+    if "calor" in kinds:
+        load_workbook(args.historico, schema="historico", repair=True)
+
+    jobs = [(c, args.unidades, args.historico, args.saida, args.raio, args.desfoque, not args.sem_grade, args.escala,
+             args.somar_locais) for c in combos]
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=max(1, min(args.jobs, len(jobs)))) as pool:
+        for spec, path, size, secs in pool.map(render_combo, jobs):
+            print(f"{spec:<40} {size / 1e6:8.2f} MB {secs:7.2f}s  {path}")
+    print(f"{len(jobs)} mapa(s) em {time.perf_counter() - t0:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
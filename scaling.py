@@ -0,0 +1,72 @@
+import numpy as np
+
+# =====================================================
+# Escala das métricas (0–1) para bolhas e calor, aplicada ao array inteiro
+# =====================================================
+# Percentil usado como teto no método "percentile" (acima dele, tudo vale 1)
+CLIP_PERCENTILE = 99.0
+# Método -> rótulo na interface
+SCALES = {
+    "log": "Logarítmica",
+    "linear": "Linear",
+    "sqrt": "Raiz quadrada",
+    "quantile": "Quantil (posição no ranking)",
+    "percentile": f"Linear até o percentil {CLIP_PERCENTILE:g}",
+}
+DEFAULT_SCALE = "log"
+
+
+def _positive(values):
+    # (array float64, máscara dos valores finitos e > 0) — só esses são desenhados
+    v = np.asarray(values, dtype="float64")
+    with np.errstate(invalid="ignore"):
+        return v, np.isfinite(v) & (v > 0)
+
+
+def robust_max(values, pct: float = CLIP_PERCENTILE) -> float:
+    """Percentil `pct` dos valores positivos (teto que ignora poucos pontos extremos); NaN se não houver."""
+    v, ok = _positive(values)
+    if not ok.any():
+        return np.nan
+    return float(np.percentile(v[ok], pct))
+
+
+def scale_top(values, method: str = DEFAULT_SCALE, pct: float = CLIP_PERCENTILE) -> float:
+    # Valor que vira 1 na escala: percentil no método "percentile", máximo nos demais
+    if method == "percentile":
+        return robust_max(values, pct)
+    v, ok = _positive(values)
+    return float(v[ok].max()) if ok.any() else np.nan
+
+
+def scale_values(values, method: str = DEFAULT_SCALE, top=None, pct: float = CLIP_PERCENTILE) -> np.ndarray:
+    """Valores -> 0–1 numa passada vetorizada; 0 onde o valor é vazio, não finito ou <= 0.
+
+    `top` é o valor que vira 1 (ex.: o máximo de todos os períodos); None = calculado dos próprios valores.
+    Valores acima de `top` ficam em 1. No método "quantile" o resultado é a posição no ranking e `top` é ignorado.
+    """
+    if method not in SCALES:
+        raise ValueError(f"Escala desconhecida: '{method}' (use {', '.join(SCALES)})")
+    v, ok = _positive(values)
+    out = np.zeros(len(v))
+    if not ok.any():
+        return out
+    pos = v[ok]
+
+    if method == "quantile":
+        ordenados = np.sort(pos)
+        out[ok] = np.searchsorted(ordenados, pos, side="right") / len(ordenados)
+        return out
+
+    if top is None:
+        top = scale_top(pos, method, pct)
+    if not top or not np.isfinite(top) or top <= 0:
+        return out
+    if method == "log":
+        s = np.log1p(pos) / np.log1p(top)
+    elif method == "sqrt":
+        s = np.sqrt(pos / top)
+    else:  # linear / percentile
+        s = pos / top
+    out[ok] = np.minimum(s, 1.0)
+    return out
@@ -0,0 +1,107 @@
+import numpy as np
+import pandas as pd
+
+# =====================================================
+# Esquema de tipos das planilhas normalizadas (nomes já passados por norm_col)
+# =====================================================
+# Colunas ausentes são ignoradas; só as obrigatórias geram erro.
+REQUIRED_COLUMNS = ("__LAT__", "__LON__")
+
+HISTORY_SCHEMA = {
+    # float32 guarda ~7 dígitos: < 1 m de erro em coordenadas do Brasil
+    "__LAT__": "float32",
+    "__LON__": "float32",
+    "entregas": "int32",
+    "peso": "float32",
+    # Em reais: float32 perde os centavos acima de ~R$ 130 mil, então fica em float64
+    "faturamento": "float64",
+    "uf": "category",
+    "cidade": "category",
+}
+
+UNITS_SCHEMA = {
+    "__LAT__": "float32",
+    "__LON__": "float32",
+    "tipo": "category",
+    "uf": "category",
+    "cidade": "category",
+    "abastecedor": "category",
+}
+
+SCHEMAS = {"historico": HISTORY_SCHEMA, "unidades": UNITS_SCHEMA}
+# Coordenadas como vieram da planilha: __LAT__/__LON__ já guardam os valores convertidos (e corrigidos)
+RAW_COORD_COLUMNS = ("latitude", "lat", "longitude", "long", "lon")
+
+
+class SchemaError(ValueError):
+    pass
+
+
+def _to_int(s: pd.Series, dtype: str):
+    # Inteiro só se não houver vazios, frações ou estouro; senão float32 (e o motivo volta como aviso)
+    v = pd.to_numeric(s, errors="coerce")
+    arr = v.to_numpy(dtype="float64", na_value=np.nan)
+    info = np.iinfo(dtype)
+    if np.isnan(arr).any():
+        return v.astype("float32"), "tem vazios; mantida como float32"
+    if (arr != np.round(arr)).any():
+        return v.astype("float32"), "tem frações; mantida como float32"
+    if len(arr) and (arr.min() < info.min or arr.max() > info.max):
+        return v.astype("float64"), f"fora do intervalo de {dtype}; mantida como float64"
+    return v.astype(dtype), None
+
+
+def apply_schema(df: pd.DataFrame, schema) -> pd.DataFrame:
+    """Converte as colunas para os tipos declarados e valida; o relatório fica em df.attrs["esquema"].
+
+    `schema` é um dict {coluna: dtype} ou o nome de um esquema em SCHEMAS.
+    """
+    nome = schema if isinstance(schema, str) else None
+    if nome is not None:
+        schema = SCHEMAS[nome]
+    faltando = [c for c in REQUIRED_COLUMNS if c not in df.columns]
+    if faltando:
+        raise SchemaError(f"Colunas obrigatórias ausentes: {', '.join(faltando)}.")
+
+    bytes_antes = int(df.memory_usage(deep=True).sum())
+    # Partições antigas do armazém ainda trazem as colunas originais de coordenadas
+    df = df.drop(columns=[c for c in RAW_COORD_COLUMNS if c in df.columns])
+    out = {}
+    invalidos, avisos = {}, {}
+    for c in df.columns:
+        s = df[c]
+        dtype = schema.get(c)
+        if dtype is None or s.dtype == dtype:
+            out[c] = s
+            continue
+        if dtype == "category":
+            out[c] = s.astype("category")
+            continue
+        nulos = s.isna()
+        if dtype.startswith("int"):
+            conv, aviso = _to_int(s, dtype)
+            if aviso:
+                avisos[c] = aviso
+        else:
+            conv = pd.to_numeric(s, errors="coerce").astype(dtype)
+        # Textos que não viraram número
+        n_inv = int((conv.isna() & ~nulos).sum())
+        if n_inv:
+            invalidos[c] = n_inv
+        out[c] = conv
+    df = pd.DataFrame(out, index=df.index).__finalize__(df)  # preserva df.attrs (ex.: relatório da leitura)
+
+    lat = df["__LAT__"].to_numpy(dtype="float64")
+    lon = df["__LON__"].to_numpy(dtype="float64")
+    fora = int(((np.abs(lat) > 90) | (np.abs(lon) > 180)).sum())
+
+    df.attrs["esquema"] = {
+        "nome": nome,
+        "ausentes": [c for c in schema if c not in df.columns],
+        "invalidos": invalidos,
+        "avisos": avisos,
+        "coords_fora_do_intervalo": fora,
+        "bytes_antes": bytes_antes,
+        "bytes_depois": int(df.memory_usage(deep=True).sum()),
+    }
+    return df
@@ -0,0 +1,21 @@
+import numpy as np
+import pytest
+
+from helpers import br_money, br_number
+
+
+@pytest.mark.parametrize("valor,casas,esperado", [
+    (43398882.95, 0, "43.398.883"),
+    (43398882.95, 2, "43.398.882,95"),
+    (12, 0, "12"),
+    (-1234.5, 1, "-1.234,5"),
+    (np.float32(1604.0), 0, "1.604"),
+    (np.nan, 2, "-"),
+    ("sem valor", 0, "sem valor"),
+])
+def test_br_number(valor, casas, esperado):
+    assert br_number(valor, casas) == esperado
+
+
+def test_br_number_matches_br_money():
+    assert "R$ " + br_number(940096828.29, 2) == br_money(940096828.29)
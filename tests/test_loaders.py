@@ -0,0 +1,36 @@
+import json
+
+import pytest
+
+from data_loader import sniff_read_csv
+from geometry import load_geojson_any
+
+GJ = {"type": "FeatureCollection", "features": [
+    {"type": "Feature", "properties": {"nome": "A"}, "geometry": {"type": "Point", "coordinates": [-46.6, -23.5]}},
+]}
+
+
+def test_load_geojson_any_first_readable(tmp_path):
+    ruim = tmp_path / "ruim.geojson"
+    ruim.write_text("{não é json", encoding="utf-8")
+    bom = tmp_path / "bom.geojson"
+    bom.write_text(json.dumps(GJ), encoding="utf-8")
+    # Candidatos ausentes ou vazios são ignorados; o que não abre é pulado
+    assert load_geojson_any([None, str(tmp_path / "falta.geojson"), str(ruim), str(bom)]) == GJ
+
+
+def test_load_geojson_any_missing_and_unreadable(tmp_path):
+    assert load_geojson_any([str(tmp_path / "falta.geojson")]) is None
+    ruim = tmp_path / "ruim.geojson"
+    ruim.write_text("{não é json", encoding="utf-8")
+    with pytest.raises(ValueError):
+        load_geojson_any([str(ruim)])
+
+
+@pytest.mark.parametrize("sep", [";", ","])
+def test_sniff_read_csv(tmp_path, sep):
+    p = tmp_path / "extrato.csv"
+    p.write_text("\ufeff" + f"Latitude{sep}Longitude{sep}Cidade\n-23.5{sep}-46.6{sep}São Paulo\n", encoding="utf-8")
+    df = sniff_read_csv(str(p))
+    assert list(df.columns) == ["Latitude", "Longitude", "Cidade"]
+    assert df.iloc[0].tolist() == [-23.5, -46.6, "São Paulo"]
@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from mapas import METRICS, UNIT_TYPES, asset_links, build_heat_map, build_units_map, missing_assets, prepare_units
+
+
+def _historico(n=400, seed=5):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "__LAT__": rng.uniform(-25.0, -20.0, n).astype("float32"),
+        "__LON__": rng.uniform(-50.0, -43.0, n).astype("float32"),
+        "entregas": rng.integers(1, 40, n).astype("int32"),
+        "peso": rng.gamma(2.0, 200.0, n).astype("float32"),
+        "faturamento": rng.lognormal(8.0, 1.0, n),
+    })
+
+
+def _unidades():
+    return pd.DataFrame({
+        "tipo": list(UNIT_TYPES) * 2,
+        "nome_da_unidade": [f"Unidade {i}" for i in range(2 * len(UNIT_TYPES))],
+        "cidade": "Cidade",
+        "uf": "SP",
+        "__LAT__": np.linspace(-24.0, -20.0, 2 * len(UNIT_TYPES)),
+        "__LON__": np.linspace(-48.0, -44.0, 2 * len(UNIT_TYPES)),
+    })
+
+
+# No modo incremental (st_folium + feature_group_to_add) só os links do mapa base chegam à página
+@pytest.mark.parametrize("bolhas,calor", [(("entregas",), ()), ((), ("peso",)), (tuple(METRICS), tuple(METRICS))])
+def test_heat_map_base_loads_layer_scripts(bolhas, calor):
+    m, camadas = build_heat_map(_historico(), bolhas, calor)
+    assert camadas
+    assert missing_assets(m, camadas) == set()
+
+
+@pytest.mark.parametrize("agrupar", [True, False])
+def test_raw_heat_layer_scripts(agrupar):
+    m, camadas = build_heat_map(_historico(), calor=("faturamento",), agrupar=agrupar)
+    assert any("leaflet_heat" in url for url in asset_links(camadas[0]))
+    assert missing_assets(m, camadas) == set()
+
+
+def test_units_map_base_loads_cluster_scripts():
+    df_map, cols = prepare_units(_unidades())
+    m, grupos, _ = build_units_map(df_map, cols, {t: True for t in UNIT_TYPES})
+    assert len(grupos) == len(UNIT_TYPES)
+    assert any("markercluster" in url for url in set().union(*map(asset_links, grupos)))
+    assert missing_assets(m, grupos) == set()
@@ -0,0 +1,32 @@
+import profiling
+from profiling import StageLog, stage
+
+
+def _resets(monkeypatch):
+    calls = []
+    monkeypatch.setattr(profiling, "reset_peak_rss", lambda: calls.append(1))
+    return calls
+
+
+def test_stage_does_not_reset_process_peak_by_default(monkeypatch):
+    # No app várias sessões dividem o processo: zerar o VmHWM numa atrapalharia o pico das outras
+    calls = _resets(monkeypatch)
+    with StageLog().active() as log:
+        with stage("agregacao"):
+            with stage("camadas"):
+                pass
+    assert calls == []
+    assert all("pico_rss" not in r for r in log.records)
+    assert all(isinstance(r.get("rss_delta"), int) for r in log.records)
+    assert list(log.summary()["etapa"]) == ["agregacao", "camadas"]
+
+
+def test_stage_measures_peak_when_enabled(monkeypatch):
+    calls = _resets(monkeypatch)
+    with StageLog(peak=True).active() as log:
+        with stage("agregacao"):
+            with stage("camadas"):
+                pass
+    assert len(calls) == 2
+    interna, externa = log.records
+    assert externa["pico_rss"] >= interna["pico_rss"] > 0
@@ -0,0 +1,151 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from layers import scale_radius
+from scaling import SCALES, scale_values
+
+METHODS = list(SCALES)
+
+
+def _sample(n=500, seed=3):
+    # Cauda longa, como as métricas do histórico
+    return np.random.default_rng(seed).lognormal(6.0, 1.6, n)
+
+
+@pytest.mark.parametrize("method", METHODS)
+def test_range_and_monotone(method):
+    v = _sample()
+    s = scale_values(v, method)
+    assert s.shape == v.shape
+    assert ((s >= 0) & (s <= 1)).all()
+    assert (s > 0).all()
+    ordem = np.argsort(v, kind="stable")
+    assert (np.diff(s[ordem]) >= 0).all()
+
+
+@pytest.mark.parametrize("method", METHODS)
+def test_max_maps_to_one(method):
+    v = _sample()
+    assert scale_values(v, method)[v.argmax()] == pytest.approx(1.0)
+
+
+@pytest.mark.parametrize("method", METHODS)
+def test_all_zero(method):
+    assert (scale_values(np.zeros(10), method) == 0).all()
+
+
+@pytest.mark.parametrize("method", METHODS)
+def test_empty(method):
+    assert scale_values(np.array([]), method).shape == (0,)
+
+
+@pytest.mark.parametrize("method", METHODS)
+def test_nan_negative_and_inf_are_zero(method):
+    v = np.array([np.nan, -5.0, 0.0, np.inf, -np.inf, 10.0, 100.0])
+    s = scale_values(v, method)
+    assert (s[:5] == 0).all()
+    assert 0 < s[5] <= s[6] == pytest.approx(1.0)
+
+
+@pytest.mark.parametrize("method", METHODS)
+def test_single_value(method):
+    assert scale_values(np.array([42.0]), method) == pytest.approx([1.0])
+    assert scale_values(np.array([-42.0]), method) == pytest.approx([0.0])
+
+
+@pytest.mark.parametrize("method", [m for m in METHODS if m != "quantile"])
+def test_fixed_top_clips_at_one(method):
+    s = scale_values(np.array([1.0, 50.0, 100.0, 400.0]), method, top=100.0)
+    assert s[2] == pytest.approx(1.0)
+    assert s[3] == 1.0
+    assert ((s >= 0) & (s <= 1)).all()
+
+
+def test_known_values():
+    v = np.array([25.0, 100.0])
+    assert scale_values(v, "linear") == pytest.approx([0.25, 1.0])
+    assert scale_values(v, "sqrt") == pytest.approx([0.5, 1.0])
+    assert scale_values(v, "log") == pytest.approx([np.log1p(25) / np.log1p(100), 1.0])
+    assert scale_values(np.array([3.0, 1.0, 2.0, 2.0]), "quantile") == pytest.approx([1.0, 0.25, 0.75, 0.75])
+
+
+def test_percentile_ignores_outlier():
+    v = np.append(np.full(999, 10.0), 1e6)
+    s = scale_values(v, "percentile")
+    assert s[:999] == pytest.approx(1.0)
+    assert scale_values(v, "linear")[:999].max() < 1e-4
+
+
+def test_unknown_method():
+    with pytest.raises(ValueError):
+        scale_values(np.ones(3), "cubica")
+
+
+@pytest.mark.parametrize("method", METHODS)
+def test_scale_radius(method):
+    v = np.append(_sample(200), [np.nan, 0.0, -1.0])
+    r = scale_radius(v, method=method, max_radius_meters=15000)
+    assert (r[-3:] == 0).all()
+    ok = r[:-3]
+    assert ((ok >= 300) & (ok <= 15000)).all()
+    ordem = np.argsort(v[:-3], kind="stable")
+    assert (np.diff(ok[ordem]) >= 0).all()
+
+
+def test_scale_radius_all_zero_and_single():
+    assert (scale_radius(np.zeros(5)) == 0).all()
+    assert scale_radius(np.array([7.0]), max_radius_meters=1000) == pytest.approx([1000.0])
+
+
+# Versão original do app (uma chamada por linha, escala log), mantida aqui como referência da paridade
+def _scale_radius_rowwise(value, max_val, max_radius_meters=15000):
+    if pd.isna(value) or value <= 0 or max_val <= 0:
+        return 0
+    radius = 300 + (np.log1p(value) / np.log1p(max_val)) * max_radius_meters
+    return min(radius, max_radius_meters)
+
+
+def _dirty_sample(seed, n=2000):
+    # Cauda longa com zeros, NaN e negativos misturados, como as colunas do histórico
+    rng = np.random.default_rng(seed)
+    v = rng.lognormal(5.0, 2.0, n)
+    kind = rng.integers(0, 10, n)
+    v[kind == 0] = 0.0
+    v[kind == 1] = np.nan
+    v[kind == 2] = -v[kind == 2]
+    return v
+
+
+@pytest.mark.parametrize("seed", range(8))
+@pytest.mark.parametrize("max_radius", [15000, 4000])
+def test_scale_radius_matches_rowwise(seed, max_radius):
+    v = _dirty_sample(seed)
+    # O app original passava o máximo da coluna (pandas ignora NaN)
+    max_val = pd.Series(v).max()
+    esperado = np.array([_scale_radius_rowwise(x, max_val, max_radius) for x in v], dtype="float64")
+    assert scale_radius(v, max_val, max_radius) == pytest.approx(esperado, rel=1e-12, abs=1e-9)
+    # Sem teto explícito, o máximo dos positivos é o mesmo
+    assert scale_radius(v, None, max_radius) == pytest.approx(esperado, rel=1e-12, abs=1e-9)
+    # Mesma paridade em inteiros e numa Series com NaN
+    inteiros = np.nan_to_num(v).astype("int64")
+    esperado_int = [_scale_radius_rowwise(x, inteiros.max(), max_radius) for x in inteiros]
+    assert scale_radius(inteiros, inteiros.max(), max_radius) == pytest.approx(esperado_int, rel=1e-12, abs=1e-9)
+    assert scale_radius(pd.Series(v), max_val, max_radius) == pytest.approx(esperado, rel=1e-12, abs=1e-9)
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_scale_radius_rowwise_parity_with_lower_top(seed):
+    # Teto abaixo do máximo (ex.: o de outro período): acima dele o raio fica no máximo, como no original
+    v = _dirty_sample(seed)
+    top = float(np.nanpercentile(v[v > 0], 50))
+    esperado = np.array([_scale_radius_rowwise(x, top) for x in v], dtype="float64")
+    assert scale_radius(v, top) == pytest.approx(esperado, rel=1e-12, abs=1e-9)
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_log_scale_values_match_rowwise_fraction(seed):
+    v = _dirty_sample(seed)
+    max_val = pd.Series(v).max()
+    esperado = [np.log1p(x) / np.log1p(max_val) if x > 0 else 0.0 for x in np.nan_to_num(v, nan=-1.0)]
+    assert scale_values(v, "log") == pytest.approx(esperado, rel=1e-12, abs=1e-12)
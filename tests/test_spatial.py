@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from spatial import haversine_km, nearest_facility, nearest_in_grid
+
+
+def _brute(lat, lon, fac_lat, fac_lon):
+    d = haversine_km(np.asarray(lat)[:, None], np.asarray(lon)[:, None], fac_lat[None, :], fac_lon[None, :])
+    return d.argmin(axis=1), d.min(axis=1)
+
+
+def _pontos(n, seed):
+    # Metade concentrada (região metropolitana), metade espalhada pelo território
+    rng = np.random.default_rng(seed)
+    lat = np.r_[rng.normal(-23.5, 0.4, n // 2), rng.uniform(-33.0, 5.0, n - n // 2)]
+    lon = np.r_[rng.normal(-46.6, 0.4, n // 2), rng.uniform(-73.0, -35.0, n - n // 2)]
+    return lat, lon
+
+
+@pytest.mark.parametrize("seed", range(4))
+@pytest.mark.parametrize("m", [1, 3, 35, 400])
+@pytest.mark.parametrize("brute_max", [0, 10_000])
+def test_matches_brute_force(seed, m, brute_max):
+    lat, lon = _pontos(8_000, seed)
+    rng = np.random.default_rng(100 + seed)
+    fac_lat, fac_lon = rng.uniform(-30.0, -3.0, m), rng.uniform(-60.0, -35.0, m)
+    idx, dist = nearest_facility(lat, lon, fac_lat, fac_lon, brute_max=brute_max)
+    b_idx, b_dist = _brute(lat, lon, fac_lat, fac_lon)
+    assert dist == pytest.approx(b_dist, abs=1e-9)
+    assert (idx == b_idx).all()
+
+
+def test_grid_ties_pick_lowest_index():
+    lat, lon = _pontos(5_000, 7)
+    # Unidades repetidas: a de menor índice ganha, como no argmin
+    fac_lat = np.array([-22.9, -23.5, -23.5, -15.8, -22.9])
+    fac_lon = np.array([-43.2, -46.6, -46.6, -47.9, -43.2])
+    idx = nearest_in_grid(lat, lon, fac_lat, fac_lon)
+    assert (idx == _brute(lat, lon, fac_lat, fac_lon)[0]).all()
+    assert not np.isin(idx, [2, 4]).any()
+
+
+def test_grid_points_on_facilities_and_far_away():
+    fac_lat = np.array([-23.5, -8.05, -30.03])
+    fac_lon = np.array([-46.6, -34.9, -51.2])
+    # Pontos exatamente nas unidades, um do outro lado do mundo e células com um ponto só
+    lat = np.r_[fac_lat, 35.0, -23.49, 0.0]
+    lon = np.r_[fac_lon, 139.0, -46.61, -50.0]
+    idx = nearest_in_grid(lat, lon, fac_lat, fac_lon, cell_deg=0.25)
+    assert (idx == _brute(lat, lon, fac_lat, fac_lon)[0]).all()
+    assert idx[:3].tolist() == [0, 1, 2]
+
+
+def test_empty_inputs():
+    idx, dist = nearest_facility(np.array([]), np.array([]), np.array([-23.5]), np.array([-46.6]), brute_max=0)
+    assert idx.shape == dist.shape == (0,)
+    with pytest.raises(ValueError):
+        nearest_facility(np.array([-23.5]), np.array([-46.6]), np.array([]), np.array([]))
@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+
+from timecube import PeriodCube
+
+
+def _historico(n=5000, seed=9):
+    rng = np.random.default_rng(seed)
+    # Poucos locais e valores altos: células de milhões de reais, onde float32 já perde os centavos
+    locais = rng.integers(0, 5, n)
+    return pd.DataFrame({
+        "__LAT__": (-23.5 + locais * 0.5).astype("float32"),
+        "__LON__": (-46.6 + locais * 0.5).astype("float32"),
+        "data": pd.Timestamp("2024-06-01") + pd.to_timedelta(rng.integers(0, 90, n), unit="D"),
+        "entregas": rng.integers(1, 40, n).astype("int32"),
+        "faturamento": rng.uniform(1e4, 5e4, n).round(2),
+    })
+
+
+def test_period_totals_keep_cents():
+    df = _historico()
+    cube = PeriodCube.from_frame(df, "data", ["entregas", "faturamento"])
+    esperado = df.groupby(df["data"].dt.to_period("M"))[["entregas", "faturamento"]].sum()
+    totais = cube.totals()
+    assert totais["linhas"].tolist() == df.groupby(df["data"].dt.to_period("M")).size().tolist()
+    assert totais["entregas"].tolist() == esperado["entregas"].astype(float).tolist()
+    assert np.abs(totais["faturamento"].to_numpy() - esperado["faturamento"].to_numpy()).max() < 0.005
+
+
+def test_period_frame_matches_rows():
+    df = _historico()
+    cube = PeriodCube.from_frame(df, "data", ["faturamento"])
+    for i, periodo in enumerate(cube.periods):
+        linhas = df[df["data"].dt.to_period("M") == periodo]
+        assert abs(cube.frame(i)["faturamento"].sum() - linhas["faturamento"].sum()) < 0.005
@@ -0,0 +1,116 @@
+import numpy as np
+import pandas as pd
+
+from heatgrid import mercator_cells
+from scaling import DEFAULT_SCALE, scale_top, scale_values
+
+# =====================================================
+# Cubo período × célula × métrica para o mapa de calor no tempo
+# =====================================================
+# Nomes (normalizados) aceitos para a coluna de data/período, em ordem de preferência
+PERIOD_COLUMNS = ("periodo", "mes", "mes_ano", "competencia", "data", "data_entrega", "dt_entrega", "data_emissao")
+# Zoom da grade do cubo: células de ~CELL_PX px no zoom 8 (≈ 3 km no Sudeste)
+CUBE_ZOOM = 8
+
+
+def find_period_column(df: pd.DataFrame):
+    for c in PERIOD_COLUMNS:
+        if c in df.columns:
+            return c
+    return next((c for c in df.columns if pd.api.types.is_datetime64_any_dtype(df[c])), None)
+
+
+def to_periods(s: pd.Series, freq: str = "M") -> pd.Series:
+    # Datas (ou textos como '2025-01', '01/2025', '15/01/2025') -> Period mensal; inválidos viram NaT
+    if isinstance(s.dtype, pd.PeriodDtype):
+        return s.dt.asfreq(freq)
+    if not pd.api.types.is_datetime64_any_dtype(s):
+        txt = s.astype(str).str.strip()
+        mes_ano = txt.str.fullmatch(r"\d{1,2}[/-]\d{4}")
+        txt = txt.where(~mes_ano, "01/" + txt)
+        s = pd.to_datetime(txt, errors="coerce", dayfirst=True, format="mixed")
+    return s.dt.to_period(freq)
+
+
+class PeriodCube:
+    """Somas das métricas por período e célula da grade, num array denso float64 (somas em reais sem perder centavos).
+
+    Trocar de período é só values[p]: o DataFrame bruto não é refiltrado nem reagregado.
+    """
+
+    def __init__(self, lat, lon, periods: pd.Series, metrics: dict, zoom: int = CUBE_ZOOM):
+        lat = np.asarray(lat, dtype="float64")
+        lon = np.asarray(lon, dtype="float64")
+        valid = periods.notna().to_numpy()
+        codes, uniques = pd.factorize(periods[valid], sort=True)
+        self.periods = pd.PeriodIndex(uniques)
+        self.metrics = tuple(metrics)
+        self.zoom = zoom
+
+        lat, lon = lat[valid], lon[valid]
+        ix, iy, n = mercator_cells(lat, lon, zoom)
+        _, cell = np.unique(ix * (n + 1) + iy, return_inverse=True)
+        n_cells = int(cell.max()) + 1 if len(cell) else 0
+        count = np.bincount(cell, minlength=n_cells)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            self.cell_lat = (np.bincount(cell, weights=lat, minlength=n_cells) / count).astype("float32")
+            self.cell_lon = (np.bincount(cell, weights=lon, minlength=n_cells) / count).astype("float32")
+
+        # values[período, célula, métrica]
+        flat = codes.astype(np.int64) * n_cells + cell
+        size = len(self.periods) * n_cells
+        self.values = np.empty((len(self.periods), n_cells, len(self.metrics)), dtype="float64")
+        for k, col in enumerate(self.metrics):
+            w = np.nan_to_num(np.asarray(metrics[col], dtype="float64")[valid])
+            self.values[:, :, k] = np.bincount(flat, weights=w, minlength=size).reshape(len(self.periods), n_cells)
+        self.counts = np.bincount(flat, minlength=size).reshape(len(self.periods), n_cells).astype("int32")
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, period_col: str, metrics, **kwargs):
+        values = {c: df[c].to_numpy(dtype="float64", na_value=np.nan) for c in metrics if c in df.columns}
+        return cls(df["__LAT__"], df["__LON__"], to_periods(df[period_col]), values, **kwargs)
+
+    def __len__(self):
+        return len(self.periods)
+
+    @property
+    def labels(self):
+        return [p.strftime("%m/%Y") for p in self.periods]
+
+    @property
+    def nbytes(self) -> int:
+        return self.values.nbytes + self.counts.nbytes + self.cell_lat.nbytes + self.cell_lon.nbytes
+
+    def slice(self, period: int, metric: str) -> np.ndarray:
+        return self.values[period, :, self.metrics.index(metric)]
+
+    def frame(self, period: int) -> pd.DataFrame:
+        """Células com movimento no período, no mesmo formato do histórico (__LAT__, __LON__, métricas)."""
+        ativo = self.counts[period] > 0
+        out = pd.DataFrame({"__LAT__": self.cell_lat[ativo].astype("float64"),
+                            "__LON__": self.cell_lon[ativo].astype("float64")})
+        for k, col in enumerate(self.metrics):
+            out[col] = self.values[period, ativo, k].astype("float64")
+        return out
+
+    def max_values(self, method: str = DEFAULT_SCALE) -> dict:
+        # Teto da escala de cada métrica em qualquer período/célula: escala comum a todos os meses
+        return {col: scale_top(self.values[:, :, k].ravel(), method) for k, col in enumerate(self.metrics)}
+
+    def frames(self, metric: str, decimals: int = 5, method: str = DEFAULT_SCALE):
+        """[[lat, lon, peso 0–1], ...] por período, para o HeatMapWithTime (escala comum a todos os meses)."""
+        vals = self.values[:, :, self.metrics.index(metric)]
+        pesos = scale_values(vals.ravel(), method).reshape(vals.shape)
+        lat = np.round(self.cell_lat.astype("float64"), decimals)
+        lon = np.round(self.cell_lon.astype("float64"), decimals)
+        out = []
+        for row in pesos:
+            nz = row > 0
+            out.append(np.column_stack([lat[nz], lon[nz], np.round(row[nz], 4)]).tolist())
+        return out
+
+    def totals(self) -> pd.DataFrame:
+        # Totais por período (linhas) e métrica (colunas), mais o número de linhas do histórico
+        out = pd.DataFrame(self.values.sum(axis=1), index=self.labels, columns=list(self.metrics))
+        out.insert(0, "linhas", self.counts.sum(axis=1))
+        return out